@@ -0,0 +1,77 @@
+"""Initial schema
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-18
+
+Tables that already exist (databases created by Base.metadata.create_all
+at startup) are left untouched, so existing deployments can simply run
+`alembic upgrade head`.
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects.postgresql import UUID
+
+revision = "0001"
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def _create(name, *columns):
+    if not sa.inspect(op.get_bind()).has_table(name):
+        op.create_table(name, *columns)
+
+
+def upgrade() -> None:
+    _create(
+        "tenants",
+        sa.Column("id", UUID(as_uuid=True), primary_key=True),
+        sa.Column("name", sa.String(), nullable=False),
+        sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now()),
+        sa.Column("updated_at", sa.DateTime(timezone=True)),
+    )
+    _create(
+        "events",
+        sa.Column("id", UUID(as_uuid=True), primary_key=True),
+        sa.Column("tenant_id", UUID(as_uuid=True), sa.ForeignKey("tenants.id"), nullable=False),
+        sa.Column("source", sa.String(), nullable=False),
+        sa.Column("event_type", sa.String(), nullable=False),
+        sa.Column("payload", sa.JSON(), nullable=False),
+        sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now()),
+    )
+    _create(
+        "incidents",
+        sa.Column("id", UUID(as_uuid=True), primary_key=True),
+        sa.Column("tenant_id", UUID(as_uuid=True), sa.ForeignKey("tenants.id"), nullable=False),
+        sa.Column("status", sa.String()),
+        sa.Column("title", sa.String(), nullable=False),
+        sa.Column("description", sa.String()),
+        sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now()),
+        sa.Column("updated_at", sa.DateTime(timezone=True)),
+    )
+    _create(
+        "incident_hypotheses",
+        sa.Column("id", UUID(as_uuid=True), primary_key=True),
+        sa.Column("incident_id", UUID(as_uuid=True), sa.ForeignKey("incidents.id"), nullable=False),
+        sa.Column("hypothesis_text", sa.String(), nullable=False),
+        sa.Column("confidence", sa.Float()),
+        sa.Column("evidence", sa.JSON()),
+        sa.Column("threat_type", sa.String()),
+        sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now()),
+    )
+    _create(
+        "agent_decisions",
+        sa.Column("id", UUID(as_uuid=True), primary_key=True),
+        sa.Column("incident_id", UUID(as_uuid=True), sa.ForeignKey("incidents.id"), nullable=False),
+        sa.Column("agent_type", sa.String(), nullable=False),
+        sa.Column("decision_payload", sa.JSON(), nullable=False),
+        sa.Column("confidence", sa.Float()),
+        sa.Column("reasoning_summary", sa.String()),
+        sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now()),
+    )
+
+
+def downgrade() -> None:
+    for name in ("agent_decisions", "incident_hypotheses", "incidents", "events", "tenants"):
+        op.drop_table(name)
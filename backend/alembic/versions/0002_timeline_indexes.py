@@ -0,0 +1,31 @@
+"""Composite (incident_id, created_at) indexes for timeline reads
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-18
+"""
+from alembic import op
+
+revision = "0002"
+down_revision = "0001"
+branch_labels = None
+depends_on = None
+
+INDEXES = {
+    "ix_incident_hypotheses_incident_id_created_at": "incident_hypotheses",
+    "ix_agent_decisions_incident_id_created_at": "agent_decisions",
+}
+
+
+def upgrade() -> None:
+    concurrently = "CONCURRENTLY " if op.get_bind().dialect.name == "postgresql" else ""
+    # CONCURRENTLY cannot run inside a transaction; IF NOT EXISTS covers
+    # indexes created by create_all or by hand
+    with op.get_context().autocommit_block():
+        for name, table in INDEXES.items():
+            op.execute(f"CREATE INDEX {concurrently}IF NOT EXISTS {name} ON {table} (incident_id, created_at)")
+
+
+def downgrade() -> None:
+    for name in INDEXES:
+        op.execute(f"DROP INDEX IF EXISTS {name}")
@@ -0,0 +1,95 @@
+"""Range-partition events by created_at
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-18
+
+On PostgreSQL the events heap is replaced by a table partitioned by
+created_at (EVENTS_PARTITION_INTERVAL, day or week), with a default
+partition for out-of-range rows and a (tenant_id, created_at DESC) index
+on every partition. The primary key becomes (id, created_at) because a
+partitioned table's unique constraints must include the partition key.
+Existing rows are copied over, so on large tables run this in a
+maintenance window. Later partitions are created and retired by
+tasks.maintain_event_partitions_task.
+
+Other databases (SQLite in development) keep a plain table with the index.
+"""
+from datetime import datetime, timedelta, timezone
+from alembic import op
+import sqlalchemy as sa
+from app.config import settings
+from app.db import partitions
+
+revision = "0003"
+down_revision = "0002"
+branch_labels = None
+depends_on = None
+
+COLUMNS = "id, tenant_id, source, event_type, payload, created_at"
+
+
+def upgrade() -> None:
+    bind = op.get_bind()
+    if bind.dialect.name != "postgresql":
+        op.execute("CREATE INDEX IF NOT EXISTS ix_events_tenant_id_created_at ON events (tenant_id, created_at DESC)")
+        return
+    if partitions.is_partitioned(bind):
+        return
+
+    op.execute("ALTER TABLE events RENAME TO events_unpartitioned")
+    op.execute("ALTER INDEX IF EXISTS events_pkey RENAME TO events_unpartitioned_pkey")
+    op.execute("DROP INDEX IF EXISTS ix_events_tenant_id_created_at")
+    op.execute("""
+        CREATE TABLE events (
+            id UUID NOT NULL,
+            tenant_id UUID NOT NULL REFERENCES tenants (id),
+            source VARCHAR NOT NULL,
+            event_type VARCHAR NOT NULL,
+            payload JSON NOT NULL,
+            created_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT now(),
+            PRIMARY KEY (id, created_at)
+        ) PARTITION BY RANGE (created_at)
+    """)
+    # Declared on the parent, so every partition gets its own copy
+    op.execute("CREATE INDEX ix_events_tenant_id_created_at ON events (tenant_id, created_at DESC)")
+    op.execute(f"CREATE TABLE {partitions.DEFAULT_PARTITION} PARTITION OF events DEFAULT")
+
+    today = datetime.now(timezone.utc).date()
+    first_day = bind.execute(
+        sa.text("SELECT (min(created_at) AT TIME ZONE 'UTC')::date FROM events_unpartitioned")
+    ).scalar() or today
+    for partition in partitions.plan_partitions(
+        [], min(first_day, today), today + timedelta(days=settings.EVENTS_PARTITION_PREMAKE_DAYS)
+    ):
+        partitions.create_partition(bind, partition)
+
+    op.execute(
+        f"INSERT INTO events ({COLUMNS}) "
+        f"SELECT id, tenant_id, source, event_type, payload, COALESCE(created_at, now()) FROM events_unpartitioned"
+    )
+    op.execute("DROP TABLE events_unpartitioned")
+
+
+def downgrade() -> None:
+    bind = op.get_bind()
+    if bind.dialect.name != "postgresql":
+        op.execute("DROP INDEX IF EXISTS ix_events_tenant_id_created_at")
+        return
+    if not partitions.is_partitioned(bind):
+        return
+
+    op.execute("""
+        CREATE TABLE events_unpartitioned (
+            id UUID PRIMARY KEY,
+            tenant_id UUID NOT NULL REFERENCES tenants (id),
+            source VARCHAR NOT NULL,
+            event_type VARCHAR NOT NULL,
+            payload JSON NOT NULL,
+            created_at TIMESTAMP WITH TIME ZONE DEFAULT now()
+        )
+    """)
+    op.execute(f"INSERT INTO events_unpartitioned ({COLUMNS}) SELECT {COLUMNS} FROM events")
+    op.execute("DROP TABLE events")
+    op.execute("ALTER TABLE events_unpartitioned RENAME TO events")
+    op.execute("ALTER INDEX events_unpartitioned_pkey RENAME TO events_pkey")
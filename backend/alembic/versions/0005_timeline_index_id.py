@@ -0,0 +1,33 @@
+"""Add id to the timeline indexes
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-18
+
+The timeline keyset predicate (created_at, id) > (:t, :id) can start an
+index range scan only when id is part of the index.
+"""
+from alembic import op
+
+revision = "0005"
+down_revision = "0004"
+branch_labels = None
+depends_on = None
+
+TABLES = ("incident_hypotheses", "agent_decisions")
+
+
+def upgrade() -> None:
+    concurrently = "CONCURRENTLY " if op.get_bind().dialect.name == "postgresql" else ""
+    # Build the new index before dropping the old one so reads always have one
+    with op.get_context().autocommit_block():
+        for table in TABLES:
+            op.execute(f"CREATE INDEX {concurrently}IF NOT EXISTS ix_{table}_incident_id_created_at_id "
+                       f"ON {table} (incident_id, created_at, id)")
+            op.execute(f"DROP INDEX {concurrently}IF EXISTS ix_{table}_incident_id_created_at")
+
+
+def downgrade() -> None:
+    for table in TABLES:
+        op.execute(f"CREATE INDEX IF NOT EXISTS ix_{table}_incident_id_created_at ON {table} (incident_id, created_at)")
+        op.execute(f"DROP INDEX IF EXISTS ix_{table}_incident_id_created_at_id")
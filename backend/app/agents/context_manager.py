@@ -1,29 +1,48 @@
-from typing import List
+from datetime import datetime
+from typing import List, Optional
 from uuid import UUID
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
+from sqlalchemy import select, and_
 from app.models.event import Event
+from app.models.incident_event import IncidentEvent
 from app.models.hypothesis import Hypothesis
 from app.models.agent_decision import AgentDecision
+from app.config import settings
 
 class ContextManager:
-    async def get_incident_context(self, db: AsyncSession, incident_id: UUID) -> List[Event]:
-        # In a real scenario, this would find events related to the incident
-        # For now, let's just return all events for the tenant of this incident
-        
-        # 1. Get incident to find tenant_id
-        from app.models.incident import Incident
-        inc_result = await db.execute(select(Incident).where(Incident.id == incident_id))
-        incident = inc_result.scalars().first()
-        
-        if not incident:
-            return []
-            
-        # 2. Get events for tenant
-        event_result = await db.execute(
-            select(Event).where(Event.tenant_id == incident.tenant_id).order_by(Event.created_at.desc()).limit(50)
+    async def get_incident_context(
+        self,
+        db: AsyncSession,
+        incident_id: UUID,
+        since: Optional[datetime] = None,
+        until: Optional[datetime] = None,
+        limit: Optional[int] = None
+    ) -> List[Event]:
+        """
+        Events linked to the incident (newest first), optionally limited to
+        [since, until).
+
+        A single join of incident_events, indexed on (incident_id,
+        event_created_at), with events. Joining on created_at as well as id
+        lets PostgreSQL skip events partitions outside the window.
+        """
+        query = (
+            select(Event)
+            .join(IncidentEvent, and_(
+                IncidentEvent.event_id == Event.id,
+                IncidentEvent.event_created_at == Event.created_at
+            ))
+            .where(IncidentEvent.incident_id == incident_id)
         )
-        return event_result.scalars().all()
+        if since is not None:
+            query = query.where(IncidentEvent.event_created_at >= since, Event.created_at >= since)
+        if until is not None:
+            query = query.where(IncidentEvent.event_created_at < until, Event.created_at < until)
+
+        result = await db.execute(
+            query.order_by(IncidentEvent.event_created_at.desc()).limit(limit or settings.INCIDENT_CONTEXT_MAX_EVENTS)
+        )
+        return result.scalars().all()
 
     async def get_previous_hypotheses(self, db: AsyncSession, incident_id: UUID) -> List[Hypothesis]:
         result = await db.execute(
@@ -1,9 +1,12 @@
 from typing import Any, Dict, Optional
 import logging
+import uuid
+from datetime import datetime, timezone
 from app.agents.base_agent import BaseAgent
 from app.services.gemini_service import GeminiService, gemini_service
 from app.models.agent_decision import AgentDecision
-from app.db.database import AsyncSessionLocal
+from app.services.persistence_queue import persistence_queue
+from app.services.telemetry import traced
 
 logger = logging.getLogger(__name__)
 
@@ -12,6 +15,7 @@ class CriticAgent(BaseAgent):
         super().__init__(name="Critic Agent", agent_type="Critic")
         self.gemini_service = gemini_service_instance or gemini_service
 
+    @traced("agent.critic.review")
     async def review(self, incident_id: str, hypothesis: Dict[str, Any], response_plan: Dict[str, Any]) -> Dict[str, Any]:
         """
         Validates and critiques the response plan.
@@ -24,7 +28,7 @@ class CriticAgent(BaseAgent):
         Returns:
             A dictionary containing the critique, approval status, and revisions.
         """
-        logger.info(f"Agent {self.name} reviewing response plan for incident {incident_id}")
+        logger.info("Agent %s reviewing response plan for incident %s", self.name, incident_id)
         
         try:
             # Call Gemini service to critique the decision
@@ -32,7 +36,7 @@ class CriticAgent(BaseAgent):
             
             # Handle error from gemini service
             if "error" in critique:
-                logger.error(f"Gemini service returned error during critique: {critique['error']}")
+                logger.error("Gemini service returned error during critique: %s", critique['error'])
             
             # Save critique to database
             await self._save_decision(incident_id, critique)
@@ -40,7 +44,7 @@ class CriticAgent(BaseAgent):
             return critique
 
         except Exception as e:
-            logger.error(f"Unexpected error in CriticAgent.review: {e}")
+            logger.error("Unexpected error in CriticAgent.review: %s", e)
             return {
                 "error": str(e),
                 "approved": False,
@@ -49,7 +53,7 @@ class CriticAgent(BaseAgent):
             }
 
     async def _save_decision(self, incident_id: str, critique: Dict[str, Any]):
-        """Saves the critique to the agent_decisions table."""
+        """Queues the critique for a batched write to the agent_decisions table."""
         try:
             # Derive confidence from 0.8 base + adjustment
             adjustment = critique.get("confidence_adjustment", 0.0)
@@ -65,20 +69,17 @@ class CriticAgent(BaseAgent):
             if concerns:
                 summary += f" Concerns: {', '.join(concerns)}"
 
-            async with AsyncSessionLocal() as session:
-                async with session.begin():
-                    decision = AgentDecision(
-                        incident_id=incident_id,
-                        agent_type="critic",
-                        decision_payload=critique,
-                        confidence=confidence,
-                        reasoning_summary=summary
-                    )
-                    session.add(decision)
-                # Transaction is committed here automatically
-            logger.info(f"Successfully saved critique for incident {incident_id}")
+            await persistence_queue.enqueue(AgentDecision, [{
+                "id": uuid.uuid4(),
+                "incident_id": uuid.UUID(str(incident_id)),
+                "agent_type": "critic",
+                "decision_payload": critique,
+                "confidence": confidence,
+                "reasoning_summary": summary,
+                "created_at": datetime.now(timezone.utc)
+            }])
         except Exception as e:
-            logger.error(f"Failed to save critique to database for incident {incident_id}: {e}")
+            logger.error("Failed to save critique to database for incident %s: %s", incident_id, e)
 
     async def process(self, context: str) -> Dict[str, Any]:
         """
@@ -1,9 +1,14 @@
-from typing import List, Dict, Any, Optional
+from typing import Any, Awaitable, Callable, Dict, List, Optional
 import logging
+import time
 import uuid
+from datetime import datetime, timezone
 from app.services.gemini_service import GeminiService, gemini_service
+from app.services.event_normalizer import event_normalizer
+from app.services.triage_classifier import triage_classifier
 from app.models.hypothesis import Hypothesis
-from app.db.database import AsyncSessionLocal
+from app.services.persistence_queue import persistence_queue
+from app.services.telemetry import traced
 from app.agents.base_agent import BaseAgent
 
 logger = logging.getLogger(__name__)
@@ -13,28 +18,55 @@ class HypothesisAgent(BaseAgent):
         super().__init__(name="Hypothesis Agent", agent_type="Hypothesis")
         self.gemini_service = gemini_service_instance or gemini_service
 
-    async def analyze(self, incident_id: str, events: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    @traced("agent.hypothesis.analyze")
+    async def analyze(self, incident_id: str, events: List[Dict[str, Any]],
+                      on_hypothesis: Optional[Callable[[int, Dict[str, Any]], Awaitable[None]]] = None
+                      ) -> List[Dict[str, Any]]:
         """
         Generates competing threat hypotheses from security events.
         
         Args:
             incident_id: The ID of the incident to analyze (UUID string)
             events: A list of security events related to the incident
+            on_hypothesis: Optional callback receiving (index, hypothesis) as
+                soon as each hypothesis is available
             
         Returns:
             A list of hypothesis dictionaries with confidence scores
         """
-        logger.info(f"Agent {self.name} analyzing incident {incident_id} with {len(events)} events")
+        logger.info("Agent %s analyzing incident %s with %s events", self.name, incident_id, len(events))
         
         try:
+            # Textbook cases get an instant local hypothesis and skip the model
+            triage = triage_classifier.classify(events)
+            if triage.bypass:
+                logger.info(
+                    f"Triage classified incident {incident_id} as {triage.threat_type.value} "
+                    f"({triage.confidence:.2f}, rule={triage.rule}); skipping LLM hypothesis call"
+                )
+                await self._save_hypotheses(incident_id, triage.hypotheses)
+                if on_hypothesis is not None:
+                    for index, hypothesis in enumerate(triage.hypotheses):
+                        await on_hypothesis(index, hypothesis)
+                return triage.hypotheses
+
+            # Collapse repeated events into fingerprinted groups so the prompt
+            # scales with distinct patterns, not raw volume
+            event_groups = event_normalizer.aggregate(events)
+            logger.info("Grouped %s events into %s patterns for incident %s", len(events), len(event_groups), incident_id)
+
             # Prepare incident data for Gemini
             incident_data = {
-                "events": events,
-                "context": f"Analyzing {len(events)} security events for incident {incident_id}"
+                "event_groups": event_groups,
+                "total_events": len(events),
+                # Keep the incident id out of the prompt so identical event sets share cached responses
+                "context": f"Analyzing {len(events)} security events"
             }
             
             # Call Gemini service
-            response = await self.gemini_service.generate_hypothesis(incident_data)
+            llm_start = time.perf_counter()
+            response = await self.gemini_service.generate_hypothesis(incident_data, on_hypothesis=on_hypothesis)
+            triage_classifier.record_llm(time.perf_counter() - llm_start)
             
             # Extract hypotheses from response
             hypotheses_data = response.get("hypotheses", [])
@@ -42,7 +74,7 @@ class HypothesisAgent(BaseAgent):
             # Error handling: If Gemini fails or returns no hypotheses, return fallback
             if not hypotheses_data or "error" in response:
                 if "error" in response:
-                    logger.error(f"Gemini service returned error: {response['error']}")
+                    logger.error("Gemini service returned error: %s", response['error'])
                 return self._get_fallback_hypothesis(incident_id)
 
             # Save hypotheses to database
@@ -51,27 +83,28 @@ class HypothesisAgent(BaseAgent):
             return hypotheses_data
 
         except Exception as e:
-            logger.error(f"Unexpected error in HypothesisAgent.analyze: {e}")
+            logger.error("Unexpected error in HypothesisAgent.analyze: %s", e)
             return self._get_fallback_hypothesis(incident_id)
 
     async def _save_hypotheses(self, incident_id: str, hypotheses_data: List[Dict[str, Any]]):
-        """Saves generated hypotheses to the database."""
+        """Queues generated hypotheses for a batched write to the database."""
         try:
-            async with AsyncSessionLocal() as session:
-                async with session.begin():
-                    for h_data in hypotheses_data:
-                        hypothesis = Hypothesis(
-                            incident_id=incident_id,
-                            hypothesis_text=h_data.get("hypothesis_text"),
-                            confidence=h_data.get("confidence", 0.0),
-                            evidence=h_data.get("evidence", []),
-                            threat_type=h_data.get("threat_type", "other")
-                        )
-                        session.add(hypothesis)
-                # Transaction is committed here automatically
-            logger.info(f"Successfully saved {len(hypotheses_data)} hypotheses for incident {incident_id}")
+            created_at = datetime.now(timezone.utc)
+            rows = [
+                {
+                    "id": uuid.uuid4(),
+                    "incident_id": uuid.UUID(str(incident_id)),
+                    "hypothesis_text": h_data.get("hypothesis_text"),
+                    "confidence": h_data.get("confidence", 0.0),
+                    "evidence": h_data.get("evidence", []),
+                    "threat_type": h_data.get("threat_type", "other"),
+                    "created_at": created_at
+                }
+                for h_data in hypotheses_data
+            ]
+            await persistence_queue.enqueue(Hypothesis, rows)
         except Exception as e:
-            logger.error(f"Failed to save hypotheses to database for incident {incident_id}: {e}")
+            logger.error("Failed to save hypotheses to database for incident %s: %s", incident_id, e)
 
     def _get_fallback_hypothesis(self, incident_id: str) -> List[Dict[str, Any]]:
         """Returns a low-confidence fallback hypothesis when analysis fails."""
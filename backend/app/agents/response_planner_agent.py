@@ -1,9 +1,12 @@
 from typing import Any, Dict, Optional
 import logging
+import uuid
+from datetime import datetime, timezone
 from app.agents.base_agent import BaseAgent
 from app.services.gemini_service import GeminiService, gemini_service
 from app.models.agent_decision import AgentDecision
-from app.db.database import AsyncSessionLocal
+from app.services.persistence_queue import persistence_queue
+from app.services.telemetry import traced
 
 logger = logging.getLogger(__name__)
 
@@ -12,6 +15,7 @@ class ResponsePlannerAgent(BaseAgent):
         super().__init__(name="Response Planner Agent", agent_type="ResponsePlanner")
         self.gemini_service = gemini_service_instance or gemini_service
 
+    @traced("agent.planner.plan")
     async def plan(self, incident_id: str, top_hypothesis: Dict[str, Any], critique: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
         """
         Takes incident ID and the highest-confidence hypothesis,
@@ -25,13 +29,13 @@ class ResponsePlannerAgent(BaseAgent):
         Returns:
             A dictionary containing the response plan
         """
-        logger.info(f"Agent {self.name} planning response for incident {incident_id}")
+        logger.info("Agent %s planning response for incident %s", self.name, incident_id)
         
         try:
             # Prepare incident context
+            # Keep the incident id out of the prompt so identical hypotheses share cached responses
             incident_context = {
-                "incident_id": str(incident_id),
-                "context": f"Planning response for incident {incident_id} based on top hypothesis"
+                "context": "Planning response based on top hypothesis"
             }
             
             # Call Gemini service
@@ -39,7 +43,7 @@ class ResponsePlannerAgent(BaseAgent):
             
             # Handle error from gemini service
             if "error" in response_plan:
-                logger.error(f"Gemini service returned error during planning: {response_plan['error']}")
+                logger.error("Gemini service returned error during planning: %s", response_plan['error'])
                 # We still return the plan (which might contain error info and default values)
             
             # Save plan to database
@@ -48,7 +52,7 @@ class ResponsePlannerAgent(BaseAgent):
             return response_plan
 
         except Exception as e:
-            logger.error(f"Unexpected error in ResponsePlannerAgent.plan: {e}")
+            logger.error("Unexpected error in ResponsePlannerAgent.plan: %s", e)
             return {
                 "error": str(e),
                 "actions": [],
@@ -58,7 +62,7 @@ class ResponsePlannerAgent(BaseAgent):
             }
 
     async def _save_decision(self, incident_id: str, response_plan: Dict[str, Any]):
-        """Saves the response plan to the agent_decisions table."""
+        """Queues the response plan for a batched write to the agent_decisions table."""
         try:
             # Derive confidence from 1 - false_positive_risk if available
             fp_risk = response_plan.get("false_positive_risk", 0.0)
@@ -67,20 +71,17 @@ class ResponsePlannerAgent(BaseAgent):
             except (ValueError, TypeError):
                 confidence = 1.0
             
-            async with AsyncSessionLocal() as session:
-                async with session.begin():
-                    decision = AgentDecision(
-                        incident_id=incident_id,
-                        agent_type="response_planner",
-                        decision_payload=response_plan,
-                        confidence=confidence,
-                        reasoning_summary=response_plan.get("estimated_impact", "Generated response plan")
-                    )
-                    session.add(decision)
-                # Transaction is committed here automatically
-            logger.info(f"Successfully saved response plan for incident {incident_id}")
+            await persistence_queue.enqueue(AgentDecision, [{
+                "id": uuid.uuid4(),
+                "incident_id": uuid.UUID(str(incident_id)),
+                "agent_type": "response_planner",
+                "decision_payload": response_plan,
+                "confidence": confidence,
+                "reasoning_summary": response_plan.get("estimated_impact", "Generated response plan"),
+                "created_at": datetime.now(timezone.utc)
+            }])
         except Exception as e:
-            logger.error(f"Failed to save response plan to database for incident {incident_id}: {e}")
+            logger.error("Failed to save response plan to database for incident %s: %s", incident_id, e)
 
     async def process(self, context: str) -> Dict[str, Any]:
         """
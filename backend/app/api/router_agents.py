@@ -3,6 +3,12 @@ from sqlalchemy.ext.asyncio import AsyncSession
 from app.db.database import get_db
 from app.schemas.agent import AgentActionRequest, AgentReviewRequest
 from app.orchestrator.incident_orchestrator import orchestrator
+from app.services.llm_cache import llm_cache
+from app.services.prompt_builder import get_prompt_stats
+from app.services.rate_limiter import llm_rate_limiter
+from app.services.gemini_service import gemini_service
+from app.services.structured_output import get_parser_stats
+from app.services.triage_classifier import triage_classifier
 
 router = APIRouter(prefix="/agents", tags=["agents"])
 
@@ -11,8 +17,13 @@ async def advance_agents(request: AgentActionRequest, db: AsyncSession = Depends
     """
     Manually trigger agent reasoning for an incident.
     """
-    await orchestrator.advance_incident(db, request.incident_id)
-    return {"status": "success", "message": "Incident analysis advanced"}
+    try:
+        result = await orchestrator.advance_incident(db, request.incident_id)
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    if result.get("status") == "failed":
+        raise HTTPException(status_code=500, detail=result.get("error"))
+    return {"status": "success", "message": "Incident analysis advanced", "result": result}
 
 @router.post("/review")
 async def review_agent_decision(request: AgentReviewRequest, db: AsyncSession = Depends(get_db)):
@@ -20,3 +31,57 @@ async def review_agent_decision(request: AgentReviewRequest, db: AsyncSession =
     Stub for human-in-the-loop review of agent decisions.
     """
     return {"status": "success", "message": "Review recorded"}
+
+@router.get("/cache/stats")
+async def get_llm_cache_stats():
+    """
+    Hit/miss counters for the LLM response cache of this process.
+    """
+    return llm_cache.get_stats()
+
+@router.get("/prompt/stats")
+async def get_prompt_builder_stats():
+    """
+    Prompt sizes and how many sections/items were trimmed to fit the token budget.
+    """
+    return get_prompt_stats()
+
+@router.get("/llm/limiter")
+async def get_llm_limiter_stats():
+    """
+    In-flight model calls, queue depth, remaining per-minute budget and
+    coalesced (single-flight) calls for this process.
+    """
+    return {**llm_rate_limiter.get_stats(), **gemini_service.stats}
+
+@router.get("/llm/provider")
+async def get_llm_provider_stats():
+    """
+    Which LLM backend serves model calls (LLM_PROVIDER); the simulated
+    backend also reports its injected errors, rate limits and timeouts.
+    """
+    return gemini_service.provider.get_stats()
+
+@router.get("/llm/routing")
+async def get_llm_routing_stats():
+    """
+    Fast and large model of the router, and per route the calls made to
+    each, their average latency and how often fast answers were escalated.
+    """
+    return gemini_service.router.get_stats()
+
+@router.get("/llm/parser")
+async def get_llm_parser_stats():
+    """
+    Per-method counts of model responses parsed, repaired after truncation,
+    hypotheses dropped as invalid, and responses that could not be parsed.
+    """
+    return get_parser_stats()
+
+@router.get("/triage/stats")
+async def get_triage_stats():
+    """
+    How many incidents local triage answered without the LLM, and the
+    average latency of the triage and LLM hypothesis stages.
+    """
+    return triage_classifier.get_stats()
@@ -1,33 +1,117 @@
 import uuid
-from typing import List
-from fastapi import APIRouter, Depends, HTTPException
+from typing import List, Optional
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
 from sqlalchemy.ext.asyncio import AsyncSession
+from starlette.concurrency import run_in_threadpool
+from app.config import settings
 from app.db.database import get_db
 from app.orchestrator.incident_orchestrator import orchestrator
-from app.schemas.incident import TimelineItem, IncidentAnalyzeRequest, IncidentAnalyzeResponse
+from app.schemas.incident import (
+    TimelineItem, IncidentAnalyzeRequest, IncidentAnalyzeResponse,
+    IncidentJobSubmitResponse, IncidentJobStatus
+)
 from app.services.incident_service import incident_service
+from app.services.llm_cache import llm_cache
+from app.workers.celery_app import celery_app
+from app.workers.tasks import process_incident_task
+from app.websocket_handler import tenant_notifier
 
 router = APIRouter(prefix="/incidents", tags=["incidents"])
 
+# Celery task state -> job status exposed by the API
+JOB_STATES = {
+    "PENDING": "queued",
+    "RECEIVED": "queued",
+    "RETRY": "queued",
+    "STARTED": "running",
+    "FAILURE": "failed",
+    "REVOKED": "failed",
+}
+
 @router.post("/analyze", response_model=IncidentAnalyzeResponse)
 async def analyze_incident(
     request: IncidentAnalyzeRequest
 ):
     # Generate a random incident_id (uuid4)
     incident_id = str(uuid.uuid4())
-    
+
     # Convert events to dict for orchestrator
     events_dict = [event.model_dump() for event in request.events]
-    
-    # Call Orchestrator to process incident without DB
-    result = await orchestrator.process_incident(incident_id, events_dict)
-    
+
+    # Call Orchestrator to process incident without DB; hypotheses stream to the tenant's socket
+    notify = tenant_notifier(str(request.tenant_id))
+    with llm_cache.bypass(request.bypass_cache):
+        result = await orchestrator.process_incident(incident_id, events_dict, mode=request.mode, notify=notify)
+
     if result.get("status") == "failed":
         raise HTTPException(status_code=500, detail=result.get("error"))
-    
+
     return result
 
+@router.post("/analyze/async", response_model=IncidentJobSubmitResponse, status_code=202)
+async def analyze_incident_async(request: IncidentAnalyzeRequest):
+    """
+    Queue the analysis on a Celery worker and return immediately.
+
+    Poll GET /incidents/jobs/{job_id} for the result, or listen for an
+    analysis_completed / analysis_failed message on /ws/incidents/{tenant_id}.
+    """
+    incident_id = str(uuid.uuid4())
+    events_dict = [event.model_dump() for event in request.events]
+
+    # apply_async talks to the broker synchronously; keep it off the event loop
+    await run_in_threadpool(
+        process_incident_task.apply_async,
+        args=[incident_id, str(request.tenant_id), events_dict, request.mode, request.bypass_cache],
+        task_id=incident_id
+    )
+    return IncidentJobSubmitResponse(job_id=incident_id, incident_id=incident_id, status="queued")
+
+@router.get("/jobs/{job_id}", response_model=IncidentJobStatus)
+async def get_analysis_job(job_id: uuid.UUID):
+    """
+    Status and result of an async analysis job.
+
+    Unknown or expired job ids are reported as "queued", since the Celery
+    result backend cannot tell them apart from jobs not yet picked up.
+    """
+    async_result = celery_app.AsyncResult(str(job_id))
+    state = await run_in_threadpool(lambda: async_result.state)
+
+    if state == "SUCCESS":
+        result = await run_in_threadpool(lambda: async_result.result)
+        if result.get("status") == "failed":
+            return IncidentJobStatus(job_id=str(job_id), status="failed", error=result.get("error"))
+        return IncidentJobStatus(job_id=str(job_id), status="completed", result=result)
+
+    status = JOB_STATES.get(state, "queued")
+    error = None
+    if status == "failed":
+        error = str(await run_in_threadpool(lambda: async_result.result))
+    return IncidentJobStatus(job_id=str(job_id), status=status, error=error)
+
 @router.get("/{incident_id}/timeline", response_model=List[TimelineItem])
-async def get_incident_timeline(incident_id: uuid.UUID, db: AsyncSession = Depends(get_db)):
-    timeline = await incident_service.get_timeline(db, incident_id)
-    return timeline
+async def get_incident_timeline(
+    incident_id: uuid.UUID,
+    response: Response,
+    limit: int = Query(settings.TIMELINE_DEFAULT_LIMIT, ge=1, le=settings.TIMELINE_MAX_LIMIT),
+    cursor: Optional[str] = None,
+    include_payload: bool = True,
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Chronological reasoning timeline of an incident.
+
+    Results are paginated: when more items exist, the X-Next-Cursor response
+    header holds the cursor for the next page. Set include_payload=false to
+    omit the full decision payloads.
+    """
+    try:
+        items, next_cursor = await incident_service.get_timeline_page(
+            db, incident_id, limit=limit, cursor=cursor, include_payload=include_payload
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    return items
@@ -1,16 +1,70 @@
-from fastapi import APIRouter, Depends, HTTPException
+import zlib
+from fastapi import APIRouter, Depends, HTTPException, Request
 from sqlalchemy.ext.asyncio import AsyncSession
+from app.config import settings
 from app.db.database import get_db
-from app.models.event import Event as EventModel
-from app.schemas.event import Event, EventCreate
+from app.schemas.event import Event, EventCreate, EventBatchIngestResponse, EventStreamIngestResponse
+from app.services.event_ingest_service import event_ingest_service
 
 router = APIRouter(prefix="/logs", tags=["logs"])
 
 @router.post("/ingest", response_model=Event)
 async def ingest_log(event_in: EventCreate, db: AsyncSession = Depends(get_db)):
     # Basic filtering logic could go here
-    db_event = EventModel(**event_in.model_dump())
-    db.add(db_event)
-    await db.commit()
-    await db.refresh(db_event)
-    return db_event
+    row = event_ingest_service.to_row(event_in)
+    await event_ingest_service.bulk_insert(db, [row])
+    return row
+
+@router.post("/ingest/batch", response_model=EventBatchIngestResponse)
+async def ingest_log_batch(request: Request, db: AsyncSession = Depends(get_db)):
+    """
+    Ingest many events in one request.
+
+    Accepts a JSON array (application/json) or NDJSON (application/x-ndjson).
+    Invalid items are rejected individually; valid ones are written with a
+    single bulk insert.
+    """
+    body = await request.body()
+    content_type = request.headers.get("content-type", "application/json")
+
+    try:
+        items = event_ingest_service.parse_body(body, content_type)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    if len(items) > settings.INGEST_BATCH_MAX_ITEMS:
+        raise HTTPException(
+            status_code=413,
+            detail=f"Batch of {len(items)} events exceeds limit of {settings.INGEST_BATCH_MAX_ITEMS}"
+        )
+
+    rows, results = event_ingest_service.validate(items)
+    await event_ingest_service.bulk_insert(db, rows)
+
+    return EventBatchIngestResponse(
+        accepted=len(rows),
+        rejected=len(results) - len(rows),
+        results=results
+    )
+
+@router.post("/ingest/stream", response_model=EventStreamIngestResponse)
+async def ingest_log_stream(request: Request, db: AsyncSession = Depends(get_db)):
+    """
+    Ingest an arbitrarily large NDJSON upload incrementally.
+
+    The body is read chunk by chunk (optionally gzip-compressed, signalled by
+    `Content-Encoding: gzip` or an `application/gzip` content type) and stored
+    in micro-batches of INGEST_STREAM_FLUSH_ROWS, so memory use does not grow
+    with the upload size. Micro-batches are committed as they fill: if the
+    stream fails part-way, rows from earlier batches are kept.
+    """
+    content_type = request.headers.get("content-type", "")
+    gzipped = (
+        request.headers.get("content-encoding", "").lower() == "gzip"
+        or "gzip" in content_type
+    )
+
+    try:
+        return await event_ingest_service.ingest_stream(db, request.stream(), gzipped=gzipped)
+    except (ValueError, zlib.error) as e:
+        raise HTTPException(status_code=400, detail=f"Malformed stream: {e}")
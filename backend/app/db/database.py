@@ -1,11 +1,45 @@
-from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
+from typing import Any, Dict, Optional
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import create_async_engine, AsyncEngine
 from sqlalchemy.orm import sessionmaker, declarative_base
 from app.config import settings
+from app.db.pool_metrics import InstrumentedAsyncQueuePool
+from app.db.session_metrics import InstrumentedAsyncSession, instrument_queries
 
-engine = create_async_engine(settings.DATABASE_URL, echo=True)
+def engine_options(database_url: str, **overrides: Any) -> Dict[str, Any]:
+    """
+    create_async_engine arguments built from the DB_* settings.
+
+    Pool sizing only applies to pooled databases (not in-memory SQLite); the
+    asyncpg prepared-statement cache size is set through the URL, where the
+    SQLAlchemy dialect reads it.
+    """
+    url = make_url(database_url)
+    options: Dict[str, Any] = {"echo": settings.DB_ECHO}
+    if url.get_backend_name() != "sqlite" or url.database not in (None, "", ":memory:"):
+        options.update({
+            "poolclass": InstrumentedAsyncQueuePool,
+            "pool_size": settings.DB_POOL_SIZE,
+            "max_overflow": settings.DB_MAX_OVERFLOW,
+            "pool_timeout": settings.DB_POOL_TIMEOUT_SECONDS,
+            "pool_recycle": settings.DB_POOL_RECYCLE_SECONDS,
+            "pool_pre_ping": settings.DB_POOL_PRE_PING,
+        })
+    if url.get_driver_name() == "asyncpg":
+        url = url.update_query_dict({"prepared_statement_cache_size": str(settings.DB_STATEMENT_CACHE_SIZE)})
+    options.update(overrides)
+    options["url"] = url
+    return options
+
+def build_engine(database_url: Optional[str] = None, **overrides: Any) -> AsyncEngine:
+    engine = create_async_engine(**engine_options(database_url or settings.DATABASE_URL, **overrides))
+    instrument_queries(engine)
+    return engine
+
+engine = build_engine()
 
 AsyncSessionLocal = sessionmaker(
-    engine, class_=AsyncSession, expire_on_commit=False
+    engine, class_=InstrumentedAsyncSession, expire_on_commit=False
 )
 
 Base = declarative_base()
@@ -0,0 +1,33 @@
+from typing import Optional
+from alembic.config import Config
+from alembic.runtime.migration import MigrationContext
+from alembic.script import ScriptDirectory
+from sqlalchemy.ext.asyncio import AsyncEngine
+from app.config import BASE_DIR
+
+ALEMBIC_INI = BASE_DIR / "alembic.ini"
+
+class SchemaNotAtHead(RuntimeError):
+    pass
+
+def head_revision() -> str:
+    return ScriptDirectory.from_config(Config(str(ALEMBIC_INI))).get_current_head()
+
+async def current_revision(engine: AsyncEngine) -> Optional[str]:
+    async with engine.connect() as conn:
+        return await conn.run_sync(lambda sync_conn: MigrationContext.configure(sync_conn).get_current_revision())
+
+async def ensure_schema_at_head(engine: AsyncEngine) -> str:
+    """
+    Raises SchemaNotAtHead unless `alembic upgrade head` has been run.
+
+    The schema is owned by the migrations (events is partitioned on
+    PostgreSQL), so the app never creates tables itself.
+    """
+    current, head = await current_revision(engine), head_revision()
+    if current != head:
+        raise SchemaNotAtHead(
+            f"Database schema is at revision {current or '(none)'}, expected {head}; "
+            "run `alembic upgrade head` from backend/"
+        )
+    return current
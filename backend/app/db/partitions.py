@@ -0,0 +1,148 @@
+import re
+import logging
+from datetime import date, datetime, time, timedelta, timezone
+from typing import Any, Dict, List, NamedTuple, Optional
+from sqlalchemy import text
+from sqlalchemy.engine import Connection
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+# events is range-partitioned on created_at (PostgreSQL only; see the
+# alembic migration 0003). Partitions are named events_pYYYYMMDD after the
+# first day they cover; events_default catches rows outside every range.
+EVENTS_TABLE = "events"
+DEFAULT_PARTITION = "events_default"
+INTERVALS = {"day": 1, "week": 7}
+
+_BOUNDS_RE = re.compile(r"FROM \('([^']+)'\) TO \('([^']+)'\)")
+
+class Partition(NamedTuple):
+    name: str
+    start: datetime
+    end: datetime
+
+def period_start(day: date, interval: str) -> date:
+    """First day of the partition period containing `day` (weeks start on Monday)."""
+    if interval == "week":
+        return day - timedelta(days=day.weekday())
+    return day
+
+def _midnight(day: date) -> datetime:
+    return datetime.combine(day, time.min, tzinfo=timezone.utc)
+
+def plan_partitions(existing: List[Partition], first_day: date, last_day: date,
+                    interval: Optional[str] = None) -> List[Partition]:
+    """
+    Partitions to create so that [first_day, last_day] is covered.
+
+    Existing partitions are assumed contiguous (they are only ever created
+    here and dropped from the old end), so new ranges start at the current
+    upper bound; this also keeps ranges from overlapping when the interval
+    setting changes.
+    """
+    interval = interval or settings.EVENTS_PARTITION_INTERVAL
+    step = timedelta(days=INTERVALS[interval])
+    covered_until = max((p.end for p in existing), default=None)
+
+    planned: List[Partition] = []
+    # After missed runs, also fill the gap since the last partition so those
+    # rows move out of the default partition
+    if covered_until is not None and covered_until.date() < first_day:
+        first_day = covered_until.date()
+    day = period_start(first_day, interval)
+    while day <= last_day:
+        start, end = _midnight(day), _midnight(day + step)
+        day += step
+        if covered_until is not None:
+            if end <= covered_until:
+                continue
+            start = max(start, covered_until)
+        planned.append(Partition(f"{EVENTS_TABLE}_p{start:%Y%m%d}", start, end))
+    return planned
+
+def expired_partitions(existing: List[Partition], retention_days: int, today: date) -> List[Partition]:
+    """Partitions whose whole range is older than the retention period."""
+    if retention_days <= 0:
+        return []
+    cutoff = _midnight(today - timedelta(days=retention_days))
+    return [p for p in existing if p.end <= cutoff]
+
+def is_partitioned(conn: Connection) -> bool:
+    if conn.dialect.name != "postgresql":
+        return False
+    return bool(conn.execute(text(
+        "SELECT 1 FROM pg_partitioned_table pt JOIN pg_class c ON c.oid = pt.partrelid "
+        "WHERE c.relname = :table AND pg_table_is_visible(c.oid)"
+    ), {"table": EVENTS_TABLE}).scalar())
+
+def list_partitions(conn: Connection) -> List[Partition]:
+    """Range partitions of events ordered by start (the default partition is left out)."""
+    rows = conn.execute(text(
+        "SELECT c.relname, pg_get_expr(c.relpartbound, c.oid) FROM pg_inherits i "
+        "JOIN pg_class c ON c.oid = i.inhrelid JOIN pg_class p ON p.oid = i.inhparent "
+        "WHERE p.relname = :table AND pg_table_is_visible(p.oid)"
+    ), {"table": EVENTS_TABLE}).all()
+
+    partitions: List[Partition] = []
+    for name, bound in rows:
+        match = _BOUNDS_RE.search(bound or "")
+        if name == DEFAULT_PARTITION or not match:
+            continue
+        partitions.append(Partition(name, datetime.fromisoformat(match.group(1)), datetime.fromisoformat(match.group(2))))
+    return sorted(partitions, key=lambda p: p.start)
+
+def create_partition(conn: Connection, partition: Partition) -> None:
+    """
+    Creates and attaches one partition, moving any rows for its range out of
+    the default partition first (ATTACH fails while the default holds them).
+    """
+    start, end = partition.start.isoformat(), partition.end.isoformat()
+    conn.execute(text(f"CREATE TABLE {partition.name} (LIKE {EVENTS_TABLE} INCLUDING DEFAULTS)"))
+    conn.execute(text(
+        f"WITH moved AS (DELETE FROM {DEFAULT_PARTITION} WHERE created_at >= :start AND created_at < :end RETURNING *) "
+        f"INSERT INTO {partition.name} SELECT * FROM moved"
+    ), {"start": partition.start, "end": partition.end})
+    conn.execute(text(
+        f"ALTER TABLE {EVENTS_TABLE} ATTACH PARTITION {partition.name} FOR VALUES FROM ('{start}') TO ('{end}')"
+    ))
+
+def retire_partition(conn: Connection, partition: Partition, archive_schema: str = "") -> None:
+    """Detaches an expired partition and drops it, or moves it to archive_schema."""
+    conn.execute(text(f"ALTER TABLE {EVENTS_TABLE} DETACH PARTITION {partition.name}"))
+    if archive_schema:
+        conn.execute(text(f"CREATE SCHEMA IF NOT EXISTS {archive_schema}"))
+        conn.execute(text(f"ALTER TABLE {partition.name} SET SCHEMA {archive_schema}"))
+    else:
+        conn.execute(text(f"DROP TABLE {partition.name}"))
+
+def maintain_partitions(conn: Connection, today: Optional[date] = None) -> Dict[str, Any]:
+    """
+    Creates partitions EVENTS_PARTITION_PREMAKE_DAYS ahead and retires those
+    older than EVENTS_RETENTION_DAYS. Idempotent; a no-op unless events is
+    partitioned.
+    """
+    result: Dict[str, Any] = {"created": [], "retired": [], "archive_schema": settings.EVENTS_ARCHIVE_SCHEMA or None}
+    if not is_partitioned(conn):
+        return result
+
+    today = today or datetime.now(timezone.utc).date()
+    existing = list_partitions(conn)
+    for partition in plan_partitions(existing, today, today + timedelta(days=settings.EVENTS_PARTITION_PREMAKE_DAYS)):
+        create_partition(conn, partition)
+        result["created"].append(partition.name)
+
+    expired = expired_partitions(existing, settings.EVENTS_RETENTION_DAYS, today)
+    for partition in expired:
+        retire_partition(conn, partition, settings.EVENTS_ARCHIVE_SCHEMA)
+        result["retired"].append(partition.name)
+    if expired:
+        # Incident links have no foreign key to events; drop the ones left dangling
+        conn.execute(
+            text("DELETE FROM incident_events WHERE event_created_at < :cutoff"),
+            {"cutoff": max(p.end for p in expired)}
+        )
+
+    if result["created"] or result["retired"]:
+        logger.info(f"Event partitions created: {result['created']}, retired: {result['retired']}")
+    return result
@@ -0,0 +1,117 @@
+import time
+import logging
+from collections import deque
+from typing import Any, Dict
+from sqlalchemy import event, exc
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+from app.services.telemetry import DB_POOL_CONNECTIONS, DB_POOL_WAIT_SECONDS
+
+logger = logging.getLogger(__name__)
+
+class PoolMetrics:
+    """
+    Checkout counters and wait times for one connection pool.
+
+    Wait time is the time a caller spends inside the pool getting a
+    connection (queueing for a free slot plus opening a new connection), so
+    it grows when the pool is too small for the load.
+    """
+    def __init__(self, window: int = 1000):
+        self.checkouts = 0
+        self.checkout_timeouts = 0
+        self.connects = 0
+        self.invalidations = 0
+        self.wait_seconds_total = 0.0
+        self.wait_seconds_max = 0.0
+        self._recent_waits = deque(maxlen=window)
+
+    def record_wait(self, seconds: float) -> None:
+        self.checkouts += 1
+        self.wait_seconds_total += seconds
+        self.wait_seconds_max = max(self.wait_seconds_max, seconds)
+        self._recent_waits.append(seconds)
+
+    def snapshot(self, pool: Any = None) -> Dict[str, Any]:
+        waits = sorted(self._recent_waits)
+        stats: Dict[str, Any] = {
+            "checkouts": self.checkouts,
+            "checkout_timeouts": self.checkout_timeouts,
+            "connects": self.connects,
+            "invalidations": self.invalidations,
+            "wait_seconds_total": round(self.wait_seconds_total, 6),
+            "wait_seconds_max": round(self.wait_seconds_max, 6),
+            "wait_seconds_p50": round(_percentile(waits, 0.50), 6),
+            "wait_seconds_p95": round(_percentile(waits, 0.95), 6),
+        }
+        if isinstance(pool, AsyncAdaptedQueuePool):
+            stats.update({
+                "pool_size": pool.size(),
+                "in_use": pool.checkedout(),
+                "idle": pool.checkedin(),
+                "overflow": pool.overflow(),
+            })
+        return stats
+
+def _percentile(values, fraction: float) -> float:
+    if not values:
+        return 0.0
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+class InstrumentedAsyncQueuePool(AsyncAdaptedQueuePool):
+    """
+    AsyncAdaptedQueuePool that records checkout wait time (including
+    pre-ping) in self.metrics, and its in-use, idle and overflow connections
+    in cybersentinel_db_pool_connections on every checkout and return.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.metrics = PoolMetrics()
+        # A recreated pool inherits the listeners of the pool it replaces
+        if "_dispatch" not in kwargs:
+            event.listen(self, "connect", self._on_connect)
+            event.listen(self, "invalidate", self._on_invalidate)
+
+    def recreate(self):
+        # engine.dispose() swaps in a fresh pool; keep counting into the same metrics
+        pool = super().recreate()
+        pool.metrics = self.metrics
+        return pool
+
+    def connect(self):
+        start = time.perf_counter()
+        try:
+            conn = super().connect()
+        except exc.TimeoutError:
+            self.metrics.checkout_timeouts += 1
+            logger.warning(f"Connection pool exhausted: {self.status()}")
+            raise
+        waited = time.perf_counter() - start
+        self.metrics.record_wait(waited)
+        DB_POOL_WAIT_SECONDS.observe(waited)
+        self._export_connections()
+        return conn
+
+    def _do_return_conn(self, record) -> None:
+        super()._do_return_conn(record)
+        self._export_connections()
+
+    def _export_connections(self) -> None:
+        DB_POOL_CONNECTIONS.labels("in_use").set(self.checkedout())
+        DB_POOL_CONNECTIONS.labels("idle").set(self.checkedin())
+        # overflow() counts up from -pool_size; only connections beyond pool_size are overflow
+        DB_POOL_CONNECTIONS.labels("overflow").set(max(self.overflow(), 0))
+
+    def _on_connect(self, dbapi_connection, connection_record) -> None:
+        self.metrics.connects += 1
+
+    def _on_invalidate(self, dbapi_connection, connection_record, exception) -> None:
+        self.metrics.invalidations += 1
+
+def get_pool_stats(engine) -> Dict[str, Any]:
+    """Pool metrics of an async engine (counters only for non-instrumented pools)."""
+    pool = engine.sync_engine.pool
+    metrics = getattr(pool, "metrics", None)
+    if metrics is None:
+        return {"pool_class": type(pool).__name__}
+    return {"pool_class": type(pool).__name__, **metrics.snapshot(pool)}
@@ -0,0 +1,39 @@
+import time
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession
+from app.services.telemetry import DB_QUERY_SECONDS, DB_SESSION_SECONDS
+
+class InstrumentedAsyncSession(AsyncSession):
+    """AsyncSession that records its lifetime (creation to close) in cybersentinel_db_session_seconds."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._opened_at = time.perf_counter()
+
+    async def close(self) -> None:
+        try:
+            await super().close()
+        finally:
+            if self._opened_at is not None:
+                DB_SESSION_SECONDS.observe(time.perf_counter() - self._opened_at)
+                self._opened_at = None
+
+def instrument_queries(engine: AsyncEngine) -> None:
+    """Records statement execution time per SQL verb in cybersentinel_db_query_seconds."""
+    sync_engine = engine.sync_engine
+
+    @event.listens_for(sync_engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_started_at", []).append(time.perf_counter())
+
+    @event.listens_for(sync_engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        started = conn.info["query_started_at"].pop()
+        operation = statement.lstrip().split(None, 1)[0].upper() if statement.strip() else "UNKNOWN"
+        DB_QUERY_SECONDS.labels(operation).observe(time.perf_counter() - started)
+
+    @event.listens_for(sync_engine, "handle_error")
+    def _error(context):
+        # A failed statement never reaches after_cursor_execute
+        if context.connection is not None and context.connection.info.get("query_started_at"):
+            context.connection.info["query_started_at"].pop()
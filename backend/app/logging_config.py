@@ -0,0 +1,130 @@
+import atexit
+import queue
+import random
+import logging
+import logging.handlers
+from datetime import datetime, timezone
+from typing import Dict, Optional
+import orjson
+from app.config import settings
+from app.services.telemetry import LOG_FORMAT
+
+logger = logging.getLogger(__name__)
+
+# Sampled LLM prompt/response bodies go to this logger (see BodySampler)
+body_logger = logging.getLogger("app.llm.bodies")
+
+_listener: Optional[logging.handlers.QueueListener] = None
+_queue_handler: Optional["DeferredQueueHandler"] = None
+
+class DeferredQueueHandler(logging.handlers.QueueHandler):
+    """
+    QueueHandler that hands records to the writer thread as they are.
+
+    The stock handler formats the message in the calling thread; here
+    msg % args, the formatter and the stream write all happen on the
+    listener thread, so the event loop only pays for creating the record.
+    Log arguments must therefore not be mutated after the call. When the
+    queue is full the record is dropped instead of blocking the caller.
+    """
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line: time, level, logger, trace_id, message (and exception)."""
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "time": datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "trace_id": getattr(record, "trace_id", "-"),
+            "message": record.getMessage(),
+        }
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return orjson.dumps(entry, default=str).decode()
+
+class BodySampler:
+    """
+    Decides which LLM prompt/response bodies are logged, per category
+    (LOG_BODY_SAMPLE_RATES, e.g. {"prompt": 0.01, "response": 0.05}).
+
+    Callers check sample() before building the log call, so unsampled
+    bodies cost one dict lookup and, for rates between 0 and 1, one random
+    draw. Logged bodies are clipped to LOG_BODY_MAX_CHARS.
+    """
+    def __init__(self, rates: Optional[Dict[str, float]] = None, max_chars: Optional[int] = None,
+                 rng: Optional[random.Random] = None):
+        self.rates = dict(settings.LOG_BODY_SAMPLE_RATES if rates is None else rates)
+        self.max_chars = max_chars or settings.LOG_BODY_MAX_CHARS
+        self._random = rng or random.Random()
+
+    def sample(self, category: str) -> bool:
+        rate = self.rates.get(category, 0.0)
+        if rate <= 0.0 or not body_logger.isEnabledFor(logging.INFO):
+            return False
+        return rate >= 1.0 or self._random.random() < rate
+
+    def clip(self, text: str) -> str:
+        if len(text) <= self.max_chars:
+            return text
+        return f"{text[:self.max_chars]}... [{len(text) - self.max_chars} more chars]"
+
+body_sampler = BodySampler()
+
+def configure_logging(level: Optional[str] = None, json_format: Optional[bool] = None,
+                      use_queue: Optional[bool] = None, stream=None) -> None:
+    """
+    Sets up the root logger once per process (API and Celery workers).
+
+    Records go through a bounded queue to a writer thread that formats and
+    writes them to stderr (LOG_QUEUE_ENABLED), as plain text with the
+    incident trace id or as JSON lines (LOG_JSON). Calling it again
+    replaces the previous setup.
+    """
+    global _listener, _queue_handler
+    shutdown_logging()
+
+    level = (level or settings.LOG_LEVEL).upper()
+    json_format = settings.LOG_JSON if json_format is None else json_format
+    use_queue = settings.LOG_QUEUE_ENABLED if use_queue is None else use_queue
+
+    handler = logging.StreamHandler(stream)
+    handler.setFormatter(JsonFormatter() if json_format else logging.Formatter(LOG_FORMAT))
+
+    root = logging.getLogger()
+    for existing in root.handlers[:]:
+        root.removeHandler(existing)
+    root.setLevel(level)
+
+    if use_queue:
+        _queue_handler = DeferredQueueHandler(queue.Queue(maxsize=settings.LOG_QUEUE_SIZE))
+        _listener = logging.handlers.QueueListener(_queue_handler.queue, handler, respect_handler_level=True)
+        _listener.start()
+        root.addHandler(_queue_handler)
+    else:
+        root.addHandler(handler)
+
+def shutdown_logging() -> None:
+    """Stops the writer thread after it has written everything queued."""
+    global _listener, _queue_handler
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+    if _queue_handler is not None:
+        logging.getLogger().removeHandler(_queue_handler)
+        if _queue_handler.dropped:
+            logger.warning("Dropped %d log records while the log queue was full", _queue_handler.dropped)
+        _queue_handler = None
+
+atexit.register(shutdown_logging)
@@ -1,13 +1,18 @@
+import asyncio
 import logging
-from fastapi import FastAPI, WebSocket, WebSocketDisconnect
+from fastapi import FastAPI, Response, WebSocket, WebSocketDisconnect
 from fastapi.middleware.cors import CORSMiddleware
 from app.api import router_tenants, router_logs, router_incidents, router_agents
 from app.websocket_handler import manager
 from app.config import settings
-from app.db.database import Base, engine
+from app.db.database import engine
+from app.db.migrations import SchemaNotAtHead, ensure_schema_at_head
+from app.db.pool_metrics import get_pool_stats
+from app.services.persistence_queue import persistence_queue
+from app.services.telemetry import MetricsMiddleware, render_metrics
+from app.logging_config import configure_logging, shutdown_logging
 
-# Setup logging
-logging.basicConfig(level=logging.INFO)
+configure_logging()
 logger = logging.getLogger(__name__)
 
 app = FastAPI(
@@ -22,22 +27,45 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    # Timeline pagination cursor (see GET /api/incidents/{id}/timeline)
+    expose_headers=["X-Next-Cursor"],
 )
+app.add_middleware(MetricsMiddleware)
 
 # Health endpoint
 @app.get("/health")
 async def health_check():
     return {"status": "ok", "project": settings.PROJECT_NAME, "version": settings.VERSION}
 
+@app.get("/health/db/pool")
+async def db_pool_stats():
+    """Connection pool usage and checkout wait times of this process."""
+    return get_pool_stats(engine)
+
+@app.get("/health/ws")
+async def websocket_stats():
+    """WebSocket connections, send queue depth and evictions of this process."""
+    return manager.get_stats()
+
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    """Prometheus metrics: spans, LLM attempts/retries/sizes, DB sessions and queries, HTTP latency."""
+    body, content_type = render_metrics()
+    return Response(content=body, media_type=content_type)
+
 # WebSocket route
 @app.websocket("/ws/incidents/{tenant_id}")
 async def websocket_endpoint(websocket: WebSocket, tenant_id: str):
     await manager.connect(websocket, tenant_id)
     try:
         while True:
-            # Keep connection alive
-            await websocket.receive_text()
+            # Keep connection alive; text and binary (MessagePack) frames are both ignored
+            message = await websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                break
     except WebSocketDisconnect:
+        pass
+    finally:
         manager.disconnect(websocket, tenant_id)
 
 # Routers
@@ -49,12 +77,32 @@ app.include_router(router_agents.router, prefix=settings.API_V1_STR)
 @app.on_event("startup")
 async def startup():
     if settings.DATABASE_URL.startswith("postgresql"):
+        # Tables come from Alembic only: create_all would make a plain,
+        # unpartitioned events table that migration 0001 then fails on
         try:
-            async with engine.begin() as conn:
-                await conn.run_sync(Base.metadata.create_all)
-            logger.info("✅ Database tables created/verified successfully")
+            revision = await ensure_schema_at_head(engine)
+            logger.info("Database schema is at revision %s", revision)
+        except SchemaNotAtHead as e:
+            logger.error(str(e))
+            raise
         except Exception as e:
-            logger.warning(f"⚠️ Database initialization failed: {e}")
+            logger.warning("⚠️ Database schema check failed: %s", e)
             logger.info("Application will continue - database will connect on first request")
     else:
-        logger.info("Skipping database initialization (not using PostgreSQL)")
+        logger.info("Skipping database schema check (not using PostgreSQL)")
+
+    if settings.LLM_PROVIDER == "gemini" and not settings.GEMINI_API_KEY:
+        logger.warning("GEMINI_API_KEY is not set; analysis requests will fail until it is configured")
+
+    # Relay messages published by workers to this process's WebSocket clients
+    app.state.ws_relay = asyncio.create_task(manager.listen()) if settings.WS_REDIS_ENABLED else None
+
+@app.on_event("shutdown")
+async def shutdown():
+    relay = getattr(app.state, "ws_relay", None)
+    if relay:
+        relay.cancel()
+
+    # Drain agent outputs still waiting in the write-behind queue
+    await persistence_queue.stop()
+    shutdown_logging()
@@ -1,11 +1,16 @@
 import uuid
-from sqlalchemy import Column, String, DateTime, JSON, ForeignKey
+from sqlalchemy import Column, Index, String, DateTime, JSON, ForeignKey, text
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.sql import func
 from app.db.database import Base
 
 class Event(Base):
     __tablename__ = "events"
+    __table_args__ = (
+        # Recent events per tenant. On PostgreSQL the table is partitioned by
+        # created_at and the primary key is (id, created_at); see alembic 0003.
+        Index("ix_events_tenant_id_created_at", "tenant_id", text("created_at DESC")),
+    )
 
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     tenant_id = Column(UUID(as_uuid=True), ForeignKey("tenants.id"), nullable=False)
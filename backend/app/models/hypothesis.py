@@ -1,11 +1,15 @@
 import uuid
-from sqlalchemy import Column, String, DateTime, ForeignKey, Float, JSON
+from sqlalchemy import Column, Index, String, DateTime, ForeignKey, Float, JSON
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.sql import func
 from app.db.database import Base
 
 class Hypothesis(Base):
     __tablename__ = "incident_hypotheses"
+    __table_args__ = (
+        # Timeline reads: WHERE incident_id = ? ORDER BY created_at, id
+        Index("ix_incident_hypotheses_incident_id_created_at_id", "incident_id", "created_at", "id"),
+    )
 
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     incident_id = Column(UUID(as_uuid=True), ForeignKey("incidents.id"), nullable=False)
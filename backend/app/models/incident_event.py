@@ -0,0 +1,17 @@
+from sqlalchemy import Column, Index, DateTime, ForeignKey
+from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy.sql import func
+from app.db.database import Base
+
+class IncidentEvent(Base):
+    __tablename__ = "incident_events"
+    __table_args__ = (
+        # Context reads: WHERE incident_id = ? [AND event_created_at >= ?] ORDER BY event_created_at DESC
+        Index("ix_incident_events_incident_id_event_created_at", "incident_id", "event_created_at"),
+    )
+
+    incident_id = Column(UUID(as_uuid=True), ForeignKey("incidents.id", ondelete="CASCADE"), primary_key=True)
+    # No foreign key to events: it would block detaching expired partitions
+    event_id = Column(UUID(as_uuid=True), primary_key=True)
+    event_created_at = Column(DateTime(timezone=True), nullable=False)  # events.created_at, the partition key
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
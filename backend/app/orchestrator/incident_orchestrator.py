@@ -1,10 +1,19 @@
 from typing import List, Dict, Any, Optional
+import asyncio
 import logging
-from datetime import datetime
+from datetime import datetime, timedelta
 from uuid import UUID
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.config import settings
+from app.agents.context_manager import context_manager
 from app.agents.hypothesis_agent import HypothesisAgent
 from app.agents.response_planner_agent import ResponsePlannerAgent
 from app.agents.critic_agent import CriticAgent
+from app.services.model_router import model_router
+from app.services.persistence_queue import persistence_queue
+from app.services.rate_limiter import llm_rate_limiter
+from app.services.telemetry import span, trace_context
+from app.websocket_handler import Notifier, tenant_notifier
 
 logger = logging.getLogger(__name__)
 
@@ -14,54 +23,235 @@ class IncidentOrchestrator:
         self.planner_agent = ResponsePlannerAgent()
         self.critic_agent = CriticAgent()
 
-    async def process_incident(self, incident_id: str, events: List[Dict[str, Any]]) -> Dict[str, Any]:
+    async def process_incident(self, incident_id: str, events: List[Dict[str, Any]], mode: Optional[str] = None,
+                               notify: Optional[Notifier] = None) -> Dict[str, Any]:
         """
         Coordinates the 3-agent reasoning workflow for an incident.
+
+        Args:
+            incident_id: The ID of the incident
+            events: Security events related to the incident
+            mode: "sequential" or "parallel"; defaults to settings.ORCHESTRATOR_MODE
+            notify: Optional tenant notifier (see tenant_notifier); each hypothesis
+                is pushed as a hypothesis_generated message as soon as it exists
+        """
+        mode = mode or settings.ORCHESTRATOR_MODE
+        on_hypothesis = self._hypothesis_notifier(incident_id, notify) if notify is not None else None
+        # Logs of every agent and model call for this incident carry its id as trace id
+        with trace_context(incident_id), span(f"orchestrator.{mode}"):
+            # Model calls for this incident queue by its most severe event
+            # and are routed to the fast or large model by its complexity
+            with llm_rate_limiter.priority(llm_rate_limiter.priority_for_events(events)), \
+                    model_router.incident(model_router.assess(events)):
+                if mode == "parallel":
+                    return await self._process_parallel(incident_id, events, on_hypothesis)
+                return await self._process_sequential(incident_id, events, on_hypothesis)
+
+    async def advance_incident(self, db: AsyncSession, incident_id: UUID, mode: Optional[str] = None) -> Dict[str, Any]:
         """
+        Runs the reasoning workflow for a stored incident using its context events.
+
+        The incident is marked "analyzing" while the agents run and returned
+        to "open" (awaiting analyst action) afterwards, once the agents'
+        write-behind rows have been flushed. Hypotheses are pushed to the
+        tenant's WebSocket as they are generated.
+        """
+        from app.models.incident import Incident
+        incident = await db.get(Incident, incident_id)
+        if not incident:
+            raise ValueError(f"Incident {incident_id} not found")
+
+        since = None
+        if incident.created_at:
+            since = incident.created_at - timedelta(hours=settings.EVENT_CONTEXT_LOOKBACK_HOURS)
+        events = await context_manager.get_incident_context(db, incident_id, since=since)
+        events_dict = [
+            {
+                "timestamp": e.created_at.isoformat() if e.created_at else None,
+                "source": e.source,
+                "event_type": e.event_type,
+                "payload": e.payload
+            }
+            for e in events
+        ]
+
+        incident.status = "analyzing"
+        await db.commit()
+
+        try:
+            notify = tenant_notifier(str(incident.tenant_id))
+            return await self.process_incident(str(incident_id), events_dict, mode=mode, notify=notify)
+        finally:
+            # Agent outputs are written before the caller reads the timeline
+            await persistence_queue.flush()
+            incident.status = "open"
+            await db.commit()
+
+    @staticmethod
+    def _hypothesis_notifier(incident_id: str, notify: Notifier):
+        async def on_hypothesis(index: int, hypothesis: Dict[str, Any]):
+            await notify({"type": "hypothesis_generated", "incident_id": incident_id, "index": index,
+                          "hypothesis": hypothesis})
+        return on_hypothesis
+
+    async def _process_sequential(self, incident_id: str, events: List[Dict[str, Any]],
+                                  on_hypothesis=None) -> Dict[str, Any]:
         try:
-            logger.info(f"Starting orchestration for incident {incident_id}")
-            
+            logger.info("Starting orchestration for incident %s", incident_id)
+
             # Step 1: Hypothesis Generation
-            hypotheses = await self.hypothesis_agent.analyze(incident_id, events)
-            
+            hypotheses = await self.hypothesis_agent.analyze(incident_id, events, on_hypothesis=on_hypothesis)
+
             if not hypotheses:
                 raise ValueError("No hypotheses generated by HypothesisAgent")
 
             # Step 2: Pick the hypothesis with highest confidence
             top_hypothesis = max(hypotheses, key=lambda x: x.get("confidence", 0.0))
-            
+
             # Step 3: Response Planning
             plan = await self.planner_agent.plan(incident_id, top_hypothesis)
-            
+
             # Step 4: Critic Review
             critique = await self.critic_agent.review(incident_id, top_hypothesis, plan)
-            
+
             # Step 5: If critic rejects -> call ResponsePlannerAgent again with critique feedback
             if not critique.get("approved", True):
-                logger.info(f"Critic rejected plan for incident {incident_id}. Retrying planning with feedback.")
+                logger.info("Critic rejected plan for incident %s. Retrying planning with feedback.", incident_id)
                 plan = await self.planner_agent.plan(incident_id, top_hypothesis, critique=critique)
 
-            final_result = {
-                "incident_id": incident_id,
-                "status": "completed",
-                "hypotheses": hypotheses,
-                "response_plan": plan,
-                "critic_review": critique,
-                "final_decision": {
-                    "top_hypothesis": top_hypothesis,
-                    "recommended_plan": plan
-                }
-            }
-            
-            logger.info(f"Successfully processed incident {incident_id}")
+            final_result = self._build_result(incident_id, hypotheses, top_hypothesis, plan, critique)
+
+            logger.info("Successfully processed incident %s", incident_id)
             return final_result
 
         except Exception as e:
-            logger.error(f"Error processing incident {incident_id}: {e}", exc_info=True)
-            return {
-                "incident_id": incident_id,
-                "status": "failed",
-                "error": str(e)
+            logger.error("Error processing incident %s: %s", incident_id, e, exc_info=True)
+            return self._build_failure(incident_id, e)
+
+    async def _process_parallel(self, incident_id: str, events: List[Dict[str, Any]],
+                                on_hypothesis=None) -> Dict[str, Any]:
+        """
+        Plans and critiques the top-N hypotheses concurrently.
+
+        Each branch runs plan -> critique on its own, so a branch is reviewed
+        as soon as its plan is ready. The whole incident is bounded by
+        ORCHESTRATOR_DEADLINE_SECONDS: branches still running at the deadline
+        are cancelled and the best finished branch wins.
+        """
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + settings.ORCHESTRATOR_DEADLINE_SECONDS
+
+        try:
+            logger.info("Starting parallel orchestration for incident %s", incident_id)
+
+            hypotheses = await asyncio.wait_for(
+                self.hypothesis_agent.analyze(incident_id, events, on_hypothesis=on_hypothesis),
+                timeout=max(0.0, deadline - loop.time())
+            )
+            if not hypotheses:
+                raise ValueError("No hypotheses generated by HypothesisAgent")
+
+            ranked = sorted(hypotheses, key=lambda x: x.get("confidence", 0.0), reverse=True)
+            candidates = ranked[:max(1, settings.ORCHESTRATOR_FANOUT)]
+
+            tasks = [
+                asyncio.create_task(self._run_branch(incident_id, hypothesis))
+                for hypothesis in candidates
+            ]
+            done, pending = await asyncio.wait(tasks, timeout=max(0.0, deadline - loop.time()))
+            for task in pending:
+                task.cancel()
+            if pending:
+                logger.warning("Deadline reached for incident %s; cancelled %s of %s branches",
+                               incident_id, len(pending), len(tasks))
+                await asyncio.gather(*pending, return_exceptions=True)
+
+            branches = []
+            failures = []
+            for task in tasks:
+                if task not in done:
+                    continue
+                if task.exception() is not None:
+                    failures.append(task.exception())
+                    logger.error("Branch failed for incident %s: %r", incident_id, task.exception(),
+                                 exc_info=task.exception())
+                else:
+                    branches.append(task.result())
+            if not branches:
+                # Returned, not raised: asyncio.TimeoutError is TimeoutError on 3.11+, so the
+                # deadline handler below would replace the real cause
+                if failures and not pending:
+                    # Every branch raised: report the failure, not a deadline
+                    return self._build_failure(incident_id, failures[0])
+                logger.error("No response plan completed within %ss for incident %s",
+                             settings.ORCHESTRATOR_DEADLINE_SECONDS, incident_id)
+                return self._build_failure(incident_id, TimeoutError(
+                    f"No response plan completed within {settings.ORCHESTRATOR_DEADLINE_SECONDS}s"
+                ))
+
+            approved = [b for b in branches if b["critique"].get("approved", False)]
+            best = max(approved or branches, key=self._score_branch)
+
+            # No branch was approved: re-plan the best one with its critique, time permitting
+            if not approved and deadline - loop.time() > 0:
+                logger.info("Critic rejected all %s plans for incident %s. Retrying planning with feedback.", len(branches), incident_id)
+                try:
+                    best["plan"] = await asyncio.wait_for(
+                        self.planner_agent.plan(incident_id, best["hypothesis"], critique=best["critique"]),
+                        timeout=max(0.0, deadline - loop.time())
+                    )
+                except asyncio.TimeoutError:
+                    logger.warning("Deadline reached while re-planning incident %s; keeping rejected plan", incident_id)
+
+            final_result = self._build_result(incident_id, hypotheses, best["hypothesis"], best["plan"], best["critique"])
+
+            logger.info("Successfully processed incident %s (%s/%s branches finished)", incident_id, len(branches), len(tasks))
+            return final_result
+
+        except asyncio.TimeoutError:
+            logger.error("Deadline of %ss exceeded for incident %s", settings.ORCHESTRATOR_DEADLINE_SECONDS, incident_id)
+            return self._build_failure(incident_id, TimeoutError(f"Analysis exceeded {settings.ORCHESTRATOR_DEADLINE_SECONDS}s deadline"))
+        except Exception as e:
+            logger.error("Error processing incident %s: %s", incident_id, e, exc_info=True)
+            return self._build_failure(incident_id, e)
+
+    async def _run_branch(self, incident_id: str, hypothesis: Dict[str, Any]) -> Dict[str, Any]:
+        plan = await self.planner_agent.plan(incident_id, hypothesis)
+        critique = await self.critic_agent.review(incident_id, hypothesis, plan)
+        return {"hypothesis": hypothesis, "plan": plan, "critique": critique}
+
+    @staticmethod
+    def _score_branch(branch: Dict[str, Any]) -> float:
+        """Hypothesis confidence adjusted by the critic, penalised by false-positive risk."""
+        try:
+            confidence = float(branch["hypothesis"].get("confidence", 0.0))
+            adjustment = float(branch["critique"].get("confidence_adjustment", 0.0) or 0.0)
+            fp_risk = float(branch["plan"].get("false_positive_risk", 0.0) or 0.0)
+        except (TypeError, ValueError):
+            return 0.0
+        return confidence + adjustment - 0.5 * fp_risk
+
+    @staticmethod
+    def _build_result(incident_id: str, hypotheses: List[Dict[str, Any]], top_hypothesis: Dict[str, Any],
+                      plan: Dict[str, Any], critique: Dict[str, Any]) -> Dict[str, Any]:
+        return {
+            "incident_id": incident_id,
+            "status": "completed",
+            "hypotheses": hypotheses,
+            "response_plan": plan,
+            "critic_review": critique,
+            "final_decision": {
+                "top_hypothesis": top_hypothesis,
+                "recommended_plan": plan
             }
+        }
+
+    @staticmethod
+    def _build_failure(incident_id: str, error: Exception) -> Dict[str, Any]:
+        return {
+            "incident_id": incident_id,
+            "status": "failed",
+            "error": str(error)
+        }
 
 orchestrator = IncidentOrchestrator()
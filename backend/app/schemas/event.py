@@ -1,4 +1,4 @@
-from typing import Dict, Any
+from typing import Dict, Any, List, Optional
 from uuid import UUID
 from datetime import datetime
 from pydantic import BaseModel, ConfigDict
@@ -10,10 +10,27 @@ class EventBase(BaseModel):
     payload: Dict[str, Any]
 
 class EventCreate(EventBase):
-    pass
+    incident_id: Optional[UUID] = None  # Links the event to an existing incident of the same tenant
 
 class Event(EventBase):
     id: UUID
     created_at: datetime
 
     model_config = ConfigDict(from_attributes=True)
+
+class EventIngestResult(BaseModel):
+    index: int
+    status: str  # 'accepted' or 'rejected'
+    id: Optional[UUID] = None
+    error: Optional[str] = None
+
+class EventBatchIngestResponse(BaseModel):
+    accepted: int
+    rejected: int
+    results: List[EventIngestResult]
+
+class EventStreamIngestResponse(BaseModel):
+    accepted: int
+    rejected: int
+    batches: int
+    errors: List[EventIngestResult]  # first INGEST_STREAM_MAX_ERRORS rejections only
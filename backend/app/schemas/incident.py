@@ -1,4 +1,4 @@
-from typing import Optional, List
+from typing import Optional, List, Literal, Dict, Any
 from uuid import UUID
 from datetime import datetime
 from pydantic import BaseModel, ConfigDict
@@ -28,6 +28,8 @@ class EventItem(BaseModel):
 class IncidentAnalyzeRequest(BaseModel):
     tenant_id: UUID
     events: List[EventItem]
+    mode: Optional[Literal["sequential", "parallel"]] = None  # defaults to ORCHESTRATOR_MODE
+    bypass_cache: bool = False  # Force fresh LLM calls for this request
 
 class AnalysisResult(BaseModel):
     threat_type: str
@@ -44,6 +46,17 @@ class IncidentAnalyzeResponse(BaseModel):
     critic_review: dict
     final_decision: dict
 
+class IncidentJobSubmitResponse(BaseModel):
+    job_id: str
+    incident_id: str
+    status: str
+
+class IncidentJobStatus(BaseModel):
+    job_id: str
+    status: str  # queued, running, completed, failed
+    result: Optional[Dict[str, Any]] = None
+    error: Optional[str] = None
+
 class TimelineItem(BaseModel):
     id: UUID
     type: str  # 'hypothesis' or 'decision'
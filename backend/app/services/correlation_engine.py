@@ -0,0 +1,278 @@
+import json
+import uuid
+import logging
+from collections import OrderedDict, deque
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+import redis.asyncio as aioredis
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.config import settings
+from app.models.incident import Incident
+from app.services.incident_service import incident_service
+
+logger = logging.getLogger(__name__)
+
+# Payload fields that identify the entity an event is about
+ENTITY_FIELDS: Dict[str, Tuple[str, ...]] = {
+    "ip": ("src_ip", "source_ip", "client_ip", "remote_ip", "ip"),
+    "user": ("user", "username", "user_name", "account"),
+    "host": ("host", "hostname", "host_name", "device"),
+}
+
+def extract_entities(payload: Dict[str, Any]) -> List[Tuple[str, str]]:
+    """(kind, value) pairs of the entities found in an event payload."""
+    entities: List[Tuple[str, str]] = []
+    for kind, fields in ENTITY_FIELDS.items():
+        for field in fields:
+            value = payload.get(field)
+            if isinstance(value, (str, int)) and str(value):
+                entities.append((kind, str(value)))
+                break
+    return entities
+
+def correlation_record(row: Dict[str, Any]) -> Dict[str, Any]:
+    """Compact, JSON-serializable view of an ingested event row for the correlation worker."""
+    return {
+        "id": str(row["id"]),
+        "tenant_id": str(row["tenant_id"]),
+        "created_at": row["created_at"].isoformat(),
+        "event_type": row["event_type"],
+        "entities": extract_entities(row.get("payload") or {}),
+    }
+
+class _WindowState:
+    __slots__ = ("events", "incident_id", "incident_until")
+
+    def __init__(self):
+        # (epoch seconds, event id, created_at ISO, event type), oldest first
+        self.events: deque = deque(maxlen=settings.CORRELATION_MAX_WINDOW_EVENTS)
+        self.incident_id: Optional[str] = None
+        self.incident_until = 0.0
+
+    def copy(self) -> "_WindowState":
+        state = _WindowState()
+        state.events.extend(self.events)
+        state.incident_id = self.incident_id
+        state.incident_until = self.incident_until
+        return state
+
+    def to_json(self) -> str:
+        return json.dumps({"events": list(self.events), "incident_id": self.incident_id,
+                           "incident_until": self.incident_until})
+
+    @classmethod
+    def from_json(cls, raw: str) -> "_WindowState":
+        data = json.loads(raw)
+        state = cls()
+        state.events.extend(tuple(e) for e in data["events"])
+        state.incident_id = data["incident_id"]
+        state.incident_until = data["incident_until"]
+        return state
+
+class CorrelationEngine:
+    """
+    Groups ingested events into candidate incidents.
+
+    Events are keyed by (tenant, entity kind, entity value) and kept in a
+    sliding window of CORRELATION_WINDOW_SECONDS per key. When a window holds
+    CORRELATION_MIN_EVENTS events of at least CORRELATION_MIN_EVENT_TYPES
+    types, an Incident is opened and the window's events are linked to it.
+    Further events for that entity join the open incident until it has been
+    quiet for CORRELATION_INCIDENT_TTL_SECONDS. An event matching several
+    entities (IP and user of one login burst) opens at most one incident.
+
+    At most CORRELATION_MAX_KEYS windows stay in memory; the least recently
+    used ones spill to Redis and are restored when their entity shows up
+    again. Redis errors only lose the spilled windows.
+
+    A batch changes the windows only if its commit succeeds: windows are
+    snapshotted when first touched and restored if writing fails, so they
+    never point at an incident that was not stored.
+
+    State is per process, so run a single correlation worker (Celery queue
+    "correlation") per deployment.
+    """
+    KEY_PREFIX = "cybersentinel:correlation:"
+
+    def __init__(self, max_keys: Optional[int] = None, redis_client=None):
+        self.max_keys = max_keys or settings.CORRELATION_MAX_KEYS
+        self.window_seconds = settings.CORRELATION_WINDOW_SECONDS
+        self.incident_ttl = settings.CORRELATION_INCIDENT_TTL_SECONDS
+        self._states: "OrderedDict[str, _WindowState]" = OrderedDict()
+        self._spilled: Dict[str, _WindowState] = {}
+        self._redis = redis_client
+        # key -> state before the current batch touched it (None: new window)
+        self._snapshots: Optional[Dict[str, Optional[_WindowState]]] = None
+        self.stats = {"events": 0, "incidents_opened": 0, "events_linked": 0, "keys_spilled": 0, "keys_restored": 0}
+
+    async def process(self, db: AsyncSession, records: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Feeds a batch of correlation records (see correlation_record) through
+        the windows, writes new incidents and event links, and commits.
+
+        If writing fails, the windows are rolled back to their state before
+        the batch and the error is raised.
+
+        Returns:
+            The incidents opened by this batch (id, tenant_id, title).
+        """
+        records = sorted(records, key=lambda r: r["created_at"])
+        await self._restore({self._key(r["tenant_id"], kind, value) for r in records for kind, value in r["entities"]})
+
+        self._snapshots = {}
+        try:
+            opened, linked = await self._process(db, records)
+        except Exception:
+            await db.rollback()
+            self._rollback_windows()
+            raise
+        finally:
+            self._snapshots = None
+            await self._spill()
+
+        self.stats["incidents_opened"] += len(opened)
+        self.stats["events_linked"] += linked
+        for incident in opened:
+            logger.info(f"Correlation opened incident {incident['id']}: {incident['title']}")
+        return opened
+
+    async def _process(self, db: AsyncSession, records: List[Dict[str, Any]]) -> Tuple[List[Dict[str, Any]], int]:
+        opened: List[Dict[str, Any]] = []
+        links: Dict[Tuple[str, str], Dict[str, Any]] = {}
+        for record in records:
+            self.stats["events"] += 1
+            created_at = datetime.fromisoformat(record["created_at"])
+            ts = created_at.timestamp()
+            entry = (ts, record["id"], record["created_at"], record["event_type"])
+            event_incident: Optional[str] = None
+
+            for kind, value in record["entities"]:
+                state = self._state(self._key(record["tenant_id"], kind, value))
+                if state.incident_id and ts <= state.incident_until:
+                    state.incident_until = ts + self.incident_ttl
+                    event_incident = event_incident or state.incident_id
+                    self._link(links, state.incident_id, record["tenant_id"], entry)
+                    continue
+
+                state.incident_id = None
+                state.events.append(entry)
+                while state.events and state.events[0][0] < ts - self.window_seconds:
+                    state.events.popleft()
+                if not self._crossed(state):
+                    continue
+
+                if event_incident is None:
+                    incident = self._open_incident(record["tenant_id"], kind, value, state)
+                    db.add(incident)
+                    event_incident = str(incident.id)
+                    opened.append({"id": event_incident, "tenant_id": record["tenant_id"], "title": incident.title})
+                for window_entry in state.events:
+                    self._link(links, event_incident, record["tenant_id"], window_entry)
+                state.incident_id = event_incident
+                state.incident_until = ts + self.incident_ttl
+                state.events.clear()
+
+        linked = 0
+        if opened:
+            await db.flush()
+        if links:
+            # Only the links that were actually written (foreign or unknown incidents are skipped)
+            linked = await incident_service.link_events(db, list(links.values()))
+        await db.commit()
+        return opened, linked
+
+    def _rollback_windows(self) -> None:
+        for key, snapshot in self._snapshots.items():
+            self._states.pop(key, None)
+            self._spilled.pop(key, None)
+            if snapshot is not None:
+                self._put(key, snapshot)
+        logger.warning(f"Correlation batch failed; restored {len(self._snapshots)} windows")
+
+    def _crossed(self, state: _WindowState) -> bool:
+        if len(state.events) < settings.CORRELATION_MIN_EVENTS:
+            return False
+        return len({e[3] for e in state.events}) >= settings.CORRELATION_MIN_EVENT_TYPES
+
+    def _open_incident(self, tenant_id: str, kind: str, value: str, state: _WindowState) -> Incident:
+        event_types = sorted({e[3] for e in state.events})
+        span = int(state.events[-1][0] - state.events[0][0])
+        return Incident(
+            id=uuid.uuid4(),
+            tenant_id=uuid.UUID(tenant_id),
+            status="open",
+            title=f"Correlated activity for {kind} {value}",
+            description=f"{len(state.events)} events ({', '.join(event_types)}) within {span}s",
+        )
+
+    @staticmethod
+    def _link(links: Dict[Tuple[str, str], Dict[str, Any]], incident_id: str, tenant_id: str,
+              entry: Tuple[float, str, str, str]) -> None:
+        links[(incident_id, entry[1])] = {
+            "incident_id": uuid.UUID(incident_id),
+            "event_id": uuid.UUID(entry[1]),
+            "event_created_at": datetime.fromisoformat(entry[2]),
+            "tenant_id": uuid.UUID(tenant_id),
+        }
+
+    def _key(self, tenant_id: str, kind: str, value: str) -> str:
+        return f"{tenant_id}:{kind}:{value}"
+
+    def _state(self, key: str) -> _WindowState:
+        state = self._states.get(key)
+        if state is not None:
+            self._snapshot(key, state)
+            self._states.move_to_end(key)
+            return state
+        state = self._spilled.pop(key, None)
+        self._snapshot(key, state)
+        state = state or _WindowState()
+        self._put(key, state)
+        return state
+
+    def _snapshot(self, key: str, state: Optional[_WindowState]) -> None:
+        if self._snapshots is not None and key not in self._snapshots:
+            self._snapshots[key] = state.copy() if state is not None else None
+
+    def _put(self, key: str, state: _WindowState) -> None:
+        self._states[key] = state
+        while len(self._states) > self.max_keys:
+            old_key, old_state = self._states.popitem(last=False)
+            self._spilled[old_key] = old_state
+
+    def _client(self):
+        if self._redis is None and settings.CORRELATION_SPILL_REDIS_ENABLED:
+            self._redis = aioredis.from_url(settings.REDIS_URL, socket_connect_timeout=1, socket_timeout=1)
+        return self._redis
+
+    async def _restore(self, keys: Iterable[str]) -> None:
+        missing = [k for k in keys if k not in self._states]
+        client = self._client()
+        if not missing or client is None:
+            return
+        try:
+            values = await client.mget([self.KEY_PREFIX + k for k in missing])
+        except Exception as e:
+            logger.warning(f"Could not restore correlation windows from Redis: {e}")
+            return
+        for key, raw in zip(missing, values):
+            if raw is not None:
+                self._spilled[key] = _WindowState.from_json(raw)
+                self.stats["keys_restored"] += 1
+
+    async def _spill(self) -> None:
+        spilled, self._spilled = self._spilled, {}
+        client = self._client()
+        if not spilled or client is None:
+            return
+        ttl = int(max(self.window_seconds, self.incident_ttl))
+        try:
+            pipe = client.pipeline()
+            for key, state in spilled.items():
+                pipe.set(self.KEY_PREFIX + key, state.to_json(), ex=ttl)
+            await pipe.execute()
+            self.stats["keys_spilled"] += len(spilled)
+        except Exception as e:
+            logger.warning(f"Could not spill {len(spilled)} correlation windows to Redis: {e}")
+
+correlation_engine = CorrelationEngine()
@@ -0,0 +1,243 @@
+import json
+import asyncio
+import uuid
+import zlib
+import logging
+from datetime import datetime, timezone
+from typing import List, Dict, Any, Tuple, Optional, AsyncIterator
+from pydantic import TypeAdapter, ValidationError
+from sqlalchemy import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.config import settings
+from app.models.event import Event as EventModel
+from app.schemas.event import EventCreate, EventIngestResult, EventStreamIngestResponse
+from app.services.incident_service import incident_service
+from app.services.correlation_engine import correlation_record
+from app.workers.celery_app import celery_app
+
+logger = logging.getLogger(__name__)
+
+_event_adapter = TypeAdapter(EventCreate)
+
+# Column order used for both the COPY and the multi-row INSERT paths.
+# created_at is assigned on ingest so incident links can carry it.
+EVENT_COLUMNS = ("id", "tenant_id", "source", "event_type", "payload", "created_at")
+
+class EventIngestService:
+    """
+    Bulk validation and persistence of security events.
+    """
+    def parse_body(self, body: bytes, content_type: str) -> List[Any]:
+        """
+        Splits a request body into raw items.
+
+        JSON bodies must be an array; NDJSON bodies (application/x-ndjson,
+        application/jsonl) are one JSON document per line. Lines that fail to
+        decode are returned as ValueError instances so the caller can report
+        them per item instead of failing the whole request.
+        """
+        if "ndjson" in content_type or "jsonl" in content_type:
+            items: List[Any] = []
+            for line in body.splitlines():
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    items.append(json.loads(line))
+                except ValueError as e:
+                    # JSONDecodeError, or UnicodeDecodeError for a line that is not UTF-8
+                    items.append(ValueError(f"Invalid JSON: {e}"))
+            return items
+
+        data = json.loads(body)
+        if not isinstance(data, list):
+            raise ValueError("Request body must be a JSON array of events")
+        return data
+
+    def validate(self, items: List[Any]) -> Tuple[List[Dict[str, Any]], List[EventIngestResult]]:
+        """
+        Validates raw items as EventCreate.
+
+        Returns the rows ready for insertion (with pre-assigned ids) and a
+        result entry per input item, in input order.
+        """
+        rows: List[Dict[str, Any]] = []
+        results: List[EventIngestResult] = []
+        for index, item in enumerate(items):
+            row, result = self.validate_item(index, item)
+            if row is not None:
+                rows.append(row)
+            results.append(result)
+        return rows, results
+
+    def validate_item(self, index: int, item: Any) -> Tuple[Optional[Dict[str, Any]], EventIngestResult]:
+        """Validates a single raw item; returns (row or None, result)."""
+        if isinstance(item, ValueError):
+            return None, EventIngestResult(index=index, status="rejected", error=str(item))
+        try:
+            event = _event_adapter.validate_python(item)
+        except ValidationError as e:
+            errors = "; ".join(
+                f"{'.'.join(str(p) for p in err['loc'])}: {err['msg']}" for err in e.errors()
+            )
+            return None, EventIngestResult(index=index, status="rejected", error=errors)
+
+        row = self.to_row(event)
+        return row, EventIngestResult(index=index, status="accepted", id=row["id"])
+
+    def to_row(self, event: EventCreate) -> Dict[str, Any]:
+        """Insert row for a validated event, with a pre-assigned id and created_at."""
+        row = event.model_dump()
+        row["id"] = uuid.uuid4()
+        row["created_at"] = datetime.now(timezone.utc)
+        return row
+
+    async def bulk_insert(self, db: AsyncSession, rows: List[Dict[str, Any]]) -> None:
+        """
+        Writes all rows in one statement and commits.
+
+        On PostgreSQL/asyncpg this uses COPY; elsewhere it falls back to a
+        single executemany INSERT, which SQLAlchemy batches into multi-row
+        VALUES clauses. Rows carrying an incident_id are linked to that
+        incident in the same transaction.
+        """
+        if not rows:
+            return
+
+        if settings.INGEST_USE_COPY and db.bind.dialect.driver == "asyncpg":
+            conn = await db.connection()
+            raw = await conn.get_raw_connection()
+            records = [
+                (r["id"], r["tenant_id"], r["source"], r["event_type"], json.dumps(r["payload"]), r["created_at"])
+                for r in rows
+            ]
+            await raw.driver_connection.copy_records_to_table(
+                EventModel.__tablename__, records=records, columns=list(EVENT_COLUMNS)
+            )
+        else:
+            await db.execute(insert(EventModel), [{c: r[c] for c in EVENT_COLUMNS} for r in rows])
+
+        links = [
+            {"incident_id": r["incident_id"], "event_id": r["id"], "event_created_at": r["created_at"],
+             "tenant_id": r["tenant_id"]}
+            for r in rows if r.get("incident_id")
+        ]
+        if links:
+            await incident_service.link_events(db, links)
+
+        await db.commit()
+        logger.info(f"Bulk inserted {len(rows)} events")
+
+        if settings.CORRELATION_ENABLED:
+            await self.submit_for_correlation(rows)
+
+    async def submit_for_correlation(self, rows: List[Dict[str, Any]]) -> None:
+        """Hands committed rows to the correlation worker; failures never fail ingestion."""
+        records = [correlation_record(r) for r in rows]
+        records = [r for r in records if r["entities"]]
+        if not records:
+            return
+        try:
+            # send_task talks to the broker synchronously; keep it off the event loop
+            await asyncio.to_thread(celery_app.send_task, "tasks.correlate_events_task", args=[records])
+        except Exception as e:
+            logger.warning(f"Could not submit {len(records)} events for correlation: {e}")
+
+    async def iter_lines(self, chunks: AsyncIterator[bytes], gzipped: bool = False) -> AsyncIterator[bytes]:
+        """
+        Yields complete NDJSON lines from a chunked (optionally gzip-compressed)
+        body without ever holding more than one chunk plus one partial line.
+
+        Lines longer than INGEST_STREAM_MAX_LINE_BYTES raise ValueError, which
+        bounds the carry-over buffer for malformed or hostile uploads.
+        """
+        max_line = settings.INGEST_STREAM_MAX_LINE_BYTES
+        # 16 + MAX_WBITS: expect a gzip header and trailer
+        decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS) if gzipped else None
+        buffer = b""
+
+        async for chunk in chunks:
+            pieces = [chunk]
+            if decompressor is not None:
+                pieces = []
+                data = chunk
+                # Cap each decompression step so a highly compressed chunk
+                # cannot expand into an unbounded allocation.
+                while data:
+                    pieces.append(decompressor.decompress(data, max_line))
+                    data = decompressor.unconsumed_tail
+
+            for piece in pieces:
+                buffer += piece
+                *lines, buffer = buffer.split(b"\n")
+                for line in lines:
+                    yield line
+                if len(buffer) > max_line:
+                    raise ValueError(f"Line exceeds {max_line} bytes")
+
+        if decompressor is not None:
+            buffer += decompressor.flush()
+            if not decompressor.eof:
+                raise ValueError("Truncated gzip stream")
+            *lines, buffer = buffer.split(b"\n")
+            for line in lines:
+                yield line
+        if buffer:
+            yield buffer
+
+    async def ingest_stream(
+        self, db: AsyncSession, chunks: AsyncIterator[bytes], gzipped: bool = False
+    ) -> EventStreamIngestResponse:
+        """
+        Parses, validates and stores an NDJSON stream in bounded micro-batches.
+
+        The next chunk is only pulled from the request once the pending
+        micro-batch has been flushed, so a slow database throttles the reader
+        (and, through TCP flow control, the client) instead of letting rows
+        pile up in memory. Each micro-batch is committed independently.
+        """
+        flush_rows = settings.INGEST_STREAM_FLUSH_ROWS
+        max_errors = settings.INGEST_STREAM_MAX_ERRORS
+        pending: List[Dict[str, Any]] = []
+        errors: List[EventIngestResult] = []
+        accepted = rejected = batches = 0
+        index = 0
+
+        async for line in self.iter_lines(chunks, gzipped=gzipped):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                item: Any = json.loads(line)
+            except ValueError as e:
+                # JSONDecodeError, or UnicodeDecodeError for a line that is not UTF-8
+                item = ValueError(f"Invalid JSON: {e}")
+
+            row, result = self.validate_item(index, item)
+            index += 1
+            if row is None:
+                rejected += 1
+                if len(errors) < max_errors:
+                    errors.append(result)
+                continue
+
+            pending.append(row)
+            if len(pending) >= flush_rows:
+                await self.bulk_insert(db, pending)
+                accepted += len(pending)
+                batches += 1
+                pending = []
+
+        if pending:
+            await self.bulk_insert(db, pending)
+            accepted += len(pending)
+            batches += 1
+
+        return EventStreamIngestResponse(
+            accepted=accepted,
+            rejected=rejected,
+            batches=batches,
+            errors=errors
+        )
+
+event_ingest_service = EventIngestService()
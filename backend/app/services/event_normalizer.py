@@ -0,0 +1,136 @@
+import re
+import json
+import hashlib
+from collections import Counter
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Tuple
+from app.config import settings
+
+# Masks applied in order; earlier patterns win over the generic number mask.
+_MASKS: List[Tuple[re.Pattern, str]] = [
+    (re.compile(r"\b\d{4}-\d{2}-\d{2}[T ]\d{2}:\d{2}:\d{2}(?:\.\d+)?(?:Z|[+-]\d{2}:?\d{2})?\b"), "<TS>"),
+    (re.compile(r"\b[A-Z][a-z]{2} +\d{1,2} \d{2}:\d{2}:\d{2}\b"), "<TS>"),
+    (re.compile(r"\b[0-9a-fA-F]{8}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{12}\b"), "<UUID>"),
+    (re.compile(r"\b(?:\d{1,3}\.){3}\d{1,3}(?::\d+)?\b"), "<IP>"),
+    (re.compile(r"\b(?:[0-9a-fA-F]{1,4}:){2,7}[0-9a-fA-F]{1,4}\b"), "<IP>"),
+    (re.compile(r"\b[0-9a-fA-F]{16,}\b"), "<HEX>"),
+    (re.compile(r"\b\d+\b"), "<N>"),
+]
+_IP_RE = re.compile(r"\b(?:\d{1,3}\.){3}\d{1,3}\b")
+
+# Fields that identify *when* something happened rather than *what* happened
+_TIME_FIELDS = {"timestamp", "created_at", "time", "@timestamp"}
+
+class EventNormalizer:
+    """
+    Collapses raw security events into fingerprinted groups.
+
+    Each event is reduced to a template by masking timestamps, IPs, ids and
+    counters; events sharing a template are counted together and a few raw
+    exemplars are kept. The resulting prompt grows with the number of
+    distinct patterns rather than with raw event volume.
+    """
+    def mask(self, text: str) -> str:
+        for pattern, token in _MASKS:
+            text = pattern.sub(token, text)
+        return text
+
+    def template(self, event: Dict[str, Any]) -> Dict[str, Any]:
+        """Masked, time-free view of an event used for fingerprinting."""
+        return {
+            key: self._mask_value(value)
+            for key, value in sorted(event.items())
+            if key not in _TIME_FIELDS
+        }
+
+    def fingerprint(self, template: Dict[str, Any]) -> str:
+        encoded = json.dumps(template, sort_keys=True, default=str).encode("utf-8")
+        return hashlib.sha1(encoded).hexdigest()[:12]
+
+    def aggregate(self, events: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Groups events by fingerprint.
+
+        Returns groups ordered by descending count with the pattern, count,
+        time span, most frequent IPs and up to EVENT_GROUP_MAX_EXEMPLARS raw
+        events (without their timestamps). Groups beyond
+        EVENT_GROUP_MAX_GROUPS are folded into a single "other" group.
+        """
+        groups: Dict[str, Dict[str, Any]] = {}
+        for event in events:
+            template = self.template(event)
+            fp = self.fingerprint(template)
+            group = groups.get(fp)
+            if group is None:
+                group = groups[fp] = {
+                    "fingerprint": fp,
+                    "pattern": template,
+                    "count": 0,
+                    "exemplars": [],
+                    "_ips": Counter(),
+                    "_times": [],
+                }
+            group["count"] += 1
+            if len(group["exemplars"]) < settings.EVENT_GROUP_MAX_EXEMPLARS:
+                group["exemplars"].append({k: v for k, v in event.items() if k not in _TIME_FIELDS})
+            group["_ips"].update(self._extract_ips(event))
+            ts = self._parse_time(event)
+            if ts is not None:
+                group["_times"].append(ts)
+
+        ordered = sorted(groups.values(), key=lambda g: (-g["count"], g["fingerprint"]))
+        result = [self._finalize(g) for g in ordered[:settings.EVENT_GROUP_MAX_GROUPS]]
+
+        overflow = ordered[settings.EVENT_GROUP_MAX_GROUPS:]
+        if overflow:
+            result.append({
+                "fingerprint": "other",
+                "pattern": f"{len(overflow)} additional low-frequency patterns",
+                "count": sum(g["count"] for g in overflow),
+                "exemplars": [g["exemplars"][0] for g in overflow[:settings.EVENT_GROUP_MAX_EXEMPLARS]],
+            })
+        return result
+
+    def _finalize(self, group: Dict[str, Any]) -> Dict[str, Any]:
+        ips: Counter = group.pop("_ips")
+        times: List[datetime] = group.pop("_times")
+        if ips:
+            group["distinct_ips"] = len(ips)
+            group["top_ips"] = [ip for ip, _ in ips.most_common(settings.EVENT_GROUP_TOP_VALUES)]
+        if len(times) > 1:
+            group["span_seconds"] = int((max(times) - min(times)).total_seconds())
+        return group
+
+    def _mask_value(self, value: Any) -> Any:
+        if isinstance(value, str):
+            return self.mask(value)
+        if isinstance(value, bool) or value is None:
+            return value
+        if isinstance(value, (int, float)):
+            return "<N>"
+        if isinstance(value, dict):
+            return {k: self._mask_value(v) for k, v in sorted(value.items()) if k not in _TIME_FIELDS}
+        if isinstance(value, (list, tuple)):
+            # Lists (ports, ids) vary in length; keep only the distinct masked shapes
+            masked = {json.dumps(self._mask_value(v), sort_keys=True, default=str) for v in value}
+            return [json.loads(m) for m in sorted(masked)]
+        return self.mask(str(value))
+
+    def _extract_ips(self, event: Dict[str, Any]) -> List[str]:
+        return _IP_RE.findall(json.dumps(event, default=str))
+
+    @staticmethod
+    def _parse_time(event: Dict[str, Any]) -> Optional[datetime]:
+        for field in _TIME_FIELDS:
+            value = event.get(field)
+            if isinstance(value, str):
+                try:
+                    value = datetime.fromisoformat(value.replace("Z", "+00:00"))
+                except ValueError:
+                    continue
+            if isinstance(value, datetime):
+                # Treat naive timestamps as UTC so spans can be computed
+                return value if value.tzinfo else value.replace(tzinfo=timezone.utc)
+        return None
+
+event_normalizer = EventNormalizer()
@@ -1,16 +1,26 @@
 import os
 import json
+import time
 import logging
 import asyncio
-from typing import Any, Dict, List, Optional
-import google.generativeai as genai
+from typing import Any, Awaitable, Callable, Dict, List, Optional
 from pydantic import BaseModel, Field, ValidationError
 from google.api_core import exceptions
 
 from app.config import settings
+from app.logging_config import body_logger, body_sampler
+from app.services.json_stream import JSONArrayStreamParser
+from app.services.llm_cache import LLMResponseCache, llm_cache
+from app.services.llm_providers import LLMProvider, ModelSpec, build_provider
+from app.services.model_router import FAST, ModelRouter, model_router
+from app.services.prompt_builder import PromptBuilder, estimate_tokens
+from app.services.rate_limiter import LLMRateLimiter, llm_rate_limiter, backoff_delay
+from app.services.structured_output import StructuredOutputError, StructuredOutputParser
+from app.services.telemetry import (
+    LLM_ADMISSION_WAIT_SECONDS, LLM_ATTEMPTS, LLM_COALESCED_CALLS, LLM_PROMPT_CHARS, LLM_RESPONSE_CHARS,
+    LLM_RETRY_SLEEP_SECONDS, span,
+)
 
-# Configure logging
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 from enum import Enum
@@ -59,88 +69,277 @@ class AnalysisResult(BaseModel):
     recommended_actions: List[str]
     confidence: float
 
+# Built once; each compiles its schema's validator at import time
+HYPOTHESIS_PARSER = StructuredOutputParser(HypothesisResponse, "generate_hypothesis", salvage_key="hypotheses",
+                                           item_schema=Hypothesis)
+PLAN_PARSER = StructuredOutputParser(ResponsePlan, "plan_response")
+CRITIQUE_PARSER = StructuredOutputParser(CritiqueResponse, "critique_decision")
+ANALYSIS_PARSER = StructuredOutputParser(AnalysisResult, "analyze_events")
+STRUCTURED_PARSER = StructuredOutputParser(Dict[str, Any], "generate_structured")
+
+def _top_confidence(result: Dict[str, Any]) -> float:
+    """Confidence of the best hypothesis, for escalating fast-model answers."""
+    return max((h["confidence"] for h in result["hypotheses"]), default=0.0)
+
 class GeminiService:
-    def __init__(self, api_key: Optional[str] = None):
-        self.api_key = api_key or settings.GEMINI_API_KEY
-        
-        if self.api_key:
-            genai.configure(api_key=self.api_key)
-            
-        self.model_name = 'gemini-1.5-pro'
+    def __init__(self, api_key: Optional[str] = None, cache: Optional[LLMResponseCache] = None,
+                 rate_limiter: Optional[LLMRateLimiter] = None, provider: Optional[LLMProvider] = None,
+                 router: Optional[ModelRouter] = None):
+        # Backend that produces the text; see LLM_PROVIDER
+        self.provider = provider or build_provider(api_key=api_key)
+        # Fast or large model per call; see LLM_ROUTING_ENABLED
+        self.router = router or model_router
         self.max_retries = 3
         self.timeout = 30
-        self._model_instance = None
-
-    @property
-    def model(self):
-        if self._model_instance is None:
-            if not self.api_key:
-                logger.error("GEMINI_API_KEY is required but not set.")
-                raise ValueError("GEMINI_API_KEY is required but not set.")
-            
-            # Re-configure to be sure
-            genai.configure(api_key=self.api_key)
-            
-            self._model_instance = genai.GenerativeModel(
-                model_name=self.model_name,
-                generation_config={
-                    "temperature": 0.7,
-                    "top_p": 0.95,
-                    "response_mime_type": "application/json",
-                }
-            )
-        return self._model_instance
+        self.cache = cache or llm_cache
+        self.rate_limiter = rate_limiter or llm_rate_limiter
+        # prompt hash -> shared in-flight request (single-flight)
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self.stats = {"model_calls": 0, "coalesced_calls": 0, "streamed_calls": 0}
+
+    def _cache_key(self, method: str, prompt: str, model: Optional[ModelSpec] = None) -> str:
+        model_name, config = self.provider.model_name, self.provider.generation_config
+        if model is not None:
+            model_name, config = f"{self.provider.name}:{model.name}", {**config, "temperature": model.temperature}
+        return self.cache.make_key(method, model_name, config, prompt)
+
+    async def _generate_content(self, prompt: str, task: Optional[str] = None,
+                                model: Optional[ModelSpec] = None) -> str:
+        """
+        Returns the model response for a prompt, coalescing identical calls.
+
+        Concurrent callers with the same prompt (and model/config) share one
+        in-flight request; its result or exception is delivered to all of
+        them. A caller being cancelled does not cancel the shared request.
+        """
+        if not settings.LLM_SINGLE_FLIGHT_ENABLED:
+            return await self._call_model(prompt, task=task, model=model)
+
+        key = self._cache_key("generate_content", prompt, model)
+        shared = self._inflight.get(key)
+        if shared is not None:
+            self.stats["coalesced_calls"] += 1
+            LLM_COALESCED_CALLS.labels(task or "unknown").inc()
+            logger.info("Joining in-flight Gemini request for identical prompt")
+            return await asyncio.shield(shared)
+
+        shared = asyncio.ensure_future(self._call_model(prompt, task=task, model=model))
+        self._inflight[key] = shared
+
+        def _done(task: asyncio.Future):
+            if self._inflight.get(key) is task:
+                del self._inflight[key]
+            # Mark the exception retrieved even if every caller was cancelled
+            if not task.cancelled():
+                task.exception()
+
+        shared.add_done_callback(_done)
+        return await asyncio.shield(shared)
+
+    async def _call_model(self, prompt: str, task: Optional[str] = None,
+                          on_text: Optional[Callable[[str], Awaitable[None]]] = None,
+                          model: Optional[ModelSpec] = None) -> str:
+        """
+        Helper for API calls with retries and timeout.
+
+        With on_text, the response is streamed and each text chunk is handed
+        to on_text as it arrives. A streamed call is only retried until its
+        first chunk has been delivered, so callers never see output twice.
+        The whole call, retries included, is recorded as the llm.<task> span.
+        """
+        label = task or "unknown"
+        LLM_PROMPT_CHARS.labels(label).observe(len(prompt))
+        with span(f"llm.{label}"):
+            response_text = await self._call_with_retries(prompt, task, label, on_text, model)
+        LLM_RESPONSE_CHARS.labels(label).observe(len(response_text))
+        return response_text
 
-    async def _generate_content(self, prompt: str) -> str:
-        """Helper for API calls with retries and timeout."""
+    async def _call_with_retries(self, prompt: str, task: Optional[str], label: str,
+                                 on_text: Optional[Callable[[str], Awaitable[None]]],
+                                 model: Optional[ModelSpec] = None) -> str:
+        self.stats["model_calls"] += 1
         last_exception = None
+        estimated_tokens = estimate_tokens(prompt) + settings.LLM_EXPECTED_OUTPUT_TOKENS
         for attempt in range(self.max_retries):
+            streamed: List[str] = []
+            is_last_attempt = attempt == self.max_retries - 1
             try:
-                logger.info(f"Calling Gemini API (attempt {attempt + 1})")
-                logger.debug(f"Prompt: {prompt}")
+                logger.debug("Calling %s model %s for %s (attempt %d)", self.provider.name,
+                             model.name if model is not None else self.provider.model_name, label, attempt + 1)
+                if body_sampler.sample("prompt"):
+                    body_logger.info("%s prompt (%d chars): %s", label, len(prompt), body_sampler.clip(prompt))
                 
-                # Using generate_content_async for asynchronous call
-                response = await asyncio.wait_for(
-                    self.model.generate_content_async(prompt),
-                    timeout=self.timeout
-                )
-                
-                if hasattr(response, 'text'):
-                    response_text = response.text
-                else:
-                    # Fallback if text attribute is missing for some reason
-                    response_text = str(response)
+                # Wait for an in-flight slot and rate budget (critical incidents first)
+                queued_at = time.perf_counter()
+                async with self.rate_limiter.acquire(estimated_tokens):
+                    LLM_ADMISSION_WAIT_SECONDS.labels(label).observe(time.perf_counter() - queued_at)
+                    if on_text is not None:
+                        response_text = await self._read_stream(prompt, task, on_text, streamed, model)
+                    else:
+                        response_text = await asyncio.wait_for(
+                            self.provider.generate(prompt, task=task, model=model),
+                            timeout=self.timeout
+                        )
 
-                logger.info(f"Received response from Gemini API: {response_text[:200]}...")
+                self.rate_limiter.settle(estimated_tokens, estimate_tokens(prompt) + estimate_tokens(response_text))
+                LLM_ATTEMPTS.labels(label, "ok").inc()
+                logger.debug("Received %s response (%d chars)", label, len(response_text))
+                if body_sampler.sample("response"):
+                    body_logger.info("%s response (%d chars): %s", label, len(response_text),
+                                     body_sampler.clip(response_text))
                 return response_text
                 
             except (exceptions.InternalServerError, exceptions.ServiceUnavailable, exceptions.DeadlineExceeded) as e:
                 last_exception = e
-                wait_time = 2 ** attempt
-                logger.warning(f"Gemini API error (attempt {attempt + 1}): {e}. Retrying in {wait_time}s...")
-                await asyncio.sleep(wait_time)
+                LLM_ATTEMPTS.labels(label, "error").inc()
+                if streamed:
+                    raise
+                if not is_last_attempt:
+                    wait_time = backoff_delay(attempt)
+                    LLM_RETRY_SLEEP_SECONDS.labels(label, "error").observe(wait_time)
+                    logger.warning("Gemini API error (attempt %d): %s. Retrying in %.1fs...", attempt + 1, e, wait_time)
+                    await asyncio.sleep(wait_time)
             except asyncio.TimeoutError:
                 last_exception = Exception(f"Timeout of {self.timeout}s exceeded during Gemini API call")
-                logger.warning(f"Gemini API timeout (attempt {attempt + 1}). Retrying...")
+                LLM_ATTEMPTS.labels(label, "timeout").inc()
+                if streamed:
+                    raise last_exception
+                logger.warning("Gemini API timeout (attempt %d). Retrying...", attempt + 1)
             except exceptions.ResourceExhausted as e:
                 last_exception = e
-                wait_time = 5 * (attempt + 1)
-                logger.warning(f"Gemini API rate limit exceeded: {e}. Retrying in {wait_time}s...")
-                await asyncio.sleep(wait_time)
+                LLM_ATTEMPTS.labels(label, "rate_limited").inc()
+                if streamed:
+                    raise
+                if not is_last_attempt:
+                    # Quota errors need a longer cool-down; jitter keeps callers from retrying in lockstep
+                    wait_time = backoff_delay(attempt, base=settings.LLM_BACKOFF_BASE_SECONDS * 5)
+                    LLM_RETRY_SLEEP_SECONDS.labels(label, "rate_limited").observe(wait_time)
+                    logger.warning("Gemini API rate limit exceeded: %s. Retrying in %.1fs...", e, wait_time)
+                    await asyncio.sleep(wait_time)
             except Exception as e:
-                logger.error(f"Unexpected error during Gemini API call: {e}")
+                LLM_ATTEMPTS.labels(label, "unexpected").inc()
+                logger.error("Unexpected error during Gemini API call: %s", e)
                 raise
         
         raise last_exception or Exception("Failed to generate content after retries")
 
-    async def generate_hypothesis(self, incident_data: Dict[str, Any]) -> Dict[str, Any]:
+    async def _read_stream(self, prompt: str, task: Optional[str], on_text: Callable[[str], Awaitable[None]],
+                           streamed: List[str], model: Optional[ModelSpec] = None) -> str:
+        """Streams one response into `streamed`; the timeout applies to the wait for each chunk."""
+        chunks = self.provider.stream(prompt, task=task, model=model).__aiter__()
+        try:
+            while True:
+                try:
+                    text = await asyncio.wait_for(chunks.__anext__(), timeout=self.timeout)
+                except StopAsyncIteration:
+                    break
+                streamed.append(text)
+                await on_text(text)
+        finally:
+            await chunks.aclose()
+        return "".join(streamed)
+
+    async def _generate_routed(self, prompt: str, task: str, parser: StructuredOutputParser, model: ModelSpec,
+                               route: Optional[str] = None,
+                               confidence: Optional[Callable[[Dict[str, Any]], float]] = None,
+                               call: Optional[Callable[[ModelSpec], Awaitable[str]]] = None,
+                               cache_key: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Generates and parses a response, starting on `model` (see ModelRouter.choose).
+
+        A fast-model response that fails validation, or whose
+        confidence(result) is below LLM_ROUTE_ESCALATE_CONFIDENCE, is asked
+        again of the large model. `call` replaces the plain model call, e.g.
+        to stream. With cache_key the result is cached, unless the parser
+        had to repair it or drop invalid items.
+        """
+        route = route or task
+        call = call or (lambda spec: self._generate_content(prompt, task=task, model=spec))
+        while True:
+            started = time.perf_counter()
+            response_text = await call(model)
+            self.router.record(route, model, time.perf_counter() - started)
+            if model.tier != FAST:
+                result, clean = parser.dump_checked(response_text)
+                break
+            try:
+                result, clean = parser.dump_checked(response_text)
+            except StructuredOutputError:
+                model = self.router.escalate(route, "invalid")
+                continue
+            if confidence is not None and confidence(result) < settings.LLM_ROUTE_ESCALATE_CONFIDENCE:
+                model = self.router.escalate(route, "low_confidence")
+                continue
+            break
+
+        if cache_key is not None and clean:
+            await self.cache.set(cache_key, result)
+        return result
+
+    async def _stream_hypotheses(self, prompt: str,
+                                 on_hypothesis: Callable[[int, Dict[str, Any]], Awaitable[None]],
+                                 model: Optional[ModelSpec] = None) -> str:
+        """
+        Streams a hypothesis response and calls on_hypothesis(index, hypothesis)
+        for each hypothesis as soon as its JSON object is complete.
+
+        Hypotheses are handed to a separate delivery task, so a slow
+        on_hypothesis (e.g. a Redis publish) never holds the model call's
+        rate-limiter slot. Returns once every hypothesis has been delivered.
+        """
+        parser = JSONArrayStreamParser(key="hypotheses")
+        outbox: asyncio.Queue = asyncio.Queue()
+        delivered = 0
+
+        async def on_text(text: str):
+            nonlocal delivered
+            for item in parser.feed(text):
+                try:
+                    hypothesis = Hypothesis(**item).model_dump(mode="json")
+                except (TypeError, ValidationError) as e:
+                    logger.warning("Skipping invalid streamed hypothesis: %s", e)
+                    continue
+                outbox.put_nowait((delivered, hypothesis))
+                delivered += 1
+
+        async def deliver():
+            while True:
+                item = await outbox.get()
+                if item is None:
+                    return
+                try:
+                    await on_hypothesis(*item)
+                except Exception as e:
+                    logger.warning("Failed to deliver streamed hypothesis %s: %s", item[0], e)
+
+        self.stats["streamed_calls"] += 1
+        delivery = asyncio.create_task(deliver())
+        try:
+            return await self._call_model(prompt, task="generate_hypothesis", on_text=on_text, model=model)
+        finally:
+            outbox.put_nowait(None)
+            await delivery
+
+    async def generate_hypothesis(self, incident_data: Dict[str, Any],
+                                  on_hypothesis: Optional[Callable[[int, Dict[str, Any]], Awaitable[None]]] = None
+                                  ) -> Dict[str, Any]:
         """
         Analyze security events and generate 3 competing hypotheses.
+
+        With on_hypothesis (and LLM_STREAMING_ENABLED), the response is
+        streamed and each hypothesis is passed to on_hypothesis(index,
+        hypothesis) as soon as it has been generated. Streamed calls are not
+        coalesced with identical in-flight prompts; cached results are passed
+        to on_hypothesis one by one as well. Only the large model streams
+        live: a fast-model answer may still be escalated, so it is buffered
+        and its hypotheses are passed on once it has been accepted.
         """
         events = incident_data.get("events", [])
+        event_groups = incident_data.get("event_groups")
         context = incident_data.get("context", "")
-        
-        prompt = (
+
+        builder = PromptBuilder(name="generate_hypothesis")
+        builder.add("instructions", (
             "You are a cybersecurity expert. Analyze these security events and generate 3 competing hypotheses about what's happening. "
             "For each hypothesis, provide:\n"
             "- hypothesis_text: Brief description\n"
@@ -153,53 +352,102 @@ class GeminiService:
             '    {"hypothesis_text": str, "confidence": float, "evidence": [str], "threat_type": str}\n'
             "  ]\n"
             "}\n\n"
-            f"Security Events: {json.dumps(events)}\n"
-            f"Context: {context}"
-        )
-        
+        ), required=True)
+
+        if event_groups is not None:
+            total = incident_data.get("total_events", sum(g.get("count", 0) for g in event_groups))
+            builder.add_items(
+                "events",
+                [json.dumps(g, default=str) for g in event_groups],
+                priority=10,
+                header=(
+                    f"Security Events ({total} events grouped into {len(event_groups)} distinct patterns, one per line; "
+                    "timestamps, IPs and counters in 'pattern' are masked, 'exemplars' are raw samples):\n"
+                ),
+                footer="\n"
+            )
+        else:
+            builder.add_items(
+                "events",
+                [json.dumps(e, default=str) for e in events],
+                priority=10,
+                header="Security Events (one per line):\n",
+                footer="\n"
+            )
+        builder.add("context", f"Context: {context}", priority=5)
+
+        prompt = builder.build().text
+
+        if event_groups is not None:
+            self.router.note_patterns(len(event_groups))
+        model = self.router.choose("generate_hypothesis")
+        cache_key = self._cache_key("generate_hypothesis", prompt, model)
+        cached = await self.cache.get(cache_key)
+        if cached is not None:
+            # Subscribers get the cached hypotheses as if they had been streamed
+            if on_hypothesis is not None:
+                await self._replay_hypotheses(cached, on_hypothesis)
+            return cached
+
         try:
-            response_text = await self._generate_content(prompt)
-            # Clean up potentially markdown-wrapped JSON
-            cleaned_text = response_text.strip()
-            if cleaned_text.startswith("```json"):
-                cleaned_text = cleaned_text[7:]
-            if cleaned_text.startswith("```"):
-                cleaned_text = cleaned_text[3:]
-            if cleaned_text.endswith("```"):
-                cleaned_text = cleaned_text[:-3]
-            cleaned_text = cleaned_text.strip()
-            
-            data = json.loads(cleaned_text)
-            validated = HypothesisResponse(**data)
-            return validated.model_dump()
-        except (json.JSONDecodeError, ValidationError) as e:
-            logger.error(f"Malformed response in generate_hypothesis: {e}")
+            call = None
+            streamed = False
+            if on_hypothesis is not None and settings.LLM_STREAMING_ENABLED:
+                async def call(spec: ModelSpec) -> str:
+                    nonlocal streamed
+                    streamed = spec.tier != FAST
+                    if streamed:
+                        return await self._stream_hypotheses(prompt, on_hypothesis, spec)
+                    return await self._generate_content(prompt, task="generate_hypothesis", model=spec)
+            result = await self._generate_routed(prompt, "generate_hypothesis", HYPOTHESIS_PARSER, model,
+                                                 confidence=_top_confidence, call=call, cache_key=cache_key)
+            if call is not None and not streamed:
+                await self._replay_hypotheses(result, on_hypothesis)
+            return result
+        except StructuredOutputError as e:
+            logger.error("Malformed response in generate_hypothesis: %s", e)
             return {"error": "Malformed response from AI", "details": str(e), "hypotheses": []}
         except Exception as e:
-            logger.error(f"Error in generate_hypothesis: {e}")
+            logger.error("Error in generate_hypothesis: %s", e)
             return {"error": str(e), "hypotheses": []}
 
+    @staticmethod
+    async def _replay_hypotheses(result: Dict[str, Any],
+                                 on_hypothesis: Callable[[int, Dict[str, Any]], Awaitable[None]]) -> None:
+        """Passes the hypotheses of a finished (cached or buffered) result to on_hypothesis one by one."""
+        for index, hypothesis in enumerate(result.get("hypotheses", [])):
+            await on_hypothesis(index, hypothesis)
+
     async def plan_response(self, hypothesis: Dict[str, Any], incident_context: Dict[str, Any], critique: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
         """
         Given a hypothesis and incident context, plan a response.
         If a critique is provided, refine the plan based on feedback.
         """
-        prompt = (
+        builder = PromptBuilder(name="plan_response")
+        builder.add("instructions", (
             "Given this security threat hypothesis, plan a response. Provide:\n"
             "- actions: List of containment actions (e.g., 'Block IP', 'Isolate host', 'Reset credentials')\n"
             "- priority: (critical|high|medium|low)\n"
             "- estimated_impact: Brief description\n"
             "- false_positive_risk: Float 0-1\n\n"
-        )
-        
+        ), required=True)
+
         if critique:
-            prompt += (
-                "IMPORTANT: A previous plan was rejected. Please address these concerns and incorporate suggested revisions:\n"
-                f"Concerns: {json.dumps(critique.get('concerns', []))}\n"
-                f"Suggested Revisions: {json.dumps(critique.get('revised_actions', []))}\n\n"
+            builder.add(
+                "critique_intro",
+                "IMPORTANT: A previous plan was rejected. Please address these concerns and incorporate suggested revisions:\n",
+                required=True
+            )
+            builder.add_items(
+                "concerns", [json.dumps(c) for c in critique.get("concerns", []) or []],
+                priority=30, header="Concerns: [", separator=", ", footer="]\n"
+            )
+            builder.add_items(
+                "revised_actions", [json.dumps(a) for a in critique.get("revised_actions", []) or []],
+                priority=25, header="Suggested Revisions: [", separator=", ", footer="]\n\n"
             )
-            
-        prompt += (
+
+        builder.add("schema", (
             "Return JSON:\n"
             "{\n"
             '  "actions": [str],\n'
@@ -207,37 +455,38 @@ class GeminiService:
             '  "estimated_impact": str,\n'
             '  "false_positive_risk": float\n'
             "}\n\n"
-            f"Hypothesis: {json.dumps(hypothesis)}\n"
-            f"Incident Context: {json.dumps(incident_context)}"
-        )
-        
+        ), required=True)
+        builder.add("hypothesis", f"Hypothesis: {json.dumps(hypothesis)}\n", required=True)
+        builder.add("incident_context", f"Incident Context: {json.dumps(incident_context)}", priority=5)
+
+        prompt = builder.build().text
+
+        # Re-planning after a critique is routed separately (LLM_ROUTE_FAST_TASKS)
+        route = "replan_response" if critique else "plan_response"
+        model = self.router.choose(route)
+        cache_key = self._cache_key("plan_response", prompt, model)
+        cached = await self.cache.get(cache_key)
+        if cached is not None:
+            return cached
+
         try:
-            response_text = await self._generate_content(prompt)
-            # Clean up potentially markdown-wrapped JSON
-            cleaned_text = response_text.strip()
-            if cleaned_text.startswith("```json"):
-                cleaned_text = cleaned_text[7:]
-            if cleaned_text.startswith("```"):
-                cleaned_text = cleaned_text[3:]
-            if cleaned_text.endswith("```"):
-                cleaned_text = cleaned_text[:-3]
-            cleaned_text = cleaned_text.strip()
-            
-            data = json.loads(cleaned_text)
-            validated = ResponsePlan(**data)
-            return validated.model_dump()
-        except (json.JSONDecodeError, ValidationError) as e:
-            logger.error(f"Malformed response in plan_response: {e}")
+            # Plans carry no confidence (false_positive_risk is about the threat), so
+            # only an invalid fast answer is escalated
+            return await self._generate_routed(prompt, "plan_response", PLAN_PARSER, model, route=route,
+                                               cache_key=cache_key)
+        except StructuredOutputError as e:
+            logger.error("Malformed response in plan_response: %s", e)
             return {"error": "Malformed response from AI", "details": str(e), "actions": [], "priority": "medium"}
         except Exception as e:
-            logger.error(f"Error in plan_response: {e}")
+            logger.error("Error in plan_response: %s", e)
             return {"error": str(e), "actions": [], "priority": "medium"}
 
     async def critique_decision(self, hypothesis: Dict[str, Any], response_plan: Dict[str, Any]) -> Dict[str, Any]:
         """
         Critically evaluate a proposed incident response.
         """
-        prompt = (
+        builder = PromptBuilder(name="critique_decision")
+        builder.add("instructions", (
             "You are a security analyst reviewing a proposed incident response. Critically evaluate:\n"
             "- Is the hypothesis well-supported by evidence?\n"
             "- Are the proposed actions appropriate?\n"
@@ -250,30 +499,26 @@ class GeminiService:
             '  "concerns": [str],\n'
             '  "revised_actions": [str] (if not approved)\n'
             "}\n\n"
-            f"Hypothesis: {json.dumps(hypothesis)}\n"
-            f"Proposed Response Plan: {json.dumps(response_plan)}"
-        )
-        
+        ), required=True)
+        builder.add("hypothesis", f"Hypothesis: {json.dumps(hypothesis)}\n", required=True)
+        builder.add("response_plan", f"Proposed Response Plan: {json.dumps(response_plan)}", required=True)
+
+        prompt = builder.build().text
+
+        model = self.router.choose("critique_decision")
+        cache_key = self._cache_key("critique_decision", prompt, model)
+        cached = await self.cache.get(cache_key)
+        if cached is not None:
+            return cached
+
         try:
-            response_text = await self._generate_content(prompt)
-            # Clean up potentially markdown-wrapped JSON
-            cleaned_text = response_text.strip()
-            if cleaned_text.startswith("```json"):
-                cleaned_text = cleaned_text[7:]
-            if cleaned_text.startswith("```"):
-                cleaned_text = cleaned_text[3:]
-            if cleaned_text.endswith("```"):
-                cleaned_text = cleaned_text[:-3]
-            cleaned_text = cleaned_text.strip()
-            
-            data = json.loads(cleaned_text)
-            validated = CritiqueResponse(**data)
-            return validated.model_dump()
-        except (json.JSONDecodeError, ValidationError) as e:
-            logger.error(f"Malformed response in critique_decision: {e}")
+            return await self._generate_routed(prompt, "critique_decision", CRITIQUE_PARSER, model,
+                                               cache_key=cache_key)
+        except StructuredOutputError as e:
+            logger.error("Malformed response in critique_decision: %s", e)
             return {"error": "Malformed response from AI", "details": str(e), "approved": False, "concerns": ["Parsing error"]}
         except Exception as e:
-            logger.error(f"Error in critique_decision: {e}")
+            logger.error("Error in critique_decision: %s", e)
             return {"error": str(e), "approved": False, "concerns": ["Internal error"]}
 
     async def analyze_events(self, events: List[Dict[str, Any]]) -> Dict[str, Any]:
@@ -294,12 +539,11 @@ class GeminiService:
         )
         
         try:
-            response_text = await self._generate_content(prompt)
-            data = json.loads(response_text)
-            validated = AnalysisResult(**data)
-            return validated.model_dump()
-        except (json.JSONDecodeError, ValidationError) as e:
-            logger.error(f"Malformed response in analyze_events: {e}")
+            return await self._generate_routed(prompt, "analyze_events", ANALYSIS_PARSER,
+                                               self.router.choose("analyze_events"),
+                                               confidence=lambda analysis: analysis["confidence"])
+        except StructuredOutputError as e:
+            logger.error("Malformed response in analyze_events: %s", e)
             return {
                 "threat_type": "unknown",
                 "severity": "medium",
@@ -308,7 +552,7 @@ class GeminiService:
                 "confidence": 0.0
             }
         except Exception as e:
-            logger.error(f"Error in analyze_events: {e}")
+            logger.error("Error in analyze_events: %s", e)
             return {
                 "threat_type": "unknown",
                 "severity": "medium",
@@ -324,21 +568,10 @@ class GeminiService:
         full_prompt = f"{prompt}\n\nReturn valid JSON matching this schema: {json.dumps(schema)}"
         try:
             # Re-configure the model with schema if needed, but for now we rely on the prompt and response_mime_type
-            response_text = await self._generate_content(full_prompt)
-            
-            # Clean up the response text if it contains markdown code blocks
-            cleaned_text = response_text.strip()
-            if cleaned_text.startswith("```json"):
-                cleaned_text = cleaned_text[7:]
-            if cleaned_text.startswith("```"):
-                cleaned_text = cleaned_text[3:]
-            if cleaned_text.endswith("```"):
-                cleaned_text = cleaned_text[:-3]
-            cleaned_text = cleaned_text.strip()
-            
-            return json.loads(cleaned_text)
+            return await self._generate_routed(full_prompt, "generate_structured", STRUCTURED_PARSER,
+                                               self.router.choose("generate_structured"))
         except Exception as e:
-            logger.error(f"Error in generate_structured: {e}")
+            logger.error("Error in generate_structured: %s", e)
             return {"error": str(e)}
 
 # Export a default instance
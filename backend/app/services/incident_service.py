@@ -1,53 +1,162 @@
-from typing import List, Dict, Any, Optional
+import base64
+import logging
+from datetime import datetime
+from typing import List, Dict, Any, Optional, Tuple
 from uuid import UUID
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, and_
+from sqlalchemy import select, literal, null, cast, tuple_, union_all, String, Float, JSON
+from sqlalchemy.dialects import postgresql, sqlite
 from app.models.incident import Incident
+from app.models.incident_event import IncidentEvent
 from app.models.hypothesis import Hypothesis
 from app.models.agent_decision import AgentDecision
-from app.schemas.incident import TimelineItem
+
+logger = logging.getLogger(__name__)
 
 class IncidentService:
     async def get_incident(self, db: AsyncSession, incident_id: UUID) -> Optional[Incident]:
         result = await db.execute(select(Incident).where(Incident.id == incident_id))
         return result.scalars().first()
 
-    async def get_timeline(self, db: AsyncSession, incident_id: UUID) -> List[TimelineItem]:
-        # Fetch hypotheses
-        hyp_result = await db.execute(
-            select(Hypothesis).where(Hypothesis.incident_id == incident_id)
-        )
-        hypotheses = hyp_result.scalars().all()
-
-        # Fetch agent decisions
-        dec_result = await db.execute(
-            select(AgentDecision).where(AgentDecision.incident_id == incident_id)
-        )
-        decisions = dec_result.scalars().all()
-
-        timeline = []
-
-        for h in hypotheses:
-            timeline.append(TimelineItem(
-                id=h.id,
-                type="hypothesis",
-                timestamp=h.created_at,
-                content=h.hypothesis_text,
-                metadata={"confidence": h.confidence, "threat_type": h.threat_type}
-            ))
-
-        for d in decisions:
-            timeline.append(TimelineItem(
-                id=d.id,
-                type="decision",
-                timestamp=d.created_at,
-                agent_type=d.agent_type,
-                content=f"Decision by {d.agent_type}",
-                metadata={"payload": d.decision_payload, "reasoning": d.reasoning_summary}
-            ))
-
-        # Sort by timestamp
-        timeline.sort(key=lambda x: x.timestamp)
-        return timeline
+    async def link_events(self, db: AsyncSession, links: List[Dict[str, Any]]) -> int:
+        """
+        Associates events with incidents (does not commit).
+
+        Each link holds incident_id, event_id, event_created_at and the
+        event's tenant_id. Links to unknown incidents or to another tenant's
+        incident are skipped; existing links are left as they are.
+
+        Returns:
+            The number of links that passed the ownership check.
+        """
+        incident_ids = {link["incident_id"] for link in links}
+        if not incident_ids:
+            return 0
+        owners = dict((await db.execute(
+            select(Incident.id, Incident.tenant_id).where(Incident.id.in_(incident_ids))
+        )).all())
+
+        rows = [
+            {"incident_id": link["incident_id"], "event_id": link["event_id"], "event_created_at": link["event_created_at"]}
+            for link in links
+            if owners.get(link["incident_id"]) == link["tenant_id"]
+        ]
+        if len(rows) < len(links):
+            logger.warning(f"Skipped {len(links) - len(rows)} event links to unknown or foreign incidents")
+        if not rows:
+            return 0
+
+        dialect = postgresql if db.bind.dialect.name == "postgresql" else sqlite
+        await db.execute(dialect.insert(IncidentEvent).on_conflict_do_nothing(), rows)
+        return len(rows)
+
+    async def get_timeline(self, db: AsyncSession, incident_id: UUID) -> List[Dict[str, Any]]:
+        """Full timeline (unpaginated); prefer get_timeline_page for long-running incidents."""
+        items, _ = await self.get_timeline_page(db, incident_id, limit=None)
+        return items
+
+    async def get_timeline_page(
+        self,
+        db: AsyncSession,
+        incident_id: UUID,
+        limit: Optional[int] = 200,
+        cursor: Optional[str] = None,
+        include_payload: bool = True
+    ) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        """
+        Hypotheses and agent decisions of an incident in chronological order.
+
+        Both tables are read in a single UNION ALL query, ordered and limited
+        in SQL; each branch is served by its (incident_id, created_at, id) index.
+        Pages are keyset-paginated on (created_at, id): pass the returned
+        cursor to fetch the next page. With include_payload=False the
+        decision_payload JSON is not read at all.
+
+        Returns:
+            The page of timeline dicts and the cursor for the next page (None
+            when this is the last page).
+        """
+        after = self._decode_cursor(cursor) if cursor else None
+
+        hypotheses = select(
+            Hypothesis.id.label("id"),
+            literal("hypothesis", String).label("type"),
+            Hypothesis.created_at.label("timestamp"),
+            cast(null(), String).label("agent_type"),
+            Hypothesis.hypothesis_text.label("content"),
+            Hypothesis.confidence.label("confidence"),
+            Hypothesis.threat_type.label("threat_type"),
+            cast(null(), JSON).label("payload"),
+            cast(null(), String).label("reasoning"),
+        ).where(Hypothesis.incident_id == incident_id)
+
+        decisions = select(
+            AgentDecision.id.label("id"),
+            literal("decision", String).label("type"),
+            AgentDecision.created_at.label("timestamp"),
+            AgentDecision.agent_type.label("agent_type"),
+            (literal("Decision by ", String) + AgentDecision.agent_type).label("content"),
+            cast(null(), Float).label("confidence"),
+            cast(null(), String).label("threat_type"),
+            (AgentDecision.decision_payload if include_payload else cast(null(), JSON)).label("payload"),
+            AgentDecision.reasoning_summary.label("reasoning"),
+        ).where(AgentDecision.incident_id == incident_id)
+
+        if after is not None:
+            # Applied per branch so each can start its index scan at the cursor
+            hypotheses = hypotheses.where(self._after(Hypothesis, *after))
+            decisions = decisions.where(self._after(AgentDecision, *after))
+
+        timeline = union_all(hypotheses, decisions).subquery()
+        query = select(timeline).order_by(timeline.c.timestamp, timeline.c.id)
+        if limit is not None:
+            # One extra row tells us whether another page exists
+            query = query.limit(limit + 1)
+
+        rows = (await db.execute(query)).all()
+        has_more = limit is not None and len(rows) > limit
+        if has_more:
+            rows = rows[:limit]
+
+        items = [self._to_item(row, include_payload) for row in rows]
+        next_cursor = self._encode_cursor(rows[-1].timestamp, rows[-1].id) if has_more else None
+        return items, next_cursor
+
+    @staticmethod
+    def _after(model, timestamp: datetime, row_id: UUID):
+        # Row-value comparison: PostgreSQL uses it as the start of a range scan
+        # on (incident_id, created_at, id); the OR form cannot be
+        return tuple_(model.created_at, model.id) > tuple_(timestamp, row_id)
+
+    @staticmethod
+    def _to_item(row, include_payload: bool) -> Dict[str, Any]:
+        if row.type == "hypothesis":
+            metadata = {"confidence": row.confidence, "threat_type": row.threat_type}
+        else:
+            metadata = {"reasoning": row.reasoning}
+            if include_payload:
+                metadata["payload"] = row.payload
+        return {
+            "id": row.id,
+            "type": row.type,
+            "timestamp": row.timestamp,
+            "agent_type": row.agent_type,
+            "content": row.content,
+            "metadata": metadata,
+        }
+
+    @staticmethod
+    def _encode_cursor(timestamp: datetime, row_id: UUID) -> str:
+        raw = f"{timestamp.isoformat()}|{row_id}"
+        return base64.urlsafe_b64encode(raw.encode()).decode()
+
+    @staticmethod
+    def _decode_cursor(cursor: str) -> Tuple[datetime, UUID]:
+        """Raises ValueError for malformed cursors."""
+        try:
+            timestamp, row_id = base64.urlsafe_b64decode(cursor.encode()).decode().split("|")
+            return datetime.fromisoformat(timestamp), UUID(row_id)
+        except Exception as e:
+            raise ValueError(f"Invalid cursor: {cursor}") from e
 
 incident_service = IncidentService()
@@ -0,0 +1,94 @@
+import re
+import json
+import logging
+from typing import Any, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Characters that change the parser state; everything else is skipped in bulk
+_TOKEN_RE = re.compile(r'[{}\[\]"\\]')
+
+class JSONArrayStreamParser:
+    """
+    Incremental parser for a JSON document arriving in chunks, such as a
+    streamed model response {"hypotheses": [{...}, {...}]}.
+
+    feed() returns each object element of the array under `key` as soon as
+    its closing brace has arrived, so callers can act on it before the rest
+    of the response is in. With key=None, elements of a top-level array (or
+    of any array directly under the root object) are returned. Text before
+    the document, like a markdown code fence, is ignored.
+    """
+    def __init__(self, key: Optional[str] = None):
+        self.key = key
+        self.text = ""  # Everything fed so far
+        self.emitted = 0
+        self._pos = 0
+        self._stack: List[str] = []
+        self._in_string = False
+        self._string_start = 0
+        self._last_string: Optional[str] = None  # Most recent string at the root level, i.e. the key
+        self._array_key: Optional[str] = None
+        self._element_start: Optional[int] = None
+
+    def feed(self, chunk: str) -> List[Any]:
+        self.text += chunk
+        text = self.text
+        items: List[Any] = []
+        pos = self._pos
+
+        while True:
+            match = _TOKEN_RE.search(text, pos)
+            if match is None:
+                pos = len(text)
+                break
+            char, i = match.group(), match.start()
+            pos = i + 1
+
+            if self._in_string:
+                if char == "\\":
+                    if i + 1 == len(text):
+                        # The escaped character is in the next chunk
+                        pos = i
+                        break
+                    pos = i + 2
+                elif char == '"':
+                    self._in_string = False
+                    if len(self._stack) == 1:
+                        self._last_string = text[self._string_start:i]
+                continue
+
+            if char == '"':
+                self._in_string = True
+                self._string_start = i + 1
+            elif char == "{" or char == "[":
+                if char == "[" and self._stack == ["{"]:
+                    self._array_key = self._last_string
+                if char == "{" and self._is_element_parent():
+                    self._element_start = i
+                self._stack.append(char)
+            elif char == "}" or char == "]":
+                if self._stack:
+                    self._stack.pop()
+                if char == "}" and self._element_start is not None and self._is_element_parent():
+                    element = self._decode(text[self._element_start:i + 1])
+                    self._element_start = None
+                    if element is not None:
+                        items.append(element)
+
+        self._pos = pos
+        self.emitted += len(items)
+        return items
+
+    def _is_element_parent(self) -> bool:
+        if self._stack == ["{", "["]:
+            return self.key is None or self._array_key == self.key
+        return self._stack == ["["] and self.key is None
+
+    @staticmethod
+    def _decode(raw: str) -> Optional[Any]:
+        try:
+            return json.loads(raw)
+        except json.JSONDecodeError as e:
+            logger.warning(f"Skipping malformed streamed JSON element: {e}")
+            return None
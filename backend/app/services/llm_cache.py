@@ -0,0 +1,148 @@
+import json
+import time
+import hashlib
+import logging
+from collections import OrderedDict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, Optional, Tuple
+import redis.asyncio as aioredis
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Set for the duration of a request that must not read cached responses
+# (fresh results are still written back). Propagates into tasks spawned
+# with asyncio.gather / create_task.
+_bypass: ContextVar[bool] = ContextVar("llm_cache_bypass", default=False)
+
+class LLMResponseCache:
+    """
+    Two-tier cache for validated LLM responses.
+
+    Entries are keyed on a hash of (method, model, generation config, prompt)
+    and stored as JSON: an in-process LRU with TTL in front of a shared Redis
+    tier. Redis errors degrade to memory-only for a short cool-down instead
+    of failing the call.
+    """
+    KEY_PREFIX = "cybersentinel:llm:"
+    REDIS_COOLDOWN_SECONDS = 30
+
+    def __init__(self, max_entries: Optional[int] = None, ttl_seconds: Optional[int] = None,
+                 redis_url: Optional[str] = None):
+        self.enabled = settings.LLM_CACHE_ENABLED
+        self.max_entries = max_entries or settings.LLM_CACHE_MAX_ENTRIES
+        self.ttl_seconds = ttl_seconds or settings.LLM_CACHE_TTL_SECONDS
+        self.redis_url = redis_url if redis_url is not None else (
+            settings.REDIS_URL if settings.LLM_CACHE_REDIS_ENABLED else ""
+        )
+        self._memory: "OrderedDict[str, Tuple[float, str]]" = OrderedDict()
+        self._redis = None
+        self._redis_down_until = 0.0
+        self.stats = {"memory_hits": 0, "redis_hits": 0, "misses": 0, "bypassed": 0, "stores": 0}
+
+    @staticmethod
+    def make_key(method: str, model_name: str, generation_config: Dict[str, Any], prompt: str) -> str:
+        """Hashes a normalized representation of the call."""
+        normalized = json.dumps(
+            {
+                "method": method,
+                "model": model_name,
+                "config": generation_config,
+                # Trailing whitespace and CRLF differences do not change the answer
+                "prompt": "\n".join(line.rstrip() for line in prompt.strip().splitlines()),
+            },
+            sort_keys=True,
+            default=str
+        )
+        return hashlib.sha256(normalized.encode("utf-8")).hexdigest()
+
+    @contextmanager
+    def bypass(self, enabled: bool = True):
+        """Skip cache reads for calls made inside this block."""
+        token = _bypass.set(enabled)
+        try:
+            yield
+        finally:
+            _bypass.reset(token)
+
+    def is_bypassed(self) -> bool:
+        return _bypass.get()
+
+    async def get(self, key: str) -> Optional[Any]:
+        if not self.enabled:
+            return None
+        if _bypass.get():
+            self.stats["bypassed"] += 1
+            return None
+
+        now = time.monotonic()
+        entry = self._memory.get(key)
+        if entry is not None:
+            expires_at, payload = entry
+            if expires_at > now:
+                self._memory.move_to_end(key)
+                self.stats["memory_hits"] += 1
+                return json.loads(payload)
+            del self._memory[key]
+
+        client = self._get_redis()
+        if client is not None:
+            try:
+                payload = await client.get(self.KEY_PREFIX + key)
+            except Exception as e:
+                self._mark_redis_down(e)
+                payload = None
+            if payload is not None:
+                self._set_memory(key, payload if isinstance(payload, str) else payload.decode())
+                self.stats["redis_hits"] += 1
+                return json.loads(payload)
+
+        self.stats["misses"] += 1
+        return None
+
+    async def set(self, key: str, value: Any) -> None:
+        if not self.enabled:
+            return
+        payload = json.dumps(value, default=str)
+        self._set_memory(key, payload)
+        self.stats["stores"] += 1
+
+        client = self._get_redis()
+        if client is not None:
+            try:
+                await client.set(self.KEY_PREFIX + key, payload, ex=self.ttl_seconds)
+            except Exception as e:
+                self._mark_redis_down(e)
+
+    def clear(self) -> None:
+        """Clears the in-process tier (Redis entries expire on their own)."""
+        self._memory.clear()
+
+    def get_stats(self) -> Dict[str, Any]:
+        hits = self.stats["memory_hits"] + self.stats["redis_hits"]
+        lookups = hits + self.stats["misses"]
+        return {
+            **self.stats,
+            "hit_ratio": round(hits / lookups, 4) if lookups else 0.0,
+            "memory_entries": len(self._memory),
+        }
+
+    def _set_memory(self, key: str, payload: str) -> None:
+        self._memory[key] = (time.monotonic() + self.ttl_seconds, payload)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    def _get_redis(self):
+        if not self.redis_url or time.monotonic() < self._redis_down_until:
+            return None
+        if self._redis is None:
+            self._redis = aioredis.from_url(self.redis_url, socket_connect_timeout=1, socket_timeout=1)
+        return self._redis
+
+    def _mark_redis_down(self, error: Exception) -> None:
+        logger.warning(f"LLM cache Redis tier unavailable: {error}. Using memory only for {self.REDIS_COOLDOWN_SECONDS}s")
+        self._redis_down_until = time.monotonic() + self.REDIS_COOLDOWN_SECONDS
+
+llm_cache = LLMResponseCache()
@@ -0,0 +1,300 @@
+import re
+import json
+import math
+import random
+import asyncio
+import hashlib
+import logging
+from abc import ABC, abstractmethod
+from typing import Any, AsyncIterator, Dict, Optional
+import google.generativeai as genai
+from google.api_core import exceptions
+from pydantic import BaseModel, ConfigDict
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+class ModelSpec(BaseModel):
+    """Model and temperature a call is routed to (see ModelRouter)."""
+    model_config = ConfigDict(frozen=True)
+
+    tier: str  # "fast" or "large"
+    name: str
+    temperature: float
+
+class LLMProvider(ABC):
+    """
+    Backend that turns a prompt into response text for GeminiService.
+
+    GeminiService owns caching, single-flight, admission control, retries
+    and timeouts; a provider only makes one attempt and raises the
+    google.api_core exceptions GeminiService retries on
+    (ServiceUnavailable, ResourceExhausted, ...). Without a ModelSpec the
+    provider's own model and generation config are used.
+    """
+    name: str = "provider"
+    model_name: str = ""
+    generation_config: Dict[str, Any] = {}
+
+    @abstractmethod
+    async def generate(self, prompt: str, task: Optional[str] = None, model: Optional[ModelSpec] = None) -> str:
+        """Full response text. `task` is the GeminiService method, e.g. "plan_response"."""
+
+    @abstractmethod
+    def stream(self, prompt: str, task: Optional[str] = None, model: Optional[ModelSpec] = None) -> AsyncIterator[str]:
+        """Response text in chunks, as they are generated."""
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {"provider": self.name, "model": self.model_name}
+
+class GeminiProvider(LLMProvider):
+    name = "gemini"
+
+    def __init__(self, api_key: Optional[str] = None, model_name: Optional[str] = None,
+                 generation_config: Optional[Dict[str, Any]] = None):
+        self.api_key = api_key or settings.GEMINI_API_KEY
+
+        if self.api_key:
+            genai.configure(api_key=self.api_key)
+
+        self.model_name = model_name or settings.LLM_LARGE_MODEL
+        self.generation_config = generation_config or {
+            "temperature": settings.LLM_LARGE_TEMPERATURE,
+            "top_p": 0.95,
+            "response_mime_type": "application/json",
+        }
+        self._model_instance = None
+        # Models of other routes, created on first use
+        self._routed_models: Dict[ModelSpec, Any] = {}
+
+    @property
+    def model(self):
+        if self._model_instance is None:
+            if not self.api_key:
+                logger.error("GEMINI_API_KEY is required but not set.")
+                raise ValueError("GEMINI_API_KEY is required but not set.")
+
+            # Re-configure to be sure
+            genai.configure(api_key=self.api_key)
+
+            self._model_instance = genai.GenerativeModel(
+                model_name=self.model_name,
+                generation_config=self.generation_config
+            )
+        return self._model_instance
+
+    def _model_for(self, spec: Optional[ModelSpec]):
+        if spec is None or (spec.name == self.model_name
+                            and spec.temperature == self.generation_config.get("temperature")):
+            return self.model
+        routed = self._routed_models.get(spec)
+        if routed is None:
+            self.model  # Fails early without an API key
+            routed = self._routed_models[spec] = genai.GenerativeModel(
+                model_name=spec.name,
+                generation_config={**self.generation_config, "temperature": spec.temperature}
+            )
+        return routed
+
+    async def generate(self, prompt: str, task: Optional[str] = None, model: Optional[ModelSpec] = None) -> str:
+        response = await self._model_for(model).generate_content_async(prompt)
+        if hasattr(response, 'text'):
+            return response.text
+        # Fallback if text attribute is missing for some reason
+        return str(response)
+
+    async def stream(self, prompt: str, task: Optional[str] = None,
+                     model: Optional[ModelSpec] = None) -> AsyncIterator[str]:
+        response = await self._model_for(model).generate_content_async(prompt, stream=True)
+        async for chunk in response:
+            try:
+                text = chunk.text
+            except ValueError:
+                # Chunks without text parts (e.g. only safety ratings)
+                continue
+            if text:
+                yield text
+
+# Keywords in the prompt -> threat type of the simulated top hypothesis
+_SIM_THREATS = [
+    ("brute_force", re.compile(r"fail(?:ed)? (?:password|login)|invalid user|authentication failure", re.I)),
+    ("reconnaissance", re.compile(r"port scan|DPT=|connection attempt|probe", re.I)),
+    ("malware", re.compile(r"malware|trojan|ransomware|virus", re.I)),
+    ("phishing", re.compile(r"phish|suspicious (?:link|attachment)", re.I)),
+    ("data_exfiltration", re.compile(r"exfiltrat|bytes_out|large (?:outbound )?transfer", re.I)),
+    ("dos", re.compile(r"flood|ddos|rate limit exceeded", re.I)),
+    ("privilege_escalation", re.compile(r"sudo|privilege escalation|setuid", re.I)),
+]
+_SIM_ACTIONS = {
+    "brute_force": ["Block source IP at the firewall", "Reset credentials of targeted accounts", "Enforce MFA"],
+    "reconnaissance": ["Block scanning source IP", "Review exposed services", "Increase IDS sensitivity"],
+    "malware": ["Isolate affected host", "Collect memory image", "Run full EDR scan"],
+    "phishing": ["Quarantine the message", "Reset credentials of recipients who clicked", "Block sender domain"],
+    "data_exfiltration": ["Block destination address", "Isolate source host", "Review DLP logs"],
+    "dos": ["Enable upstream rate limiting", "Scale out edge capacity", "Block top talkers"],
+    "privilege_escalation": ["Revoke elevated privileges", "Isolate host", "Audit sudoers changes"],
+    "other": ["Investigate manually", "Collect additional logs"],
+}
+_SCHEMA_RE = re.compile(r"Return valid JSON matching this schema: (\{.*\})\s*$", re.S)
+
+class SimulatedProvider(LLMProvider):
+    """
+    Offline stand-in for the model, for load tests and CI.
+
+    Responses are canned but schema-valid and deterministic for a given
+    prompt, so the LLM cache and single-flight behave as with the real
+    model. Latency follows LLM_SIM_LATENCY_DISTRIBUTION around
+    LLM_SIM_LATENCY_MS. Errors (503), rate limits (429), hung calls and
+    truncated responses are injected at the configured rates, drawn from a
+    generator seeded with LLM_SIM_SEED so a run can be replayed. Calls
+    routed to the fast model take LLM_SIM_FAST_LATENCY_FACTOR as long.
+    """
+    name = "simulated"
+
+    def __init__(self, latency_ms: Optional[float] = None, distribution: Optional[str] = None,
+                 sigma: Optional[float] = None, error_rate: Optional[float] = None,
+                 rate_limit_rate: Optional[float] = None, timeout_rate: Optional[float] = None,
+                 truncate_rate: Optional[float] = None, seed: Optional[int] = None):
+        self.latency_ms = settings.LLM_SIM_LATENCY_MS if latency_ms is None else latency_ms
+        self.distribution = distribution or settings.LLM_SIM_LATENCY_DISTRIBUTION
+        self.sigma = settings.LLM_SIM_LATENCY_SIGMA if sigma is None else sigma
+        self.error_rate = settings.LLM_SIM_ERROR_RATE if error_rate is None else error_rate
+        self.rate_limit_rate = settings.LLM_SIM_RATE_LIMIT_RATE if rate_limit_rate is None else rate_limit_rate
+        self.timeout_rate = settings.LLM_SIM_TIMEOUT_RATE if timeout_rate is None else timeout_rate
+        self.truncate_rate = settings.LLM_SIM_TRUNCATE_RATE if truncate_rate is None else truncate_rate
+        self.model_name = f"simulated-{self.distribution}-{self.latency_ms:g}ms"
+        self.generation_config = {}
+        self._random = random.Random(settings.LLM_SIM_SEED if seed is None else seed)
+        self.stats = {"calls": 0, "errors": 0, "rate_limited": 0, "timeouts": 0, "truncated": 0}
+
+    async def generate(self, prompt: str, task: Optional[str] = None, model: Optional[ModelSpec] = None) -> str:
+        latency, text = self._attempt(prompt, task, model)
+        await asyncio.sleep(latency)
+        return text
+
+    async def stream(self, prompt: str, task: Optional[str] = None,
+                     model: Optional[ModelSpec] = None) -> AsyncIterator[str]:
+        latency, text = self._attempt(prompt, task, model)
+        # Time to first chunk is a third of the latency; the rest is spread over the chunks
+        chunks = [text[i:i + 64] for i in range(0, len(text), 64)] or [""]
+        await asyncio.sleep(latency / 3)
+        for chunk in chunks:
+            yield chunk
+            await asyncio.sleep(latency * 2 / 3 / len(chunks))
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {**super().get_stats(), **self.stats}
+
+    def sample_latency(self) -> float:
+        """Seconds for one call."""
+        median = self.latency_ms / 1000
+        if self.distribution == "fixed" or median <= 0:
+            return max(median, 0.0)
+        if self.distribution == "exponential":
+            return self._random.expovariate(math.log(2) / median)
+        if self.distribution == "uniform":
+            return self._random.uniform(0, 2 * median)
+        return self._random.lognormvariate(math.log(median), self.sigma)
+
+    def _attempt(self, prompt: str, task: Optional[str], model: Optional[ModelSpec] = None):
+        """Latency and response of one call, or the injected failure."""
+        self.stats["calls"] += 1
+        latency = self.sample_latency()
+        if model is not None and model.tier == "fast":
+            latency *= settings.LLM_SIM_FAST_LATENCY_FACTOR
+        roll = self._random.random()
+        if roll < self.error_rate:
+            self.stats["errors"] += 1
+            raise exceptions.ServiceUnavailable("Simulated model overloaded")
+        roll -= self.error_rate
+        if roll < self.rate_limit_rate:
+            self.stats["rate_limited"] += 1
+            raise exceptions.ResourceExhausted("Simulated quota exceeded")
+        roll -= self.rate_limit_rate
+        if roll < self.timeout_rate:
+            self.stats["timeouts"] += 1
+            return 3600.0, ""
+
+        text = json.dumps(self.respond(prompt, task))
+        if self._random.random() < self.truncate_rate:
+            self.stats["truncated"] += 1
+            text = text[:int(len(text) * 0.7)]
+        return latency, text
+
+    def respond(self, prompt: str, task: Optional[str]) -> Dict[str, Any]:
+        """Deterministic, schema-valid response for a prompt."""
+        digest = hashlib.sha256(prompt.encode()).digest()
+        rng = random.Random(digest)
+        threat = next((name for name, pattern in _SIM_THREATS if pattern.search(prompt)), "other")
+        task = task or self._guess_task(prompt)
+
+        if task == "generate_hypothesis":
+            others = [name for name, _ in _SIM_THREATS if name != threat]
+            return {"hypotheses": [
+                {
+                    "hypothesis_text": f"Simulated {t.replace('_', ' ')} hypothesis",
+                    "confidence": round(c, 2),
+                    "evidence": [f"Simulated indicator {i + 1} for {t}" for i in range(3)],
+                    "threat_type": t,
+                }
+                for t, c in zip([threat] + rng.sample(others, 2), sorted(rng.uniform(0.1, 0.95) for _ in range(3))[::-1])
+            ]}
+        if task == "plan_response":
+            planned = next((t for t in _SIM_ACTIONS if f'"threat_type": "{t}"' in prompt), threat)
+            return {
+                "actions": _SIM_ACTIONS[planned],
+                "priority": rng.choice(["critical", "high", "high", "medium"]),
+                "estimated_impact": "Simulated containment with limited user impact",
+                "false_positive_risk": round(rng.uniform(0.02, 0.4), 2),
+            }
+        if task == "critique_decision":
+            approved = rng.random() < 0.8
+            return {
+                "approved": approved,
+                "confidence_adjustment": round(rng.uniform(-0.1, 0.1), 2),
+                "concerns": [] if approved else ["Simulated concern: containment scope too narrow"],
+                "revised_actions": None if approved else ["Simulated revised action"],
+            }
+        if task == "analyze_events":
+            return {
+                "threat_type": threat,
+                "severity": rng.choice(["critical", "high", "medium", "low"]),
+                "description": f"Simulated analysis of {threat.replace('_', ' ')} activity",
+                "recommended_actions": _SIM_ACTIONS[threat],
+                "confidence": round(rng.uniform(0.4, 0.95), 2),
+            }
+        return self._fill_schema(prompt)
+
+    @staticmethod
+    def _guess_task(prompt: str) -> str:
+        if '"hypotheses"' in prompt:
+            return "generate_hypothesis"
+        if "Proposed Response Plan" in prompt:
+            return "critique_decision"
+        if '"actions"' in prompt:
+            return "plan_response"
+        if '"recommended_actions"' in prompt:
+            return "analyze_events"
+        return "generate_structured"
+
+    @staticmethod
+    def _fill_schema(prompt: str) -> Dict[str, Any]:
+        """Placeholder values for generate_structured's {"field": "type"} schema."""
+        match = _SCHEMA_RE.search(prompt)
+        try:
+            schema = json.loads(match.group(1)) if match else {}
+        except json.JSONDecodeError:
+            schema = {}
+        defaults = {"string": "simulated", "str": "simulated", "float": 0.5, "int": 1, "bool": True,
+                    "boolean": True, "list": [], "array": []}
+        return {field: defaults.get(str(kind).lower(), "simulated") for field, kind in schema.items()}
+
+def build_provider(name: Optional[str] = None, api_key: Optional[str] = None) -> LLMProvider:
+    """Provider selected by LLM_PROVIDER ("gemini" or "simulated")."""
+    name = (name or settings.LLM_PROVIDER).lower()
+    if name == "simulated":
+        logger.warning("Using the simulated LLM provider; responses are canned")
+        return SimulatedProvider()
+    if name == "gemini":
+        return GeminiProvider(api_key=api_key)
+    raise ValueError(f"Unknown LLM_PROVIDER {name!r}; expected 'gemini' or 'simulated'")
@@ -0,0 +1,132 @@
+import logging
+from collections import defaultdict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, Iterable, Optional
+from pydantic import BaseModel
+from app.config import settings
+from app.services.llm_providers import ModelSpec
+from app.services.rate_limiter import DEFAULT_PRIORITY, SEVERITY_PRIORITY
+from app.services.telemetry import LLM_ESCALATIONS, LLM_ROUTE_SECONDS
+
+logger = logging.getLogger(__name__)
+
+FAST = "fast"
+LARGE = "large"
+
+class IncidentComplexity(BaseModel):
+    events: int = 0
+    patterns: Optional[int] = None  # Distinct event fingerprints, known once the events are grouped
+    severity: str = "medium"  # Most severe event
+
+# Complexity of the incident currently being processed; inherited by tasks
+# spawned from the orchestrator, like the rate limiter priority.
+_complexity: ContextVar[Optional[IncidentComplexity]] = ContextVar("llm_route_complexity", default=None)
+
+class ModelRouter:
+    """
+    Picks the fast or the large model for each model call.
+
+    Routes in LLM_ROUTE_FAST_TASKS (critique, re-plan, event analysis)
+    start on the fast model. Other routes start on it only for simple
+    incidents: below LLM_ROUTE_LARGE_MIN_EVENTS events and
+    LLM_ROUTE_LARGE_MIN_PATTERNS distinct fingerprints, with no event of a
+    severity in LLM_ROUTE_LARGE_SEVERITIES. Calls made outside an incident
+    use the large model. GeminiService asks the large model again when a
+    fast answer fails validation or is not confident enough; record()
+    keeps latency and escalations per route.
+    """
+    def __init__(self, enabled: Optional[bool] = None, fast: Optional[ModelSpec] = None,
+                 large: Optional[ModelSpec] = None):
+        self.enabled = settings.LLM_ROUTING_ENABLED if enabled is None else enabled
+        self.models = {
+            FAST: fast or ModelSpec(tier=FAST, name=settings.LLM_FAST_MODEL, temperature=settings.LLM_FAST_TEMPERATURE),
+            LARGE: large or ModelSpec(tier=LARGE, name=settings.LLM_LARGE_MODEL,
+                                      temperature=settings.LLM_LARGE_TEMPERATURE),
+        }
+        self.stats: Dict[str, Dict[str, Any]] = defaultdict(lambda: {
+            "fast_calls": 0, "large_calls": 0, "fast_seconds": 0.0, "large_seconds": 0.0,
+            "escalated_invalid": 0, "escalated_low_confidence": 0,
+        })
+
+    @contextmanager
+    def incident(self, complexity: IncidentComplexity):
+        token = _complexity.set(complexity)
+        try:
+            yield complexity
+        finally:
+            _complexity.reset(token)
+
+    @staticmethod
+    def assess(events: Iterable[Dict[str, Any]]) -> IncidentComplexity:
+        """Event count and most severe event; fingerprints are added by note_patterns()."""
+        count = 0
+        level = DEFAULT_PRIORITY
+        for event in events:
+            count += 1
+            level = min(level, SEVERITY_PRIORITY.get(str(event.get("severity", "")).lower(), DEFAULT_PRIORITY))
+        severity = next(name for name, value in SEVERITY_PRIORITY.items() if value == level)
+        return IncidentComplexity(events=count, severity=severity)
+
+    @staticmethod
+    def note_patterns(patterns: int) -> None:
+        """Records the distinct fingerprints of the current incident for this and later routes."""
+        complexity = _complexity.get()
+        if complexity is not None:
+            complexity.patterns = patterns
+
+    @staticmethod
+    def is_complex(complexity: IncidentComplexity) -> bool:
+        return (
+            complexity.events >= settings.LLM_ROUTE_LARGE_MIN_EVENTS
+            or (complexity.patterns or 0) >= settings.LLM_ROUTE_LARGE_MIN_PATTERNS
+            or complexity.severity in settings.LLM_ROUTE_LARGE_SEVERITIES
+        )
+
+    def choose(self, route: str) -> ModelSpec:
+        """Model the first call of a route goes to."""
+        if not self.enabled:
+            return self.models[LARGE]
+        if route in settings.LLM_ROUTE_FAST_TASKS:
+            return self.models[FAST]
+        complexity = _complexity.get()
+        if complexity is None or self.is_complex(complexity):
+            return self.models[LARGE]
+        return self.models[FAST]
+
+    def escalate(self, route: str, reason: str) -> ModelSpec:
+        """Large model for a route whose fast answer was rejected (reason "invalid" or "low_confidence")."""
+        self.stats[route][f"escalated_{reason}"] += 1
+        LLM_ESCALATIONS.labels(route, reason).inc()
+        logger.info("Escalating %s to %s (%s)", route, self.models[LARGE].name, reason)
+        return self.models[LARGE]
+
+    def record(self, route: str, model: ModelSpec, seconds: float) -> None:
+        """Records one model call of a route."""
+        stats = self.stats[route]
+        stats[f"{model.tier}_calls"] += 1
+        stats[f"{model.tier}_seconds"] += seconds
+        LLM_ROUTE_SECONDS.labels(route, model.tier).observe(seconds)
+
+    def get_stats(self) -> Dict[str, Any]:
+        routes = {}
+        for route, stats in sorted(self.stats.items()):
+            fast_calls, large_calls = stats["fast_calls"], stats["large_calls"]
+            escalations = stats["escalated_invalid"] + stats["escalated_low_confidence"]
+            routes[route] = {
+                "requests": fast_calls + large_calls - escalations,
+                "fast_calls": fast_calls,
+                "large_calls": large_calls,
+                "escalated_invalid": stats["escalated_invalid"],
+                "escalated_low_confidence": stats["escalated_low_confidence"],
+                "escalation_rate": round(escalations / fast_calls, 4) if fast_calls else 0.0,
+                "avg_fast_ms": round(stats["fast_seconds"] / fast_calls * 1000, 1) if fast_calls else 0.0,
+                "avg_large_ms": round(stats["large_seconds"] / large_calls * 1000, 1) if large_calls else 0.0,
+            }
+        return {
+            "enabled": self.enabled,
+            "models": {tier: spec.model_dump() for tier, spec in self.models.items()},
+            "routes": routes,
+        }
+
+model_router = ModelRouter()
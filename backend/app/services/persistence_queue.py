@@ -0,0 +1,157 @@
+import asyncio
+import logging
+import contextvars
+from typing import Any, Dict, List, Optional, Tuple
+from sqlalchemy import insert
+from app.config import settings
+from app.db.database import AsyncSessionLocal
+from app.services.telemetry import traced
+
+logger = logging.getLogger(__name__)
+
+class WriteBehindQueue:
+    """
+    Buffers agent output rows and writes them in multi-row INSERTs.
+
+    Rows are flushed by a background task once PERSIST_BATCH_SIZE rows are
+    pending or every PERSIST_FLUSH_INTERVAL_SECONDS, one transaction per
+    flush. If more than PERSIST_MAX_PENDING rows pile up, enqueue flushes
+    inline so memory stays bounded. Call stop() on shutdown to drain.
+
+    Each incident's rows are inserted in their own savepoint, so a failure
+    (e.g. a foreign key violation for an incident that was never stored)
+    only costs that incident's rows; those are then retried row by row.
+    """
+    def __init__(self, batch_size: Optional[int] = None, flush_interval: Optional[float] = None,
+                 max_pending: Optional[int] = None, session_factory=None):
+        self.enabled = settings.PERSIST_WRITE_BEHIND_ENABLED
+        self.batch_size = batch_size or settings.PERSIST_BATCH_SIZE
+        self.flush_interval = flush_interval or settings.PERSIST_FLUSH_INTERVAL_SECONDS
+        self.max_pending = max_pending or settings.PERSIST_MAX_PENDING
+        self.session_factory = session_factory or AsyncSessionLocal
+        # model class -> rows, in enqueue order
+        self._pending: Dict[Any, List[Dict[str, Any]]] = {}
+        self._count = 0
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self._lock: Optional[asyncio.Lock] = None
+        self._flusher: Optional[asyncio.Task] = None
+        self.stats = {"enqueued": 0, "written": 0, "dropped": 0, "flushes": 0}
+
+    @property
+    def pending(self) -> int:
+        return self._count
+
+    async def enqueue(self, model: Any, rows: List[Dict[str, Any]]) -> None:
+        if not rows:
+            return
+        self.stats["enqueued"] += len(rows)
+        if not self.enabled:
+            await self._write({model: list(rows)})
+            return
+
+        self._bind_loop()
+        self._pending.setdefault(model, []).extend(rows)
+        self._count += len(rows)
+
+        if self._count >= self.max_pending:
+            logger.warning("Write-behind queue has %s pending rows; flushing inline", self._count)
+            await self.flush()
+        elif self._count >= self.batch_size:
+            self._wakeup.set()
+
+    async def flush(self) -> None:
+        """Writes everything pending now."""
+        self._bind_loop()
+        async with self._lock:
+            if not self._count:
+                return
+            batch, self._pending, self._count = self._pending, {}, 0
+            await self._write(batch)
+
+    async def stop(self) -> None:
+        """Stops the background flusher and drains pending rows."""
+        if self._flusher is not None:
+            self._flusher.cancel()
+            await asyncio.gather(self._flusher, return_exceptions=True)
+            self._flusher = None
+        await self.flush()
+
+    def _bind_loop(self) -> None:
+        loop = asyncio.get_running_loop()
+        if self._loop is loop:
+            return
+        # First use, or a new event loop (e.g. a fresh worker loop): rebuild loop-bound primitives
+        self._loop = loop
+        self._wakeup = asyncio.Event()
+        self._lock = asyncio.Lock()
+        # Fresh context: the flusher must not inherit the trace id of the incident that started it
+        self._flusher = loop.create_task(self._run(), context=contextvars.Context())
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            try:
+                await self.flush()
+            except Exception as e:
+                logger.error("Write-behind flush failed: %s", e)
+
+    @traced("db.persistence_write")
+    async def _write(self, batch: Dict[Any, List[Dict[str, Any]]]) -> None:
+        total = sum(len(rows) for rows in batch.values())
+        self.stats["flushes"] += 1
+
+        # incident id -> [(model, rows)], keeping the model order of the batch
+        by_incident: Dict[Any, List[Tuple[Any, List[Dict[str, Any]]]]] = {}
+        for model, rows in batch.items():
+            grouped: Dict[Any, List[Dict[str, Any]]] = {}
+            for row in rows:
+                grouped.setdefault(row.get("incident_id"), []).append(row)
+            for incident_id, incident_rows in grouped.items():
+                by_incident.setdefault(incident_id, []).append((model, incident_rows))
+
+        written = 0
+        try:
+            async with self.session_factory() as session:
+                async with session.begin():
+                    for incident_id, groups in by_incident.items():
+                        written += await self._write_incident(session, incident_id, groups)
+        except Exception as e:
+            self.stats["dropped"] += total
+            logger.error("Write-behind transaction of %s rows failed: %s", total, e)
+            return
+        self.stats["written"] += written
+        self.stats["dropped"] += total - written
+        logger.info("Flushed %s agent output rows", written)
+
+    async def _write_incident(self, session, incident_id: Any,
+                              groups: List[Tuple[Any, List[Dict[str, Any]]]]) -> int:
+        """
+        Inserts one incident's rows in a savepoint and returns the number
+        written. If that fails (e.g. the incident row does not exist), only
+        this incident is retried row by row, each row in its own savepoint.
+        """
+        try:
+            async with session.begin_nested():
+                for model, rows in groups:
+                    await session.execute(insert(model), rows)
+            return sum(len(rows) for _, rows in groups)
+        except Exception as e:
+            logger.warning("Write of incident %s rows failed (%s); retrying row by row", incident_id, e)
+
+        written = 0
+        for model, rows in groups:
+            for row in rows:
+                try:
+                    async with session.begin_nested():
+                        await session.execute(insert(model), [row])
+                    written += 1
+                except Exception as e:
+                    logger.error("Failed to save %s row for incident %s: %s", model.__tablename__, incident_id, e)
+        return written
+
+persistence_queue = WriteBehindQueue()
@@ -0,0 +1,159 @@
+import logging
+from typing import Any, Dict, List, Optional
+from pydantic import BaseModel
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Process-wide counters, reported by GET /api/agents/prompt/stats
+prompt_stats: Dict[str, int] = {
+    "prompts": 0,
+    "truncated_prompts": 0,
+    "estimated_tokens": 0,
+    "items_kept": 0,
+    "items_dropped": 0,
+    "sections_dropped": 0,
+}
+
+def estimate_tokens(text: str) -> int:
+    """Cheap token estimate (~4 characters per token for English/JSON)."""
+    return (len(text) + 3) // 4
+
+def _omitted_note(separator: str, omitted: int) -> str:
+    return f"{separator}({omitted} more omitted to fit the prompt budget)"
+
+class PromptBuildResult(BaseModel):
+    text: str
+    estimated_tokens: int
+    budget_tokens: int
+    kept: Dict[str, int]  # section name -> items (or 1 for plain sections) included
+    dropped: Dict[str, int]  # section name -> items (or 1 for plain sections) left out
+
+    @property
+    def truncated(self) -> bool:
+        return any(self.dropped.values())
+
+class _Section:
+    __slots__ = ("name", "priority", "required", "text", "header", "items", "separator", "footer",
+                 "tokens", "item_tokens", "kept_items", "included")
+
+    def __init__(self, name: str, priority: int, required: bool, text: str = "", header: str = "",
+                 items: Optional[List[str]] = None, separator: str = "\n", footer: str = ""):
+        self.name = name
+        self.priority = priority
+        self.required = required
+        self.text = text
+        self.header = header
+        self.items = items
+        self.separator = separator
+        self.footer = footer
+        # Size estimates are computed once, up front
+        self.tokens = estimate_tokens(text) + estimate_tokens(header) + estimate_tokens(footer)
+        self.item_tokens = [estimate_tokens(i) + 1 for i in items] if items is not None else []
+        self.kept_items = 0
+        self.included = False
+
+class PromptBuilder:
+    """
+    Assembles a prompt from prioritized sections under a token budget.
+
+    Plain sections are kept or dropped whole; item sections (events,
+    hypotheses, critique concerns) keep as many leading items as fit and
+    note how many were omitted. Required sections are always kept. Budget
+    is handed out by descending priority, while the output preserves the
+    order in which sections were added and is assembled with a single join.
+    """
+    def __init__(self, budget_tokens: Optional[int] = None, name: str = "prompt"):
+        self.budget_tokens = budget_tokens or settings.PROMPT_TOKEN_BUDGET
+        self.name = name
+        self._sections: List[_Section] = []
+
+    def add(self, name: str, text: str, priority: int = 0, required: bool = False) -> "PromptBuilder":
+        self._sections.append(_Section(name, priority, required, text=text))
+        return self
+
+    def add_items(self, name: str, items: List[str], priority: int = 0, header: str = "",
+                  separator: str = "\n", footer: str = "", required: bool = False) -> "PromptBuilder":
+        """Adds a list section; put the most important items first."""
+        self._sections.append(
+            _Section(name, priority, required, header=header, items=list(items), separator=separator, footer=footer)
+        )
+        return self
+
+    def build(self) -> PromptBuildResult:
+        remaining = self.budget_tokens
+        order = sorted(self._sections, key=lambda s: (not s.required, -s.priority))
+
+        for section in order:
+            if section.required:
+                section.included = True
+                section.kept_items = len(section.item_tokens)
+                remaining -= section.tokens + sum(section.item_tokens)
+                continue
+            if section.tokens > remaining:
+                continue
+            section.included = True
+            remaining -= section.tokens
+            # When items will be left out, keep room for the note that says so
+            note = 0
+            if sum(section.item_tokens) > remaining:
+                note = estimate_tokens(_omitted_note(section.separator, len(section.item_tokens)))
+            for cost in section.item_tokens:
+                if cost + note > remaining:
+                    break
+                remaining -= cost
+                section.kept_items += 1
+            remaining -= note
+
+        parts: List[str] = []
+        kept: Dict[str, int] = {}
+        dropped: Dict[str, int] = {}
+        for section in self._sections:
+            if section.items is None:
+                kept[section.name] = int(section.included)
+                dropped[section.name] = int(not section.included)
+                if section.included:
+                    parts.append(section.text)
+                continue
+
+            omitted = len(section.items) - section.kept_items
+            kept[section.name] = section.kept_items
+            dropped[section.name] = omitted
+            if not section.included or (section.kept_items == 0 and section.items):
+                continue
+            parts.append(section.header)
+            parts.append(section.separator.join(section.items[:section.kept_items]))
+            if omitted:
+                parts.append(_omitted_note(section.separator, omitted))
+            parts.append(section.footer)
+
+        text = "".join(parts)
+        result = PromptBuildResult(
+            text=text,
+            estimated_tokens=estimate_tokens(text),
+            budget_tokens=self.budget_tokens,
+            kept=kept,
+            dropped=dropped,
+        )
+        self._record(result)
+        return result
+
+    def _record(self, result: PromptBuildResult) -> None:
+        item_sections = {s.name for s in self._sections if s.items is not None}
+        prompt_stats["prompts"] += 1
+        prompt_stats["estimated_tokens"] += result.estimated_tokens
+        for name in result.kept:
+            if name in item_sections:
+                prompt_stats["items_kept"] += result.kept[name]
+                prompt_stats["items_dropped"] += result.dropped[name]
+            else:
+                prompt_stats["sections_dropped"] += result.dropped[name]
+        if result.truncated:
+            prompt_stats["truncated_prompts"] += 1
+            logger.warning(
+                f"Prompt {self.name} trimmed to ~{result.estimated_tokens}/{self.budget_tokens} tokens; "
+                f"dropped {', '.join(f'{k}={v}' for k, v in result.dropped.items() if v)}"
+            )
+
+def get_prompt_stats() -> Dict[str, Any]:
+    return dict(prompt_stats)
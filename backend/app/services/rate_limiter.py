@@ -0,0 +1,193 @@
+import time
+import heapq
+import random
+import asyncio
+import logging
+import itertools
+from contextlib import asynccontextmanager, contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+import redis.asyncio as aioredis
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Lower value = served first
+SEVERITY_PRIORITY = {"critical": 0, "high": 1, "medium": 2, "low": 3}
+DEFAULT_PRIORITY = SEVERITY_PRIORITY["medium"]
+
+# Priority of the incident currently being processed; inherited by tasks
+# spawned from the orchestrator (asyncio copies context on task creation).
+_priority: ContextVar[int] = ContextVar("llm_priority", default=DEFAULT_PRIORITY)
+
+class TokenBucket:
+    """
+    Continuous-refill token bucket sized for one minute of capacity.
+    """
+    def __init__(self, per_minute: int):
+        self.capacity = float(per_minute)
+        self.rate = per_minute / 60.0
+        self.tokens = self.capacity
+        self._updated = time.monotonic()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    async def take(self, amount: float) -> float:
+        """Waits until `amount` tokens are available; returns seconds waited."""
+        amount = min(amount, self.capacity)
+        waited = 0.0
+        while True:
+            self._refill()
+            if self.tokens >= amount:
+                self.tokens -= amount
+                return waited
+            delay = (amount - self.tokens) / self.rate
+            waited += delay
+            await asyncio.sleep(delay)
+
+    def debit(self, amount: float) -> None:
+        """Charges tokens after the fact (may go negative, delaying later callers)."""
+        self._refill()
+        self.tokens -= amount
+
+    def available(self) -> float:
+        self._refill()
+        return self.tokens
+
+class LLMRateLimiter:
+    """
+    Process-wide admission control for model calls.
+
+    Combines a max-in-flight limit, served in priority order (critical
+    incidents first, FIFO within a priority), with request-per-minute and
+    token-per-minute buckets. When LLM_RATE_LIMIT_REDIS_ENABLED is set, the
+    per-minute limits are also enforced across processes with fixed one-minute
+    windows in Redis; Redis errors fail open.
+    """
+    REDIS_PREFIX = "cybersentinel:llm:ratelimit:"
+
+    def __init__(self, max_in_flight: Optional[int] = None, requests_per_minute: Optional[int] = None,
+                 tokens_per_minute: Optional[int] = None, redis_url: Optional[str] = None):
+        self.max_in_flight = max_in_flight or settings.LLM_MAX_IN_FLIGHT
+        self.requests_per_minute = requests_per_minute or settings.LLM_REQUESTS_PER_MINUTE
+        self.tokens_per_minute = tokens_per_minute or settings.LLM_TOKENS_PER_MINUTE
+        self.redis_url = redis_url if redis_url is not None else (
+            settings.REDIS_URL if settings.LLM_RATE_LIMIT_REDIS_ENABLED else ""
+        )
+        self.request_bucket = TokenBucket(self.requests_per_minute)
+        self.token_bucket = TokenBucket(self.tokens_per_minute)
+        self._in_flight = 0
+        self._waiters: List[Tuple[int, int, asyncio.Future]] = []
+        self._seq = itertools.count()
+        self._redis = None
+        self.stats = {"admitted": 0, "queued": 0, "throttle_wait_seconds": 0.0}
+
+    @contextmanager
+    def priority(self, level: int):
+        token = _priority.set(level)
+        try:
+            yield
+        finally:
+            _priority.reset(token)
+
+    @staticmethod
+    def priority_for_events(events: Iterable[Dict[str, Any]]) -> int:
+        """Priority of the most severe event (events without a severity count as medium)."""
+        levels = [
+            SEVERITY_PRIORITY.get(str(e.get("severity", "")).lower(), DEFAULT_PRIORITY)
+            for e in events
+        ]
+        return min(levels, default=DEFAULT_PRIORITY)
+
+    @asynccontextmanager
+    async def acquire(self, estimated_tokens: int):
+        """Holds an in-flight slot and the rate budget for one model call."""
+        await self._acquire_slot(_priority.get())
+        try:
+            waited = await self.request_bucket.take(1)
+            waited += await self.token_bucket.take(estimated_tokens)
+            waited += await self._acquire_shared(estimated_tokens)
+            self.stats["throttle_wait_seconds"] += waited
+            self.stats["admitted"] += 1
+            yield
+        finally:
+            self._release_slot()
+
+    def settle(self, estimated_tokens: int, actual_tokens: int) -> None:
+        """Charges the difference once the real call size is known."""
+        if actual_tokens > estimated_tokens:
+            self.token_bucket.debit(actual_tokens - estimated_tokens)
+
+    def queue_depth(self) -> int:
+        return sum(1 for _, _, fut in self._waiters if not fut.done())
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            **self.stats,
+            "in_flight": self._in_flight,
+            "max_in_flight": self.max_in_flight,
+            "queue_depth": self.queue_depth(),
+            "requests_available": round(self.request_bucket.available(), 2),
+            "tokens_available": round(self.token_bucket.available(), 2),
+        }
+
+    async def _acquire_slot(self, priority: int) -> None:
+        if self._in_flight < self.max_in_flight and not self.queue_depth():
+            self._in_flight += 1
+            return
+
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (priority, next(self._seq), future))
+        self.stats["queued"] += 1
+        try:
+            await future
+        except asyncio.CancelledError:
+            # The slot may have been handed over just before cancellation
+            if future.done() and not future.cancelled():
+                self._release_slot()
+            raise
+
+    def _release_slot(self) -> None:
+        # Hand the slot directly to the highest-priority live waiter
+        while self._waiters:
+            _, _, future = heapq.heappop(self._waiters)
+            if not future.done():
+                future.set_result(None)
+                return
+        self._in_flight -= 1
+
+    async def _acquire_shared(self, estimated_tokens: int) -> float:
+        if not self.redis_url:
+            return 0.0
+        waited = 0.0
+        while True:
+            try:
+                if self._redis is None:
+                    self._redis = aioredis.from_url(self.redis_url, socket_connect_timeout=1, socket_timeout=1)
+                window = int(time.time() // 60)
+                pipe = self._redis.pipeline()
+                pipe.incr(f"{self.REDIS_PREFIX}req:{window}")
+                pipe.expire(f"{self.REDIS_PREFIX}req:{window}", 120)
+                pipe.incrby(f"{self.REDIS_PREFIX}tok:{window}", estimated_tokens)
+                pipe.expire(f"{self.REDIS_PREFIX}tok:{window}", 120)
+                requests, _, tokens, _ = await pipe.execute()
+            except Exception as e:
+                logger.warning(f"Shared LLM rate limit unavailable, continuing with local limits: {e}")
+                return waited
+
+            if requests <= self.requests_per_minute and tokens <= self.tokens_per_minute:
+                return waited
+            delay = 60 - (time.time() % 60) + 0.05
+            waited += delay
+            await asyncio.sleep(delay)
+
+def backoff_delay(attempt: int, base: Optional[float] = None, cap: Optional[float] = None) -> float:
+    """Exponential backoff with full jitter, so retrying callers spread out."""
+    base = base if base is not None else settings.LLM_BACKOFF_BASE_SECONDS
+    cap = cap if cap is not None else settings.LLM_BACKOFF_MAX_SECONDS
+    return random.uniform(0, min(cap, base * (2 ** attempt)))
+
+llm_rate_limiter = LLMRateLimiter()
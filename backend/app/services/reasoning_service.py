@@ -1,22 +1,53 @@
-from typing import List, Dict, Any
+from typing import List, Optional
 from app.models.event import Event
 from app.models.hypothesis import Hypothesis
+from app.models.agent_decision import AgentDecision
+from app.services.prompt_builder import PromptBuilder, PromptBuildResult
 
 class ReasoningService:
     """
     Utilities for reasoning and context preparation.
     """
-    def prepare_context_prompt(self, events: List[Event], hypotheses: List[Hypothesis]) -> str:
-        prompt = "System Context:\n"
-        prompt += f"Number of events: {len(events)}\n"
-        for i, event in enumerate(events):
-            prompt += f"Event {i}: {event.event_type} from {event.source}\n"
-        
+    def build_context_prompt(
+        self,
+        events: List[Event],
+        hypotheses: List[Hypothesis],
+        critiques: Optional[List[AgentDecision]] = None,
+        budget_tokens: Optional[int] = None
+    ) -> PromptBuildResult:
+        """
+        Builds the context prompt within a token budget.
+
+        Critique feedback is kept first, then prior hypotheses, then events
+        (newest first); the result reports how many of each were dropped.
+        """
+        builder = PromptBuilder(budget_tokens, name="context")
+        builder.add("header", f"System Context:\nNumber of events: {len(events)}\n", required=True)
+        builder.add_items(
+            "events",
+            [f"Event {i}: {event.event_type} from {event.source}" for i, event in enumerate(events)],
+            priority=10,
+            footer="\n"
+        )
         if hypotheses:
-            prompt += "\nPrevious Hypotheses:\n"
-            for h in hypotheses:
-                prompt += f"- {h.hypothesis_text} (Confidence: {h.confidence})\n"
-        
-        return prompt
+            builder.add_items(
+                "hypotheses",
+                [f"- {h.hypothesis_text} (Confidence: {h.confidence})" for h in hypotheses],
+                priority=20,
+                header="\nPrevious Hypotheses:\n",
+                footer="\n"
+            )
+        if critiques:
+            builder.add_items(
+                "critiques",
+                [f"- {c.reasoning_summary}" for c in critiques if c.reasoning_summary],
+                priority=30,
+                header="\nCritique Feedback:\n",
+                footer="\n"
+            )
+        return builder.build()
+
+    def prepare_context_prompt(self, events: List[Event], hypotheses: List[Hypothesis]) -> str:
+        return self.build_context_prompt(events, hypotheses).text
 
 reasoning_service = ReasoningService()
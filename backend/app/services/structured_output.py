@@ -0,0 +1,189 @@
+import re
+import logging
+import orjson
+from typing import Any, Dict, List, Optional, Tuple
+from pydantic import TypeAdapter, ValidationError
+
+logger = logging.getLogger(__name__)
+
+# Characters that change the scanner state; everything else is skipped in bulk
+_TOKEN_RE = re.compile(r'[{}\[\]"\\]')
+_CLOSERS = {"{": "}", "[": "]"}
+
+parser_stats: Dict[str, Dict[str, int]] = {}
+
+class StructuredOutputError(ValueError):
+    """The model output holds no JSON that validates against the expected schema."""
+
+def locate_json(text: str) -> Tuple[int, int]:
+    """
+    Bounds (start, end) of the JSON document in a model response: from the
+    first "{" or "[" to the last "}" or "]". Markdown fences and prose around
+    the document fall outside. end is -1 when no closing bracket follows.
+    """
+    starts = [i for i in (text.find("{"), text.find("[")) if i >= 0]
+    if not starts:
+        return -1, -1
+    start = min(starts)
+    end = max(text.rfind("}"), text.rfind("]"))
+    return start, (end + 1 if end > start else -1)
+
+def repair_truncated(text: str) -> Optional[str]:
+    """
+    Closes a JSON document cut off mid-way (e.g. by the output token limit).
+
+    The text is cut back to the last complete array element or object and
+    the brackets still open at that point are closed, so
+    {"hypotheses": [{...}, {...}, {"hypo  becomes  {"hypotheses": [{...}, {...}]}.
+    Returns None when nothing complete precedes the cut.
+    """
+    stack: List[str] = []
+    in_string = False
+    string_in_array = False
+    safe: Optional[Tuple[int, List[str]]] = None
+    pos = 0
+    while True:
+        match = _TOKEN_RE.search(text, pos)
+        if match is None:
+            break
+        char, i = match.group(), match.start()
+        pos = i + 1
+        if in_string:
+            if char == "\\":
+                pos = i + 2
+            elif char == '"':
+                in_string = False
+                if string_in_array:
+                    safe = (i + 1, list(stack))
+            continue
+        if char == '"':
+            in_string = True
+            string_in_array = bool(stack) and stack[-1] == "["
+        elif char in _CLOSERS:
+            stack.append(char)
+        elif stack:
+            stack.pop()
+            safe = (i + 1, list(stack))
+            if not stack:
+                break
+
+    if safe is None:
+        return None
+    end, open_brackets = safe
+    return text[:end] + "".join(_CLOSERS[b] for b in reversed(open_brackets))
+
+class StructuredOutputParser:
+    """
+    Extracts, decodes and validates the JSON in a model response.
+
+    Build one per schema at import time and reuse it: the pydantic
+    TypeAdapter is compiled once, and the document is decoded with orjson.
+    The fast path takes the span between the first opening and the last
+    closing bracket, so markdown fences and surrounding prose cost no extra
+    pass. Truncated output is repaired by
+    closing it after the last complete element. With salvage_key, a list
+    field whose items fail validation keeps the valid items instead of
+    failing the whole response.
+    """
+    def __init__(self, schema: Any, name: str, salvage_key: Optional[str] = None, item_schema: Any = None):
+        self.name = name
+        self.adapter = TypeAdapter(schema)
+        self.salvage_key = salvage_key
+        self.item_adapter = TypeAdapter(item_schema) if item_schema is not None else None
+        self.stats = parser_stats.setdefault(name, {"parsed": 0, "repaired": 0, "salvaged_items_dropped": 0,
+                                                    "failed": 0})
+
+    def parse(self, text: str) -> Any:
+        """
+        Returns the validated value (a model instance for model schemas).
+
+        Raises:
+            StructuredOutputError: No valid document could be recovered.
+        """
+        return self.parse_checked(text)[0]
+
+    def parse_checked(self, text: str) -> Tuple[Any, bool]:
+        """
+        parse(), plus whether the response was clean: False when it had to be
+        repaired or invalid salvage_key items were dropped. Such results
+        should not be cached, so the next identical prompt asks the model again.
+        """
+        start, end = locate_json(text)
+        if start < 0:
+            self.stats["failed"] += 1
+            raise StructuredOutputError(f"No JSON found in {self.name} response")
+
+        data = self._loads(text[start:end]) if end > 0 else None
+        if data is not None:
+            value, dropped = self._validate(data)
+            if value is None:
+                self.stats["failed"] += 1
+                raise StructuredOutputError(f"Invalid {self.name} response: {self._error(data)}")
+            self.stats["parsed"] += 1
+            return value, not dropped
+
+        repaired = repair_truncated(text[start:])
+        data = self._loads(repaired) if repaired is not None else None
+        value, _ = self._validate(data) if data is not None else (None, 0)
+        if value is None:
+            self.stats["failed"] += 1
+            raise StructuredOutputError(f"Malformed {self.name} response: no complete JSON document")
+        self.stats["repaired"] += 1
+        logger.warning(f"Repaired truncated {self.name} response ({len(text)} chars)")
+        return value, False
+
+    def dump(self, text: str) -> Dict[str, Any]:
+        """parse() as a plain dict."""
+        return self.dump_checked(text)[0]
+
+    def dump_checked(self, text: str) -> Tuple[Dict[str, Any], bool]:
+        """parse_checked() with the value as a plain dict."""
+        value, clean = self.parse_checked(text)
+        return (value.model_dump() if hasattr(value, "model_dump") else value), clean
+
+    def _validate(self, data: Any) -> Tuple[Any, int]:
+        """
+        Validates decoded data, dropping invalid items of the salvage_key list.
+
+        Returns the value (None if invalid) and the number of dropped items.
+        """
+        try:
+            return self.adapter.validate_python(data), 0
+        except ValidationError:
+            pass
+        if self.item_adapter is None or not isinstance(data, dict) or not isinstance(data.get(self.salvage_key), list):
+            return None, 0
+
+        items = []
+        for item in data[self.salvage_key]:
+            try:
+                items.append(self.item_adapter.validate_python(item))
+            except ValidationError:
+                continue
+        if not items:
+            return None, 0
+        try:
+            value = self.adapter.validate_python({**data, self.salvage_key: items})
+        except ValidationError:
+            return None, 0
+        dropped = len(data[self.salvage_key]) - len(items)
+        self.stats["salvaged_items_dropped"] += dropped
+        logger.warning(f"Dropped {dropped} invalid {self.salvage_key} from {self.name} response")
+        return value, dropped
+
+    def _error(self, data: Any) -> str:
+        try:
+            self.adapter.validate_python(data)
+        except ValidationError as e:
+            return str(e)
+        return "unknown error"
+
+    @staticmethod
+    def _loads(raw: str) -> Any:
+        try:
+            return orjson.loads(raw)
+        except orjson.JSONDecodeError:
+            return None
+
+def get_parser_stats() -> Dict[str, Dict[str, int]]:
+    return {name: dict(stats) for name, stats in parser_stats.items()}
@@ -0,0 +1,174 @@
+import os
+import time
+import asyncio
+import logging
+import functools
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Awaitable, Callable, Iterator, Optional, Tuple, TypeVar
+from prometheus_client import (
+    CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Gauge, Histogram, generate_latest, multiprocess,
+)
+
+logger = logging.getLogger(__name__)
+
+# Trace id of the incident being processed; set by trace_context and copied into asyncio tasks
+trace_id_var: ContextVar[str] = ContextVar("trace_id", default="-")
+
+LOG_FORMAT = "%(asctime)s %(levelname)s [%(trace_id)s] %(name)s: %(message)s"
+
+_LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60, 120)
+_SIZE_BUCKETS = (256, 1024, 4096, 8192, 16384, 32768, 65536, 131072, 262144)
+
+SPAN_SECONDS = Histogram(
+    "cybersentinel_span_seconds", "Duration of instrumented operations (orchestrator, agents, LLM calls)",
+    ["span", "status"], buckets=_LATENCY_BUCKETS,
+)
+HTTP_REQUEST_SECONDS = Histogram(
+    "cybersentinel_http_request_seconds", "HTTP request duration, including response serialization",
+    ["method", "route", "status"], buckets=_LATENCY_BUCKETS,
+)
+LLM_ATTEMPTS = Counter(
+    "cybersentinel_llm_attempts_total", "Model call attempts by outcome", ["task", "outcome"],
+)
+LLM_ADMISSION_WAIT_SECONDS = Histogram(
+    "cybersentinel_llm_admission_wait_seconds", "Time waiting for an in-flight slot and rate budget",
+    ["task"], buckets=_LATENCY_BUCKETS,
+)
+LLM_RETRY_SLEEP_SECONDS = Histogram(
+    "cybersentinel_llm_retry_sleep_seconds", "Backoff slept before retrying a model call",
+    ["task", "reason"], buckets=_LATENCY_BUCKETS,
+)
+LLM_PROMPT_CHARS = Histogram(
+    "cybersentinel_llm_prompt_chars", "Prompt size in characters", ["task"], buckets=_SIZE_BUCKETS,
+)
+LLM_RESPONSE_CHARS = Histogram(
+    "cybersentinel_llm_response_chars", "Response size in characters", ["task"], buckets=_SIZE_BUCKETS,
+)
+LLM_COALESCED_CALLS = Counter(
+    "cybersentinel_llm_coalesced_calls_total", "Calls that joined an identical in-flight request", ["task"],
+)
+LLM_ROUTE_SECONDS = Histogram(
+    "cybersentinel_llm_route_seconds", "Model call duration per route and model tier, retries included",
+    ["route", "tier"], buckets=_LATENCY_BUCKETS,
+)
+LLM_ESCALATIONS = Counter(
+    "cybersentinel_llm_escalations_total", "Fast-model answers asked again of the large model", ["route", "reason"],
+)
+DB_SESSION_SECONDS = Histogram(
+    "cybersentinel_db_session_seconds", "Lifetime of a database session, from creation to close",
+    buckets=_LATENCY_BUCKETS,
+)
+DB_POOL_WAIT_SECONDS = Histogram(
+    "cybersentinel_db_pool_wait_seconds", "Time spent getting a connection from the pool",
+    buckets=_LATENCY_BUCKETS,
+)
+DB_POOL_CONNECTIONS = Gauge(
+    "cybersentinel_db_pool_connections", "Pooled connections by state (in_use, idle, overflow)", ["state"],
+    multiprocess_mode="livesum",
+)
+DB_QUERY_SECONDS = Histogram(
+    "cybersentinel_db_query_seconds", "Statement execution time by SQL verb", ["operation"],
+    buckets=_LATENCY_BUCKETS,
+)
+
+_T = TypeVar("_T")
+
+def _install_record_factory() -> None:
+    """Gives every log record a trace_id attribute, so LOG_FORMAT works for any logger and handler."""
+    previous = logging.getLogRecordFactory()
+    if getattr(previous, "adds_trace_id", False):
+        return
+
+    def factory(*args, **kwargs):
+        record = previous(*args, **kwargs)
+        record.trace_id = trace_id_var.get()
+        return record
+
+    factory.adds_trace_id = True
+    logging.setLogRecordFactory(factory)
+
+_install_record_factory()
+
+@contextmanager
+def trace_context(trace_id: str) -> Iterator[str]:
+    """
+    Tags everything logged inside the block (and in tasks it starts) with
+    trace_id. An already active trace id is kept, so a Celery task or an
+    outer request can set it first.
+    """
+    if trace_id_var.get() != "-":
+        yield trace_id_var.get()
+        return
+    token = trace_id_var.set(trace_id)
+    try:
+        yield trace_id
+    finally:
+        trace_id_var.reset(token)
+
+@contextmanager
+def span(name: str) -> Iterator[None]:
+    """Records the duration of the block in cybersentinel_span_seconds{span=name}."""
+    start = time.perf_counter()
+    status = "ok"
+    try:
+        yield
+    except BaseException as e:
+        status = "cancelled" if isinstance(e, asyncio.CancelledError) else "error"
+        raise
+    finally:
+        elapsed = time.perf_counter() - start
+        SPAN_SECONDS.labels(name, status).observe(elapsed)
+        logger.debug("span %s %s in %.1fms", name, status, elapsed * 1000)
+
+def traced(name: str) -> Callable[[Callable[..., Awaitable[_T]]], Callable[..., Awaitable[_T]]]:
+    """Decorator form of span() for coroutine functions."""
+    def decorator(func: Callable[..., Awaitable[_T]]) -> Callable[..., Awaitable[_T]]:
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs) -> _T:
+            with span(name):
+                return await func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+class MetricsMiddleware:
+    """ASGI middleware recording cybersentinel_http_request_seconds per route template."""
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        start = time.perf_counter()
+        status = 500
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            route = scope.get("route")
+            HTTP_REQUEST_SECONDS.labels(
+                scope["method"], getattr(route, "path", "unmatched"), str(status)
+            ).observe(time.perf_counter() - start)
+
+def render_metrics() -> Tuple[bytes, str]:
+    """
+    Prometheus exposition of this process's metrics, or of all worker
+    processes when PROMETHEUS_MULTIPROC_DIR is set (several uvicorn workers).
+    """
+    registry = REGISTRY
+    if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    return generate_latest(registry), CONTENT_TYPE_LATEST
+
+def sample_value(name: str, labels: Optional[dict] = None) -> float:
+    """Current value of one sample in the default registry (0.0 if absent); for tests and benchmarks."""
+    return REGISTRY.get_sample_value(name, labels or {}) or 0.0
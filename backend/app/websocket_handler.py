@@ -1,24 +1,263 @@
-from typing import List, Dict
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable, Dict, Optional, Set, Union
 from fastapi import WebSocket
+import msgpack
+import orjson
+import redis
+import redis.asyncio as aioredis
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Redis channels (one per tenant) used to fan messages out to the WebSocket
+# clients of every API worker, whichever process (API or Celery) sent them.
+WS_CHANNEL_PREFIX = "cybersentinel:ws:"
+
+# Subprotocol a client offers to receive MessagePack binary frames instead of JSON text
+MSGPACK_SUBPROTOCOL = "cybersentinel.msgpack"
+
+def encode_json(message: Dict[str, Any]) -> bytes:
+    """Serializes a message for the wire and the Redis relay (datetimes as ISO 8601)."""
+    return orjson.dumps(message, default=str, option=orjson.OPT_NON_STR_KEYS)
+
+class Frame:
+    """
+    One broadcast message, serialized at most once per wire format and
+    shared by every subscriber it is queued for.
+
+    JSON clients expect text frames, and ASGI only accepts a str for those,
+    so the JSON form is decoded to a str once per frame. The server still
+    UTF-8 encodes that str on each send; what is shared is the orjson
+    serialization, not the bytes on the wire.
+    """
+    __slots__ = ("_message", "_json_bytes", "_json", "_msgpack")
+
+    def __init__(self, message: Optional[Dict[str, Any]] = None, json_bytes: Optional[bytes] = None):
+        self._message = message
+        self._json_bytes = json_bytes
+        self._json: Optional[str] = None
+        self._msgpack: Optional[bytes] = None
+
+    def encode(self, binary: bool) -> Union[str, bytes]:
+        if binary:
+            if self._msgpack is None:
+                # Round-trip through JSON so both formats carry the same values
+                self._msgpack = msgpack.packb(orjson.loads(self._serialized()))
+            return self._msgpack
+        if self._json is None:
+            self._json = self._serialized().decode()
+        return self._json
+
+    def _serialized(self) -> bytes:
+        if self._json_bytes is None:
+            self._json_bytes = encode_json(self._message)
+        return self._json_bytes
+
+class _Subscriber:
+    """One client socket with its bounded send queue and writer task."""
+    __slots__ = ("websocket", "tenant_id", "queue", "task", "binary")
+
+    def __init__(self, websocket: WebSocket, tenant_id: str, queue_size: int, binary: bool = False):
+        self.websocket = websocket
+        self.tenant_id = tenant_id
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+        self.task: Optional[asyncio.Task] = None
+        self.binary = binary  # MessagePack frames instead of JSON text
 
 class ConnectionManager:
-    def __init__(self):
-        # tenant_id -> list of websockets
-        self.active_connections: Dict[str, List[WebSocket]] = {}
+    """
+    Fans out messages to the WebSocket clients of each tenant.
+
+    Every connection gets a bounded send queue drained by its own writer
+    task, so broadcast() only enqueues and never waits on a socket. A
+    client whose queue fills up (a slow consumer), or whose send times out
+    or fails, is disconnected without affecting the others.
+
+    A message is serialized once per broadcast, not once per client:
+    subscribers share one Frame (see Frame for what each send still costs). Clients that offer the MSGPACK_SUBPROTOCOL
+    subprotocol get MessagePack binary frames, others JSON text.
+
+    broadcast() reaches the clients of this process only. publish() goes
+    through Redis pub/sub, and every API worker relays it to its own
+    clients via listen().
+    """
+    def __init__(self, queue_size: Optional[int] = None, send_timeout: Optional[float] = None, redis_client=None):
+        self.queue_size = queue_size or settings.WS_SEND_QUEUE_SIZE
+        self.send_timeout = send_timeout or settings.WS_SEND_TIMEOUT_SECONDS
+        # tenant_id -> id(websocket) -> subscriber (Starlette websockets are not hashable)
+        self.active_connections: Dict[str, Dict[int, _Subscriber]] = {}
+        self._closing: Set[asyncio.Task] = set()
+        self._redis = redis_client
+        self.stats = {"broadcasts": 0, "delivered": 0, "evicted": 0, "send_errors": 0, "published": 0,
+                      "publish_fallbacks": 0}
 
     async def connect(self, websocket: WebSocket, tenant_id: str):
-        await websocket.accept()
-        if tenant_id not in self.active_connections:
-            self.active_connections[tenant_id] = []
-        self.active_connections[tenant_id].append(websocket)
+        offered = websocket.scope.get("subprotocols") or []
+        binary = MSGPACK_SUBPROTOCOL in offered
+        await websocket.accept(subprotocol=MSGPACK_SUBPROTOCOL if binary else None)
+        subscriber = _Subscriber(websocket, tenant_id, self.queue_size, binary=binary)
+        subscriber.task = asyncio.create_task(self._writer(subscriber))
+        self.active_connections.setdefault(tenant_id, {})[id(websocket)] = subscriber
 
     def disconnect(self, websocket: WebSocket, tenant_id: str):
-        if tenant_id in self.active_connections:
-            self.active_connections[tenant_id].remove(websocket)
+        subscribers = self.active_connections.get(tenant_id)
+        subscriber = subscribers.pop(id(websocket), None) if subscribers is not None else None
+        if subscribers is not None and not subscribers:
+            del self.active_connections[tenant_id]
+        if subscriber is not None and subscriber.task is not None and subscriber.task is not asyncio.current_task():
+            subscriber.task.cancel()
+
+    async def broadcast(self, tenant_id: str, message: Union[Dict[str, Any], Frame]):
+        """Queues a message for every client of the tenant connected to this process."""
+        subscribers = self.active_connections.get(tenant_id)
+        if not subscribers:
+            return
+        self.stats["broadcasts"] += 1
+        frame = message if isinstance(message, Frame) else Frame(message)
+        for subscriber in list(subscribers.values()):
+            try:
+                subscriber.queue.put_nowait(frame)
+            except asyncio.QueueFull:
+                self._evict(subscriber, f"send queue full ({self.queue_size} messages)", code=1013)
 
-    async def broadcast(self, tenant_id: str, message: dict):
-        if tenant_id in self.active_connections:
-            for connection in self.active_connections[tenant_id]:
-                await connection.send_json(message)
+    async def publish(self, tenant_id: str, message: Dict[str, Any]):
+        """
+        Sends a message to the tenant's clients on every API worker via Redis.
+        Falls back to this process's clients when Redis is unavailable.
+        """
+        client = self._client()
+        if client is not None:
+            try:
+                await client.publish(f"{WS_CHANNEL_PREFIX}{tenant_id}", encode_json(message))
+                self.stats["published"] += 1
+                return
+            except Exception as e:
+                logger.warning(f"Failed to publish message for tenant {tenant_id}: {e}")
+        self.stats["publish_fallbacks"] += 1
+        await self.broadcast(tenant_id, message)
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            **self.stats,
+            "tenants": len(self.active_connections),
+            "connections": sum(len(s) for s in self.active_connections.values()),
+            "queued": sum(sub.queue.qsize() for s in self.active_connections.values() for sub in s.values()),
+        }
+
+    async def _writer(self, subscriber: _Subscriber):
+        websocket = subscriber.websocket
+        while True:
+            frame: Frame = await subscriber.queue.get()
+            try:
+                if subscriber.binary:
+                    send = websocket.send_bytes(frame.encode(True))
+                else:
+                    send = websocket.send_text(frame.encode(False))
+                await asyncio.wait_for(send, timeout=self.send_timeout)
+            except asyncio.TimeoutError:
+                self._evict(subscriber, f"send timed out after {self.send_timeout}s", code=1013)
+                return
+            except Exception as e:
+                self.stats["send_errors"] += 1
+                self._evict(subscriber, f"send failed: {e}", code=1011)
+                return
+            self.stats["delivered"] += 1
+
+    def _evict(self, subscriber: _Subscriber, reason: str, code: int):
+        self.stats["evicted"] += 1
+        logger.warning(f"Disconnecting WebSocket client of tenant {subscriber.tenant_id}: {reason}")
+        self.disconnect(subscriber.websocket, subscriber.tenant_id)
+        task = asyncio.create_task(self._close(subscriber.websocket, code))
+        self._closing.add(task)
+        task.add_done_callback(self._closing.discard)
+
+    async def _close(self, websocket: WebSocket, code: int):
+        try:
+            await asyncio.wait_for(websocket.close(code=code), timeout=self.send_timeout)
+        except Exception:
+            pass
+
+    def _client(self):
+        if self._redis is None and settings.WS_REDIS_ENABLED:
+            self._redis = aioredis.from_url(settings.REDIS_URL, socket_connect_timeout=1, socket_timeout=1)
+        return self._redis
+
+    async def listen(self, redis_url: str = None):
+        """
+        Relays messages published on the Redis tenant channels to local sockets.
+
+        Runs for the lifetime of the API process and reconnects with a capped
+        backoff if Redis is unavailable. Returns at once when WS_REDIS_ENABLED
+        is off.
+        """
+        if not settings.WS_REDIS_ENABLED:
+            return
+        redis_url = redis_url or settings.REDIS_URL
+        backoff = 1
+        while True:
+            try:
+                client = aioredis.from_url(redis_url)
+                async with client.pubsub() as pubsub:
+                    await pubsub.psubscribe(f"{WS_CHANNEL_PREFIX}*")
+                    backoff = 1
+                    logger.info("Subscribed to WebSocket relay channels")
+                    async for item in pubsub.listen():
+                        if item.get("type") != "pmessage":
+                            continue
+                        channel = item["channel"].decode()
+                        tenant_id = channel[len(WS_CHANNEL_PREFIX):]
+                        if tenant_id not in self.active_connections:
+                            continue
+                        try:
+                            # Published payloads are already JSON; JSON clients get them as is
+                            await self.broadcast(tenant_id, Frame(json_bytes=item["data"]))
+                        except Exception as e:
+                            logger.warning(f"Failed to relay message to tenant {tenant_id}: {e}")
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"WebSocket relay disconnected: {e}. Reconnecting in {backoff}s...")
+                await asyncio.sleep(backoff)
+                backoff = min(backoff * 2, 30)
 
 manager = ConnectionManager()
+
+# Synchronous client of publish_to_tenant, created on first use; its
+# connection pool is shared by every call (and thread) in the process
+_publisher: Optional[redis.Redis] = None
+
+def _publisher_client() -> redis.Redis:
+    global _publisher
+    if _publisher is None:
+        _publisher = redis.Redis.from_url(settings.REDIS_URL, socket_connect_timeout=1, socket_timeout=1)
+    return _publisher
+
+def publish_to_tenant(tenant_id: str, message: Dict[str, Any]):
+    """
+    Publishes a message for a tenant's sockets from any process.
+
+    Synchronous so it can be called from Celery tasks; the API process
+    forwards it to connected clients via ConnectionManager.listen.
+    """
+    try:
+        client = _publisher_client()
+        client.publish(f"{WS_CHANNEL_PREFIX}{tenant_id}", encode_json(message))
+    except Exception as e:
+        logger.warning(f"Failed to publish message for tenant {tenant_id}: {e}")
+
+Notifier = Callable[[Dict[str, Any]], Awaitable[None]]
+
+def tenant_notifier(tenant_id: str) -> Notifier:
+    """
+    Returns an async callable that pushes messages to a tenant's sockets on
+    every API worker. Usable from the API process and from Celery workers;
+    delivery failures are logged, never raised.
+    """
+    async def notify(message: Dict[str, Any]):
+        try:
+            await manager.publish(tenant_id, message)
+        except Exception as e:
+            logger.warning(f"Failed to push message to tenant {tenant_id}: {e}")
+
+    return notify
@@ -1,10 +1,13 @@
 from celery import Celery
+from celery.signals import setup_logging
 from app.config import settings
+from app.logging_config import configure_logging
 
 celery_app = Celery(
     "cybersentinel",
     broker=settings.REDIS_URL,
-    backend=settings.REDIS_URL
+    backend=settings.REDIS_URL,
+    include=["app.workers.tasks"]
 )
 
 celery_app.conf.update(
@@ -13,4 +16,19 @@ celery_app.conf.update(
     result_serializer="json",
     timezone="UTC",
     enable_utc=True,
+    task_track_started=True,
+    result_expires=settings.ANALYSIS_JOB_RESULT_TTL_SECONDS,
+    # One consumer owns the correlation windows; see CorrelationEngine
+    task_routes={"tasks.correlate_events_task": {"queue": "correlation"}},
+    beat_schedule={
+        "maintain-event-partitions": {
+            "task": "tasks.maintain_event_partitions_task",
+            "schedule": float(settings.EVENTS_MAINTENANCE_INTERVAL_SECONDS),
+        },
+    },
 )
+
+@setup_logging.connect
+def _configure_worker_logging(**kwargs):
+    # Replaces Celery's own logging setup: same queued handler and trace-id format as the API
+    configure_logging()
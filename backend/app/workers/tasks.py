@@ -1,24 +1,107 @@
 import asyncio
+import logging
+from typing import List, Dict, Any, Optional
 from uuid import UUID
+from app.config import settings
 from app.workers.celery_app import celery_app
-from app.db.database import AsyncSessionLocal
+from app.db.database import AsyncSessionLocal, engine
+from app.db.partitions import maintain_partitions
 from app.orchestrator.incident_orchestrator import orchestrator
+from app.services.llm_cache import llm_cache
+from app.services.correlation_engine import correlation_engine
+from app.services.persistence_queue import persistence_queue
+from app.websocket_handler import publish_to_tenant, tenant_notifier
+
+logger = logging.getLogger(__name__)
+
+# One event loop per worker process. The async engine's pooled connections
+# are bound to the loop that opened them, so tasks must not each create
+# (and close) their own loop with asyncio.run().
+_loop: Optional[asyncio.AbstractEventLoop] = None
+
+def run_async(coro):
+    global _loop
+    if _loop is None or _loop.is_closed():
+        _loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(_loop)
+    return _loop.run_until_complete(_run_and_flush(coro))
+
+async def _run_and_flush(coro):
+    # The loop only runs while a task executes, so drain the write-behind
+    # queue before handing control back to Celery
+    try:
+        return await coro
+    finally:
+        await persistence_queue.flush()
 
 @celery_app.task(name="tasks.analyze_incident_task")
 def analyze_incident_task(incident_id_str: str):
     """
-    Celery task to trigger incident analysis.
+    Celery task to trigger analysis of a stored incident.
     Uses a synchronous wrapper to call the async orchestrator.
     """
     incident_id = UUID(incident_id_str)
-    
-    loop = asyncio.get_event_loop()
-    if loop.is_running():
-        # This shouldn't happen in a standard Celery worker but good to have
-        asyncio.run_coroutine_threadsafe(run_analysis(incident_id), loop)
+    return run_async(run_analysis(incident_id))
+
+async def run_analysis(incident_id: UUID) -> Dict[str, Any]:
+    async with AsyncSessionLocal() as db:
+        return await orchestrator.advance_incident(db, incident_id)
+
+@celery_app.task(name="tasks.process_incident_task")
+def process_incident_task(incident_id: str, tenant_id: str, events: List[Dict[str, Any]], mode: Optional[str] = None,
+                          bypass_cache: bool = False):
+    """
+    Runs the full analysis workflow for an /incidents/analyze/async job.
+
+    The task id is the incident id, so the result can be polled via
+    GET /api/incidents/jobs/{incident_id}. Hypotheses, as they are
+    generated, and completion are pushed to the tenant's WebSocket.
+    """
+    with llm_cache.bypass(bypass_cache):
+        result = run_async(orchestrator.process_incident(incident_id, events, mode=mode,
+                                                         notify=tenant_notifier(tenant_id)))
+
+    message = {
+        "type": "analysis_completed" if result.get("status") == "completed" else "analysis_failed",
+        "job_id": incident_id,
+        "incident_id": incident_id,
+        "status": result.get("status"),
+    }
+    if result.get("status") == "completed":
+        message["final_decision"] = result.get("final_decision")
     else:
-        loop.run_until_complete(run_analysis(incident_id))
+        message["error"] = result.get("error")
+    publish_to_tenant(tenant_id, message)
+
+    return result
+
+@celery_app.task(name="tasks.maintain_event_partitions_task")
+def maintain_event_partitions_task():
+    """
+    Creates upcoming events partitions and drops (or archives) expired ones.
+    Scheduled by Celery beat every EVENTS_MAINTENANCE_INTERVAL_SECONDS.
+    """
+    return run_async(run_partition_maintenance())
+
+async def run_partition_maintenance() -> Dict[str, Any]:
+    async with engine.begin() as conn:
+        return await conn.run_sync(maintain_partitions)
+
+@celery_app.task(name="tasks.correlate_events_task")
+def correlate_events_task(records: List[Dict[str, Any]]):
+    """
+    Feeds newly ingested events to the correlation engine. Incidents it opens
+    are announced on the tenant's WebSocket and, with CORRELATION_AUTO_ANALYZE,
+    queued for analysis.
+    """
+    opened = run_async(run_correlation(records))
+    for incident in opened:
+        publish_to_tenant(incident["tenant_id"], {"type": "incident_created", "incident_id": incident["id"],
+                                                  "title": incident["title"]})
+        if settings.CORRELATION_AUTO_ANALYZE:
+            analyze_incident_task.delay(incident["id"])
+    return {"events": len(records), "incidents_opened": [i["id"] for i in opened]}
 
-async def run_analysis(incident_id: UUID):
+async def run_correlation(records: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
     async with AsyncSessionLocal() as db:
-        await orchestrator.advance_incident(db, incident_id)
+        return await correlation_engine.process(db, records)
@@ -0,0 +1,104 @@
+"""
+Runs the same concurrent query load against several engine configurations
+(pool size/overflow, SQL echo, asyncpg statement cache) and reports
+throughput, query latency and pool checkout wait.
+
+Usage (from backend/):
+    DATABASE_URL=postgresql+asyncpg://... python -m benchmarks.bench_db_pool --concurrency 64 --queries 50 | grep q/s
+
+The echo configuration writes every statement to stdout, as DB_ECHO=true would.
+"""
+import argparse
+import asyncio
+import time
+import uuid
+
+from sqlalchemy import select, func
+
+from app.config import settings
+from app.db.database import Base, build_engine, engine_options
+from app.db.pool_metrics import get_pool_stats
+from app.models.event import Event
+from app.models.tenant import Tenant
+
+CONFIGS = [
+    ("pool 5 + 10, echo on", {"echo": True, "pool_size": 5, "max_overflow": 10}),
+    ("pool 5 + 10", {"pool_size": 5, "max_overflow": 10}),
+    ("pool 10 + 20", {"pool_size": 10, "max_overflow": 20}),
+    ("pool 20 + 40", {"pool_size": 20, "max_overflow": 40}),
+]
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))] if values else 0.0
+
+
+async def run_config(name: str, overrides: dict, concurrency: int, queries: int, tenant_id: uuid.UUID) -> None:
+    engine = build_engine(**overrides)
+    latencies = []
+
+    async def worker():
+        for _ in range(queries):
+            start = time.perf_counter()
+            async with engine.connect() as conn:
+                await conn.execute(
+                    select(Event.id, Event.created_at)
+                    .where(Event.tenant_id == tenant_id)
+                    .order_by(Event.created_at.desc())
+                    .limit(50)
+                )
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+    stats = get_pool_stats(engine)
+    await engine.dispose()
+
+    total = concurrency * queries
+    print(
+        f"{name:<24} {total / elapsed:9.0f} q/s  "
+        f"p50 {percentile(latencies, 0.50) * 1000:7.2f}ms  p95 {percentile(latencies, 0.95) * 1000:7.2f}ms  "
+        f"wait p95 {stats.get('wait_seconds_p95', 0) * 1000:7.2f}ms  "
+        f"connects {stats.get('connects', 0):4}  timeouts {stats.get('checkout_timeouts', 0)}"
+    )
+
+
+async def run(concurrency: int, queries: int, rows: int) -> None:
+    engine = build_engine()
+    tenant_id = uuid.uuid4()
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+        count = await conn.scalar(select(func.count()).select_from(Event))
+        if not count:
+            await conn.execute(Tenant.__table__.insert(), [{"id": tenant_id, "name": f"bench-{tenant_id}"}])
+            await conn.execute(
+                Event.__table__.insert(),
+                [{"id": uuid.uuid4(), "tenant_id": tenant_id, "source": "bench", "event_type": "probe",
+                  "payload": {"seq": i}} for i in range(rows)],
+            )
+        else:
+            tenant_id = await conn.scalar(select(Event.tenant_id).limit(1))
+    driver = engine.dialect.driver
+    await engine.dispose()
+
+    print(f"driver: {driver}, concurrency: {concurrency}, queries/worker: {queries}")
+    configs = list(CONFIGS)
+    if driver == "asyncpg":
+        configs.append(("pool 10 + 20, no stmt cache", {
+            "pool_size": 10, "max_overflow": 20,
+            "url": engine_options(settings.DATABASE_URL)["url"].update_query_dict({"prepared_statement_cache_size": "0"}),
+        }))
+    for name, overrides in configs:
+        await run_config(name, overrides, concurrency, queries, tenant_id)
+    print(f"configured: pool {settings.DB_POOL_SIZE} + {settings.DB_MAX_OVERFLOW}, echo {settings.DB_ECHO}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--queries", type=int, default=50)
+    parser.add_argument("--rows", type=int, default=1000)
+    args = parser.parse_args()
+    asyncio.run(run(args.concurrency, args.queries, args.rows))
@@ -0,0 +1,357 @@
+"""
+End-to-end benchmark of the API through the ASGI app in-process, with the
+simulated LLM provider. Stages, each at --concurrency concurrent operations:
+
+  ingest     POST /api/logs/ingest/batch (--batch-size events per request)
+  analyze    POST /api/incidents/analyze (LLM cache bypassed unless --llm-cache)
+  timeline   GET  /api/incidents/{id}/timeline over seeded incidents
+  ws         ConnectionManager.broadcast to --ws-clients in-process sockets,
+             timed until every socket has been sent the message
+
+Each stage reports throughput and p50/p95/p99 latency, then replays a few
+operations (--alloc-ops) one at a time under tracemalloc for the peak
+memory allocated per operation and what stays allocated afterwards. Results
+are written as JSON together with the git commit; --compare prints the
+change against an earlier results file.
+
+Usage (from backend/; SQLite or Postgres via DATABASE_URL, Redis optional):
+    DATABASE_URL=sqlite+aiosqlite:///./bench.db python -m benchmarks.bench_e2e --concurrency 16
+    python -m benchmarks.bench_e2e --stages analyze --requests 500 --llm-latency-ms 1500 \\
+        --llm-error-rate 0.02 --compare benchmarks/results/e2e-<commit>.json
+"""
+import argparse
+import asyncio
+import json
+import logging
+import platform
+import subprocess
+import time
+import tracemalloc
+import uuid
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, List
+
+from httpx import AsyncClient, ASGITransport
+
+from app.config import settings
+from app.db.database import AsyncSessionLocal, Base, engine
+from app.main import app
+from app.models.agent_decision import AgentDecision
+from app.models.hypothesis import Hypothesis
+from app.models.incident import Incident
+from app.models.tenant import Tenant
+from app.services.gemini_service import gemini_service
+from app.services.llm_providers import SimulatedProvider
+from app.services.rate_limiter import LLMRateLimiter
+from app.services.triage_classifier import triage_classifier
+from app.websocket_handler import ConnectionManager, Frame
+
+RESULTS_DIR = Path(__file__).parent / "results"
+STAGES = ["ingest", "analyze", "timeline", "ws"]
+MESSAGES = [
+    "Failed password for {user} from {ip} port {port} ssh2",
+    "Connection attempt to port {port} from {ip} blocked",
+    "Outbound transfer of {size} MB from 10.0.0.{host} to {ip}",
+    "sudo: {user} : command not allowed ; COMMAND=/bin/bash",
+]
+
+
+def percentile(values: List[float], fraction: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))] if values else 0.0
+
+
+def make_events(seq: int, count: int) -> List[Dict[str, Any]]:
+    template = MESSAGES[seq % len(MESSAGES)]
+    base = datetime(2024, 5, 20, tzinfo=timezone.utc) + timedelta(minutes=seq)
+    return [
+        {
+            "timestamp": (base + timedelta(seconds=i)).isoformat(),
+            "log_message": template.format(user=f"user{i % 7}", ip=f"198.51.{seq % 256}.{i % 251}",
+                                           port=1000 + i, size=50 + i, host=i % 254),
+            "source": "bench",
+            "severity": "high",
+        }
+        for i in range(count)
+    ]
+
+
+async def run_stage(name: str, op: Callable[[int], Awaitable[Any]], total: int, concurrency: int,
+                    alloc_ops: int, units_per_op: int = 1) -> Dict[str, Any]:
+    """Runs op(0..total-1) with `concurrency` workers, then the allocation pass."""
+    latencies: List[float] = []
+    errors: List[str] = []
+    next_seq = iter(range(total))
+
+    async def worker():
+        for seq in next_seq:
+            start = time.perf_counter()
+            try:
+                await op(seq)
+            except Exception as e:
+                errors.append(f"{type(e).__name__}: {e}")
+                continue
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+
+    result = {
+        "operations": total,
+        "errors": len(errors),
+        "duration_s": round(elapsed, 3),
+        "throughput_per_s": round(len(latencies) * units_per_op / elapsed, 2) if elapsed else 0.0,
+        "latency_ms": {
+            "p50": round(percentile(latencies, 0.50) * 1000, 2),
+            "p95": round(percentile(latencies, 0.95) * 1000, 2),
+            "p99": round(percentile(latencies, 0.99) * 1000, 2),
+            "max": round(max(latencies, default=0.0) * 1000, 2),
+        },
+        "allocations": await measure_allocations(op, total, alloc_ops),
+    }
+    if units_per_op != 1:
+        result["units_per_op"] = units_per_op
+    if errors:
+        result["first_errors"] = sorted(set(errors))[:5]
+    print(f"{name:<9} {result['throughput_per_s']:>10.1f}/s  p50 {result['latency_ms']['p50']:>8.1f} ms  "
+          f"p95 {result['latency_ms']['p95']:>8.1f} ms  p99 {result['latency_ms']['p99']:>8.1f} ms  "
+          f"errors {len(errors)}  peak alloc/op {result['allocations']['peak_kib_per_op']:.0f} KiB")
+    return result
+
+
+async def measure_allocations(op: Callable[[int], Awaitable[Any]], offset: int, count: int) -> Dict[str, float]:
+    """Peak memory allocated by one operation (median) and memory still allocated after `count` of them."""
+    peaks: List[int] = []
+    tracemalloc.start()
+    try:
+        baseline = tracemalloc.get_traced_memory()[0]
+        for seq in range(offset, offset + count):
+            before = tracemalloc.get_traced_memory()[0]
+            tracemalloc.reset_peak()
+            try:
+                await op(seq)
+            except Exception:
+                continue
+            peaks.append(tracemalloc.get_traced_memory()[1] - before)
+        retained = tracemalloc.get_traced_memory()[0] - baseline
+    finally:
+        tracemalloc.stop()
+    return {
+        "ops": len(peaks),
+        "peak_kib_per_op": round(percentile(peaks, 0.5) / 1024, 1),
+        "retained_kib": round(retained / 1024, 1),
+    }
+
+
+class SinkSocket:
+    """Stands in for a client WebSocket; reports each message it is sent."""
+
+    def __init__(self, delivered: Callable[[str], None]):
+        self.scope = {"subprotocols": []}
+        self.delivered = delivered
+
+    async def accept(self, subprotocol=None):
+        pass
+
+    async def send_text(self, text: str):
+        self.delivered(text)
+
+    async def close(self, code: int = 1000):
+        pass
+
+
+async def seed_timelines(tenant_id: str, incidents: int, rows: int) -> List[str]:
+    base = datetime.now(timezone.utc)
+    ids = []
+    async with AsyncSessionLocal() as db:
+        for n in range(incidents):
+            incident = Incident(tenant_id=uuid.UUID(tenant_id), title=f"bench incident {n}")
+            db.add(incident)
+            await db.flush()
+            for i in range(rows):
+                created_at = base + timedelta(seconds=i)
+                if i % 2:
+                    db.add(AgentDecision(incident_id=incident.id, agent_type="critic", created_at=created_at,
+                                         decision_payload={"seq": i, "actions": ["Block IP"] * 5},
+                                         reasoning_summary=f"review {i}"))
+                else:
+                    db.add(Hypothesis(incident_id=incident.id, hypothesis_text=f"hypothesis {i}",
+                                      confidence=0.5, threat_type="other", created_at=created_at))
+            ids.append(str(incident.id))
+        await db.commit()
+    return ids
+
+
+async def run(args) -> Dict[str, Any]:
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+
+    provider = SimulatedProvider(latency_ms=args.llm_latency_ms, distribution=args.llm_distribution,
+                                 error_rate=args.llm_error_rate, rate_limit_rate=args.llm_rate_limit_rate,
+                                 seed=args.seed)
+    gemini_service.provider = provider
+    gemini_service.rate_limiter = LLMRateLimiter(max_in_flight=args.llm_in_flight,
+                                                 requests_per_minute=args.llm_rpm,
+                                                 tokens_per_minute=args.llm_tpm, redis_url="")
+    stages: Dict[str, Any] = {}
+
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://bench", timeout=300) as client:
+        tenant = await client.post("/api/tenants/", json={"name": f"bench-{uuid.uuid4()}"})
+        tenant.raise_for_status()
+        tenant_id = tenant.json()["id"]
+
+        if "ingest" in args.stages:
+            async def ingest(seq: int):
+                body = "\n".join(
+                    json.dumps({"tenant_id": tenant_id, "source": "firewall", "event_type": "connection_denied",
+                                "payload": {"src_ip": f"10.{seq % 256}.{i % 256}.{i % 251}", "dst_port": 22,
+                                            "seq": i}})
+                    for i in range(args.batch_size)
+                )
+                res = await client.post("/api/logs/ingest/batch", content=body,
+                                        headers={"Content-Type": "application/x-ndjson"})
+                res.raise_for_status()
+
+            stages["ingest"] = await run_stage("ingest", ingest, args.requests, args.concurrency, args.alloc_ops,
+                                               units_per_op=args.batch_size)
+
+        if "analyze" in args.stages:
+            async def analyze(seq: int):
+                res = await client.post("/api/incidents/analyze", json={
+                    "tenant_id": tenant_id,
+                    "events": make_events(seq, args.events_per_incident),
+                    "mode": args.mode,
+                    "bypass_cache": not args.llm_cache,
+                })
+                res.raise_for_status()
+
+            stages["analyze"] = await run_stage("analyze", analyze, args.requests, args.concurrency, args.alloc_ops)
+
+        if "timeline" in args.stages:
+            incident_ids = await seed_timelines(tenant_id, args.timeline_incidents, args.timeline_rows)
+
+            async def timeline(seq: int):
+                res = await client.get(f"/api/incidents/{incident_ids[seq % len(incident_ids)]}/timeline")
+                res.raise_for_status()
+
+            stages["timeline"] = await run_stage("timeline", timeline, args.requests, args.concurrency,
+                                                 args.alloc_ops)
+
+    if "ws" in args.stages:
+        ws_manager = ConnectionManager(queue_size=max(args.concurrency * 4, 16), redis_client=None)
+        pending: Dict[str, List[Any]] = {}
+
+        def delivered(text: str):
+            # Every socket is sent the same cached str of a Frame
+            entry = pending[text]
+            entry[0] -= 1
+            if entry[0] == 0:
+                entry[1].set_result(None)
+
+        sockets = [SinkSocket(delivered) for _ in range(args.ws_clients)]
+        for socket in sockets:
+            await ws_manager.connect(socket, tenant_id)
+
+        async def broadcast(seq: int):
+            frame = Frame({"type": "hypothesis_generated", "incident_id": str(uuid.uuid4()), "index": seq % 3,
+                           "hypothesis": {"hypothesis_text": "Brute-force attack against SSH", "confidence": 0.9,
+                                          "evidence": [f"{40 + i} failed logins" for i in range(8)],
+                                          "threat_type": "brute_force"}})
+            text = frame.encode(False)
+            done = asyncio.get_running_loop().create_future()
+            pending[text] = [len(sockets), done]
+            await ws_manager.broadcast(tenant_id, frame)
+            try:
+                await asyncio.wait_for(done, timeout=30)
+            finally:
+                del pending[text]
+
+        stages["ws"] = await run_stage("ws", broadcast, args.requests, args.concurrency, args.alloc_ops,
+                                       units_per_op=args.ws_clients)
+        for socket in sockets:
+            ws_manager.disconnect(socket, tenant_id)
+
+    return {
+        "meta": {
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "commit": git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "database": engine.url.get_backend_name() + "+" + engine.url.get_driver_name(),
+            "args": {k: v for k, v in vars(args).items() if k not in ("output", "compare")},
+            "llm_provider": provider.get_stats(),
+            "triage": triage_classifier.get_stats(),
+        },
+        "stages": stages,
+    }
+
+
+def git_commit() -> str:
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                                check=True).stdout.strip()
+        dirty = subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"], capture_output=True,
+                               text=True).stdout.strip()
+        return commit + ("-dirty" if dirty else "")
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def compare(current: Dict[str, Any], baseline_path: Path) -> None:
+    baseline = json.loads(baseline_path.read_text())
+    print(f"\nchange against {baseline_path.name} ({baseline['meta']['commit']}):")
+    for name, stage in current["stages"].items():
+        before = baseline["stages"].get(name)
+        if before is None:
+            continue
+        changes = [("throughput", before["throughput_per_s"], stage["throughput_per_s"])]
+        changes += [(p, before["latency_ms"][p], stage["latency_ms"][p]) for p in ("p50", "p95", "p99")]
+        changes.append(("peak alloc/op", before["allocations"]["peak_kib_per_op"],
+                        stage["allocations"]["peak_kib_per_op"]))
+        print(f"{name:<9} " + "  ".join(
+            f"{label} {((new - old) / old * 100 if old else 0.0):+.1f}%" for label, old, new in changes
+        ))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--stages", nargs="+", choices=STAGES, default=STAGES)
+    parser.add_argument("--requests", type=int, default=200, help="operations per stage")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--alloc-ops", type=int, default=20, help="operations replayed under tracemalloc")
+    parser.add_argument("--batch-size", type=int, default=200, help="events per ingest request")
+    parser.add_argument("--events-per-incident", type=int, default=20)
+    parser.add_argument("--mode", choices=["sequential", "parallel"], default=None)
+    parser.add_argument("--llm-cache", action="store_true", help="let analyze requests hit the LLM cache")
+    parser.add_argument("--llm-latency-ms", type=float, default=200.0)
+    parser.add_argument("--llm-distribution", choices=["lognormal", "exponential", "uniform", "fixed"],
+                        default="lognormal")
+    parser.add_argument("--llm-error-rate", type=float, default=0.0)
+    parser.add_argument("--llm-rate-limit-rate", type=float, default=0.0)
+    # Admission limits of the run; the production per-minute quotas would dominate every timing
+    parser.add_argument("--llm-in-flight", type=int, default=settings.LLM_MAX_IN_FLIGHT)
+    parser.add_argument("--llm-rpm", type=int, default=1_000_000)
+    parser.add_argument("--llm-tpm", type=int, default=1_000_000_000)
+    parser.add_argument("--timeline-incidents", type=int, default=20)
+    parser.add_argument("--timeline-rows", type=int, default=50)
+    parser.add_argument("--ws-clients", type=int, default=500)
+    parser.add_argument("--seed", type=int, default=settings.LLM_SIM_SEED)
+    parser.add_argument("--output", type=Path, default=None, help="defaults to benchmarks/results/e2e-<commit>.json")
+    parser.add_argument("--compare", type=Path, default=None, help="earlier results file to compare against")
+    args = parser.parse_args()
+    # Per-request INFO logs would dominate the timings
+    logging.disable(logging.WARNING)
+
+    results = asyncio.run(run(args))
+    output = args.output or RESULTS_DIR / f"e2e-{results['meta']['commit']}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(results, indent=2))
+    print(f"results written to {output}")
+    if args.compare:
+        compare(results, args.compare)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+"""
+Compares single-row log ingestion (POST /api/logs/ingest) against the batch
+endpoint (POST /api/logs/ingest/batch) through the ASGI app in-process.
+
+Usage (from backend/):
+    DATABASE_URL=postgresql+asyncpg://... python -m benchmarks.bench_ingest --events 5000 --batch-size 500
+"""
+import argparse
+import asyncio
+import json
+import time
+import uuid
+
+from httpx import AsyncClient, ASGITransport
+
+from app.main import app
+from app.db.database import Base, engine
+
+
+def make_event(tenant_id: str, i: int) -> dict:
+    return {
+        "tenant_id": tenant_id,
+        "source": "firewall",
+        "event_type": "connection_denied",
+        "payload": {"src_ip": f"10.0.{i % 256}.{i % 251}", "dst_port": 22, "seq": i},
+    }
+
+
+async def run(events: int, batch_size: int) -> None:
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://bench") as client:
+        tenant = await client.post("/api/tenants/", json={"name": f"bench-{uuid.uuid4()}"})
+        tenant_id = tenant.json()["id"]
+        payloads = [make_event(tenant_id, i) for i in range(events)]
+
+        start = time.perf_counter()
+        for p in payloads:
+            res = await client.post("/api/logs/ingest", json=p)
+            res.raise_for_status()
+        single = time.perf_counter() - start
+
+        start = time.perf_counter()
+        for offset in range(0, events, batch_size):
+            chunk = payloads[offset:offset + batch_size]
+            body = "\n".join(json.dumps(p) for p in chunk)
+            res = await client.post(
+                "/api/logs/ingest/batch",
+                content=body,
+                headers={"content-type": "application/x-ndjson"},
+            )
+            res.raise_for_status()
+        batch = time.perf_counter() - start
+
+    print(f"driver: {engine.dialect.driver}, events: {events}, batch size: {batch_size}")
+    print(f"single-row: {single:8.2f}s  {events / single:10.0f} events/s")
+    print(f"batch:      {batch:8.2f}s  {events / batch:10.0f} events/s")
+    print(f"speedup:    {single / batch:8.1f}x")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--events", type=int, default=2000)
+    parser.add_argument("--batch-size", type=int, default=500)
+    args = parser.parse_args()
+    asyncio.run(run(args.events, args.batch_size))
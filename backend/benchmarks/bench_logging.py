@@ -0,0 +1,149 @@
+"""
+Logging cost per incident. Runs the same incidents through the orchestrator
+(simulated LLM provider, no latency, persistence and triage disabled) under:
+
+  off     logging disabled, the baseline the other modes are compared to
+  before  a synchronous StreamHandler, as basicConfig used to install, plus
+          the f-strings the model call path used to build on every attempt
+          (full prompt for a disabled DEBUG line, 200 response chars at INFO)
+  after   configure_logging(): lazy %-style calls, records formatted and
+          written by the queue listener thread
+
+For each mode it reports the CPU time of the event-loop thread (what
+requests wait on) and of the whole process, per incident and minus the
+"off" baseline. Each mode runs --repeat times and the fastest run counts.
+With --sink-delay-ms every write to the log stream also sleeps, like a
+stderr pipe that a container log driver drains slowly; compare wall time.
+
+Usage (from backend/):
+    python -m benchmarks.bench_logging --incidents 300 --events 40
+    python -m benchmarks.bench_logging --incidents 100 --sink-delay-ms 0.5
+"""
+import argparse
+import asyncio
+import logging
+import tempfile
+import time
+from typing import Optional
+
+from app.config import settings
+from app.logging_config import configure_logging, shutdown_logging
+from app.orchestrator.incident_orchestrator import IncidentOrchestrator
+from app.services.gemini_service import gemini_service
+from app.services.llm_providers import ModelSpec, SimulatedProvider
+from app.services.persistence_queue import persistence_queue
+from app.services.rate_limiter import LLMRateLimiter
+
+legacy_logger = logging.getLogger("app.services.gemini_service")
+
+
+class LegacyLoggingProvider(SimulatedProvider):
+    """Simulated provider that also performs the removed per-call f-string logging."""
+
+    async def generate(self, prompt: str, task: Optional[str] = None, model: Optional[ModelSpec] = None) -> str:
+        legacy_logger.info(f"Calling Gemini API (attempt {1})")
+        legacy_logger.debug(f"Prompt: {prompt}")
+        text = await super().generate(prompt, task, model)
+        legacy_logger.info(f"Received response from Gemini API: {text[:200]}...")
+        return text
+
+
+def make_events(seq: int, count: int):
+    return [
+        {"timestamp": f"2024-05-20T10:{i // 60:02d}:{i % 60:02d}Z",
+         "log_message": f"Failed password for user{i % 9} from 198.51.{seq % 256}.{i} port {40000 + i} ssh2 "
+                        f"session={seq:08x}{i:04x} " + "x" * 120,
+         "source": "auth", "severity": "high"}
+        for i in range(count)
+    ]
+
+
+async def run_incidents(orchestrator: IncidentOrchestrator, incidents: int, events: int, offset: int):
+    for seq in range(offset, offset + incidents):
+        await orchestrator.process_incident(f"00000000-0000-0000-0000-{seq:012d}", make_events(seq, events),
+                                            mode="sequential")
+
+
+class SlowStream:
+    """File stream whose writes each take delay seconds."""
+
+    def __init__(self, path: str, delay: float):
+        self.file = open(path, "w")
+        self.delay = delay
+
+    def write(self, text: str) -> int:
+        if self.delay:
+            time.sleep(self.delay)
+        return self.file.write(text)
+
+    def flush(self) -> None:
+        self.file.flush()
+
+
+def setup(mode: str, path: str, delay: float) -> SimulatedProvider:
+    root = logging.getLogger()
+    shutdown_logging()
+    root.handlers[:] = []
+    logging.disable(logging.CRITICAL if mode == "off" else logging.NOTSET)
+    if mode == "before":
+        logging.basicConfig(level=logging.INFO, stream=SlowStream(path, delay))
+        return LegacyLoggingProvider(latency_ms=0, distribution="fixed")
+    configure_logging(level="INFO", json_format=False, use_queue=True, stream=SlowStream(path, delay))
+    return SimulatedProvider(latency_ms=0, distribution="fixed")
+
+
+def run_once(mode: str, args, path: str, offset: int):
+    gemini_service.provider = setup(mode, path, args.sink_delay_ms / 1000)
+    orchestrator = IncidentOrchestrator()
+    # Warm-up (imports, caches of the prompt builder and parsers)
+    asyncio.run(run_incidents(orchestrator, 5, args.events, offset + 10_000_000))
+
+    thread_start, process_start, wall_start = time.thread_time(), time.process_time(), time.perf_counter()
+    asyncio.run(run_incidents(orchestrator, args.incidents, args.events, offset))
+    loop_cpu = time.thread_time() - thread_start
+    wall = time.perf_counter() - wall_start
+    shutdown_logging()  # waits for the writer thread, so its CPU is counted below
+    process_cpu = time.process_time() - process_start
+    return loop_cpu / args.incidents, process_cpu / args.incidents, wall / args.incidents
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--incidents", type=int, default=300)
+    parser.add_argument("--events", type=int, default=40, help="events per incident (prompt size)")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--sink-delay-ms", type=float, default=0.0, help="time each log write blocks")
+    parser.add_argument("--triage", action="store_true", help="let local triage skip the hypothesis model call")
+    args = parser.parse_args()
+    settings.TRIAGE_ENABLED = args.triage
+
+    persistence_queue.enabled = False
+    persistence_queue._write = _discard
+    gemini_service.rate_limiter = LLMRateLimiter(max_in_flight=64, requests_per_minute=10**9,
+                                                 tokens_per_minute=10**12, redis_url="")
+    gemini_service.cache.enabled = False
+
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        for mode in ("off", "before", "after"):
+            runs = [run_once(mode, args, f"{tmp}/{mode}.log", 1_000_000 * (r + 1)) for r in range(args.repeat)]
+            results[mode] = tuple(min(run[i] for run in runs) for i in range(3))
+    logging.disable(logging.NOTSET)
+
+    base_loop, base_process, _ = results["off"]
+    print(f"{args.incidents} incidents x {args.repeat} runs, {args.events} events each, "
+          f"sink delay {args.sink_delay_ms} ms/write")
+    for mode, (loop_cpu, process_cpu, wall) in results.items():
+        print(f"{mode:<7} loop thread {loop_cpu * 1000:7.3f} ms/incident (logging {(loop_cpu - base_loop) * 1000:+7.3f})"
+              f"   process {process_cpu * 1000:7.3f} ms/incident (logging {(process_cpu - base_process) * 1000:+7.3f})"
+              f"   wall {wall * 1000:7.3f} ms/incident")
+    saved = results["before"][0] - results["after"][0]
+    print(f"event-loop CPU saved per incident: {saved * 1000:.3f} ms")
+
+
+async def _discard(batch):
+    return None
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+"""
+Parses recorded Gemini outputs (benchmarks/data/gemini_outputs.jsonl:
+fenced, bare, wrapped in prose, truncated, with an invalid hypothesis) with
+the previous strip-fences -> json.loads -> Model(**data) code and with the
+shared StructuredOutputParser, and reports time per response and how many
+responses each one recovered.
+
+Usage (from backend/):
+    python -m benchmarks.bench_structured_output --rounds 2000
+"""
+import argparse
+import json
+import logging
+import time
+from pathlib import Path
+
+from pydantic import ValidationError
+
+from app.services.gemini_service import (
+    AnalysisResult, CritiqueResponse, HypothesisResponse, ResponsePlan,
+    ANALYSIS_PARSER, CRITIQUE_PARSER, HYPOTHESIS_PARSER, PLAN_PARSER,
+)
+from app.services.structured_output import StructuredOutputError
+
+OUTPUTS = Path(__file__).parent / "data" / "gemini_outputs.jsonl"
+
+MODELS = {
+    "generate_hypothesis": HypothesisResponse,
+    "plan_response": ResponsePlan,
+    "critique_decision": CritiqueResponse,
+    "analyze_events": AnalysisResult,
+}
+PARSERS = {
+    "generate_hypothesis": HYPOTHESIS_PARSER,
+    "plan_response": PLAN_PARSER,
+    "critique_decision": CRITIQUE_PARSER,
+    "analyze_events": ANALYSIS_PARSER,
+}
+
+
+def legacy_parse(method: str, text: str):
+    cleaned_text = text.strip()
+    if cleaned_text.startswith("```json"):
+        cleaned_text = cleaned_text[7:]
+    if cleaned_text.startswith("```"):
+        cleaned_text = cleaned_text[3:]
+    if cleaned_text.endswith("```"):
+        cleaned_text = cleaned_text[:-3]
+    cleaned_text = cleaned_text.strip()
+    return MODELS[method](**json.loads(cleaned_text)).model_dump()
+
+
+def shared_parse(method: str, text: str):
+    return PARSERS[method].dump(text)
+
+
+def recovers(parse, method: str, text: str) -> bool:
+    try:
+        parse(method, text)
+        return True
+    except (json.JSONDecodeError, ValidationError, StructuredOutputError):
+        return False
+
+
+def timed(parse, samples, rounds: int) -> float:
+    start = time.perf_counter()
+    for _ in range(rounds):
+        for method, text in samples:
+            recovers(parse, method, text)
+    return (time.perf_counter() - start) / (rounds * len(samples)) * 1e6
+
+
+def run(label: str, parse, samples, clean, rounds: int) -> None:
+    recovered = sum(recovers(parse, method, text) for method, text in samples)
+    print(f"{label:<32} {timed(parse, clean, rounds):8.1f} us/clean response  "
+          f"{timed(parse, samples, rounds):8.1f} us/response overall   recovered {recovered}/{len(samples)}")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rounds", type=int, default=2000)
+    args = parser.parse_args()
+    # The repair/salvage warnings would dominate the timing
+    logging.getLogger("app.services.structured_output").setLevel(logging.ERROR)
+
+    samples = [(row["method"], row["text"]) for row in map(json.loads, OUTPUTS.read_text().splitlines())]
+    print(f"{len(samples)} recorded responses, {args.rounds} rounds")
+    # Responses the previous code could parse, for a like-for-like comparison
+    clean = [(method, text) for method, text in samples if recovers(legacy_parse, method, text)]
+    run("strip + json.loads + Model(**d)", legacy_parse, samples, clean, args.rounds)
+    run("StructuredOutputParser", shared_parse, samples, clean, args.rounds)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+"""
+WebSocket fan-out load test: opens thousands of sockets for one tenant on a
+running API (optionally several uvicorn workers), publishes messages on the
+tenant's Redis channel like a Celery worker would, and reports delivery
+latency and completeness. A few "stalled" clients stop reading to check that
+slow consumers are evicted without delaying everyone else.
+
+Usage (from backend/, with the API and Redis running, e.g. docker compose up):
+    python -m benchmarks.bench_ws_fanout --clients 2000 --messages 200 --rate 50 --stalled 5
+    # raise the open files limit first (ulimit -n 65536) for large --clients
+"""
+import argparse
+import asyncio
+import json
+import time
+import uuid
+
+import httpx
+import redis.asyncio as aioredis
+import websockets
+
+from app.config import settings
+from app.websocket_handler import WS_CHANNEL_PREFIX
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))] if values else 0.0
+
+
+async def client(url: str, expected: int, latencies: list, counts: list, ready: asyncio.Event, stalled: bool):
+    # Stalled clients use a tiny receive buffer and never read, so the server's sends back up
+    async with websockets.connect(url, max_queue=1 if stalled else None, open_timeout=60) as ws:
+        ready.set()
+        if stalled:
+            await asyncio.sleep(3600)
+        received = 0
+        try:
+            while received < expected:
+                raw = await ws.recv()
+                message = json.loads(raw)
+                latencies.append(time.time() - message["sent_at"])
+                received += 1
+        finally:
+            counts.append(received)
+
+
+async def run(args) -> None:
+    tenant_id = args.tenant or str(uuid.uuid4())
+    url = f"{args.url.rstrip('/')}/ws/incidents/{tenant_id}"
+    latencies, counts = [], []
+
+    tasks, ready = [], []
+    for i in range(args.clients + args.stalled):
+        ready.append(asyncio.Event())
+        stalled = i >= args.clients
+        tasks.append(asyncio.create_task(client(url, args.messages, latencies, counts, ready[-1], stalled)))
+    await asyncio.wait_for(asyncio.gather(*(event.wait() for event in ready)), timeout=args.timeout)
+    print(f"{args.clients} clients (+{args.stalled} stalled) connected for tenant {tenant_id}")
+
+    redis = aioredis.from_url(args.redis)
+    padding = "x" * args.size
+    start = time.perf_counter()
+    for seq in range(args.messages):
+        message = {"type": "incident_progress", "seq": seq, "sent_at": time.time(), "padding": padding}
+        await redis.publish(f"{WS_CHANNEL_PREFIX}{tenant_id}", json.dumps(message))
+        await asyncio.sleep(1 / args.rate)
+    publish_seconds = time.perf_counter() - start
+
+    readers = tasks[:args.clients]
+    _, pending = await asyncio.wait(readers, timeout=args.timeout)
+    elapsed = time.perf_counter() - start
+    for task in list(pending) + tasks[args.clients:]:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+    await redis.aclose()
+
+    expected = args.clients * args.messages
+    delivered = len(latencies)
+    print(f"published {args.messages} messages in {publish_seconds:.2f}s; all delivered after {elapsed:.2f}s")
+    print(f"delivered {delivered}/{expected} ({delivered / expected:.2%}), "
+          f"{delivered / elapsed:.0f} msg/s, {sum(1 for c in counts if c < args.messages)} incomplete clients")
+    print(f"latency p50 {percentile(latencies, 0.50) * 1000:.1f}ms  p95 {percentile(latencies, 0.95) * 1000:.1f}ms  "
+          f"p99 {percentile(latencies, 0.99) * 1000:.1f}ms  max {max(latencies, default=0) * 1000:.1f}ms")
+
+    http_url = args.url.replace("ws://", "http://").replace("wss://", "https://").rstrip("/")
+    try:
+        async with httpx.AsyncClient() as http:
+            print("server (one worker):", (await http.get(f"{http_url}/health/ws")).json())
+    except httpx.HTTPError as e:
+        print(f"could not read /health/ws: {e}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default="ws://localhost:8000")
+    parser.add_argument("--redis", default=settings.REDIS_URL)
+    parser.add_argument("--tenant", default=None)
+    parser.add_argument("--clients", type=int, default=2000)
+    parser.add_argument("--stalled", type=int, default=5)
+    parser.add_argument("--messages", type=int, default=200)
+    parser.add_argument("--rate", type=float, default=50.0, help="messages published per second")
+    parser.add_argument("--size", type=int, default=512, help="payload padding in bytes")
+    parser.add_argument("--timeout", type=float, default=60.0)
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+"""
+Serialization CPU per broadcast: encoding the message once per client (the
+old send_json path) against one shared Frame, for JSON and MessagePack
+clients. No sockets are involved; only the encoding work is timed.
+
+Usage (from backend/):
+    python -m benchmarks.bench_ws_serialize --clients 1000 --broadcasts 200
+"""
+import argparse
+import json
+import time
+import uuid
+from datetime import datetime, timezone
+
+from app.websocket_handler import Frame
+
+
+def make_message(seq: int) -> dict:
+    return {
+        "type": "hypothesis_generated",
+        "incident_id": str(uuid.uuid4()),
+        "index": seq % 3,
+        "at": datetime.now(timezone.utc),
+        "hypothesis": {
+            "hypothesis_text": "Brute-force authentication attack against SSH from a single source",
+            "confidence": 0.91,
+            "evidence": [f"{40 + i} failed logins from 203.0.113.{i}" for i in range(8)],
+            "threat_type": "brute_force",
+        },
+    }
+
+
+def timed(label: str, broadcasts: int, fn) -> None:
+    start = time.perf_counter()
+    for seq in range(broadcasts):
+        fn(make_message(seq))
+    elapsed = time.perf_counter() - start
+    print(f"{label:<34} {elapsed / broadcasts * 1000:8.3f} ms/broadcast")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--clients", type=int, default=1000)
+    parser.add_argument("--broadcasts", type=int, default=200)
+    args = parser.parse_args()
+    clients = range(args.clients)
+
+    def per_client(message):
+        for _ in clients:
+            json.dumps(message, default=str)
+
+    def shared_json(message):
+        frame = Frame(message)
+        for _ in clients:
+            frame.encode(False)
+
+    def shared_mixed(message):
+        frame = Frame(message)
+        for client in clients:
+            frame.encode(client % 2 == 0)
+
+    print(f"{args.clients} clients per broadcast")
+    timed("json.dumps per client (before)", args.broadcasts, per_client)
+    timed("shared frame, JSON clients", args.broadcasts, shared_json)
+    timed("shared frame, half MessagePack", args.broadcasts, shared_mixed)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,51 @@
+import uuid
+import pytest
+from unittest.mock import patch, MagicMock, AsyncMock
+from app.workers import tasks
+
+ANALYZE_REQUEST = {
+    "tenant_id": str(uuid.uuid4()),
+    "events": [
+        {"timestamp": "2024-05-20T10:00:00Z", "log_message": "Failed login", "source": "auth", "severity": "high"}
+    ]
+}
+
+@pytest.mark.asyncio
+async def test_submit_returns_job_id_immediately(client):
+    with patch("app.api.router_incidents.process_incident_task") as mock_task:
+        res = await client.post("/api/incidents/analyze/async", json=ANALYZE_REQUEST)
+
+    assert res.status_code == 202
+    data = res.json()
+    assert data["status"] == "queued"
+    assert data["job_id"] == data["incident_id"]
+    kwargs = mock_task.apply_async.call_args.kwargs
+    assert kwargs["task_id"] == data["job_id"]
+    assert kwargs["args"][1] == ANALYZE_REQUEST["tenant_id"]
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("state,result,expected", [
+    ("PENDING", None, "queued"),
+    ("STARTED", None, "running"),
+    ("SUCCESS", {"status": "completed", "incident_id": "x"}, "completed"),
+    ("SUCCESS", {"status": "failed", "error": "boom"}, "failed"),
+    ("FAILURE", RuntimeError("worker crashed"), "failed"),
+])
+async def test_job_status(client, state, result, expected):
+    async_result = MagicMock(state=state, result=result)
+    with patch("app.api.router_incidents.celery_app.AsyncResult", return_value=async_result):
+        res = await client.get(f"/api/incidents/jobs/{uuid.uuid4()}")
+
+    assert res.status_code == 200
+    assert res.json()["status"] == expected
+
+def test_worker_task_publishes_completion():
+    result = {"incident_id": "inc", "status": "completed", "final_decision": {"top_hypothesis": {}}}
+    with patch.object(tasks.orchestrator, "process_incident", AsyncMock(return_value=result)), \
+         patch("app.workers.tasks.publish_to_tenant") as mock_publish:
+        assert tasks.process_incident_task.run("inc", "tenant-1", [], None) == result
+
+    tenant_id, message = mock_publish.call_args.args
+    assert tenant_id == "tenant-1"
+    assert message["type"] == "analysis_completed"
+    assert message["job_id"] == "inc"
@@ -0,0 +1,147 @@
+import uuid
+import pytest
+import pytest_asyncio
+from datetime import datetime, timedelta, timezone
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
+from sqlalchemy.orm import sessionmaker
+from app.config import settings
+from app.db.database import Base
+from app.models.tenant import Tenant
+from app.models.incident import Incident
+from app.models.incident_event import IncidentEvent
+from app.services.correlation_engine import CorrelationEngine, correlation_record, extract_entities
+
+BASE_TIME = datetime(2024, 5, 20, 10, tzinfo=timezone.utc)
+
+class FakeRedis:
+    """Just enough of redis.asyncio for spill/restore."""
+    def __init__(self):
+        self.data = {}
+
+    async def mget(self, keys):
+        return [self.data.get(k) for k in keys]
+
+    def pipeline(self):
+        redis = self
+
+        class Pipeline:
+            def __init__(self):
+                self.ops = []
+
+            def set(self, key, value, ex=None):
+                self.ops.append((key, value))
+
+            async def execute(self):
+                redis.data.update(self.ops)
+
+        return Pipeline()
+
+@pytest_asyncio.fixture
+async def db(tmp_path):
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path}/correlation.db")
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    async with sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)() as session:
+        yield session
+    await engine.dispose()
+
+@pytest_asyncio.fixture
+async def tenant_id(db):
+    tenant = Tenant(name="Test Corp")
+    db.add(tenant)
+    await db.commit()
+    return tenant.id
+
+def _records(tenant_id, count, start=0, step=5, payload=None, event_type="auth_failure"):
+    return [
+        correlation_record({
+            "id": uuid.uuid4(), "tenant_id": tenant_id, "event_type": event_type,
+            "created_at": BASE_TIME + timedelta(seconds=start + i * step),
+            "payload": payload or {"src_ip": "203.0.113.7", "user": "root"},
+        })
+        for i in range(count)
+    ]
+
+def test_extract_entities():
+    assert extract_entities({"source_ip": "10.0.0.1", "username": "bob", "port": 22}) == [("ip", "10.0.0.1"), ("user", "bob")]
+    assert extract_entities({"message": "hello"}) == []
+
+@pytest.mark.asyncio
+async def test_burst_opens_one_incident_and_later_events_join_it(db, tenant_id, monkeypatch):
+    monkeypatch.setattr(settings, "CORRELATION_MIN_EVENTS", 10)
+    engine = CorrelationEngine(redis_client=FakeRedis())
+
+    # Below the threshold: nothing happens
+    assert await engine.process(db, _records(tenant_id, 9)) == []
+
+    # The 10th event crosses it for both the IP and the user, but only one incident is opened
+    opened = await engine.process(db, _records(tenant_id, 3, start=45))
+    assert len(opened) == 1
+    incidents = (await db.execute(select(Incident))).scalars().all()
+    assert len(incidents) == 1
+    assert incidents[0].title == "Correlated activity for ip 203.0.113.7"
+    assert incidents[0].tenant_id == tenant_id
+
+    links = (await db.execute(select(IncidentEvent))).scalars().all()
+    assert len(links) == 12
+    assert {l.incident_id for l in links} == {incidents[0].id}
+
+@pytest.mark.asyncio
+async def test_events_outside_the_window_do_not_count(db, tenant_id, monkeypatch):
+    monkeypatch.setattr(settings, "CORRELATION_MIN_EVENTS", 10)
+    engine = CorrelationEngine(redis_client=FakeRedis())
+
+    # 30 events, one per minute: never 10 inside a 5 minute window
+    assert await engine.process(db, _records(tenant_id, 30, step=60)) == []
+
+    # Several event types can be required
+    monkeypatch.setattr(settings, "CORRELATION_MIN_EVENT_TYPES", 2)
+    assert await engine.process(db, _records(tenant_id, 12, start=3600, step=1)) == []
+    opened = await engine.process(db, _records(tenant_id, 1, start=3613, event_type="login_success"))
+    assert len(opened) == 1
+
+@pytest.mark.asyncio
+async def test_windows_spill_to_redis_and_are_restored(db, tenant_id, monkeypatch):
+    monkeypatch.setattr(settings, "CORRELATION_MIN_EVENTS", 5)
+    redis = FakeRedis()
+    engine = CorrelationEngine(max_keys=2, redis_client=redis)
+
+    await engine.process(db, _records(tenant_id, 4, payload={"src_ip": "198.51.100.1"}))
+    # Two more entities push the first window out of memory
+    await engine.process(db, _records(tenant_id, 1, payload={"src_ip": "198.51.100.2"}))
+    await engine.process(db, _records(tenant_id, 1, payload={"src_ip": "198.51.100.3"}))
+    assert engine.stats["keys_spilled"] == 1
+    assert len(redis.data) == 1
+
+    opened = await engine.process(db, _records(tenant_id, 1, start=20, payload={"src_ip": "198.51.100.1"}))
+    assert engine.stats["keys_restored"] == 1
+    assert len(opened) == 1
+    links = (await db.execute(select(IncidentEvent))).scalars().all()
+    assert len(links) == 5
+
+@pytest.mark.asyncio
+async def test_failed_commit_leaves_windows_unchanged(db, tenant_id, monkeypatch):
+    monkeypatch.setattr(settings, "CORRELATION_MIN_EVENTS", 10)
+    engine = CorrelationEngine(redis_client=FakeRedis())
+    await engine.process(db, _records(tenant_id, 9))
+
+    commit = db.commit
+
+    async def failing_commit():
+        raise RuntimeError("database went away")
+
+    monkeypatch.setattr(db, "commit", failing_commit)
+    burst = _records(tenant_id, 3, start=45)
+    with pytest.raises(RuntimeError):
+        await engine.process(db, burst)
+    assert engine.stats["incidents_opened"] == 0 and engine.stats["events_linked"] == 0
+    assert all(state.incident_id is None and len(state.events) == 9 for state in engine._states.values())
+
+    # Retrying the batch opens the incident with every event of the window
+    monkeypatch.setattr(db, "commit", commit)
+    opened = await engine.process(db, burst)
+    assert len(opened) == 1
+    links = (await db.execute(select(IncidentEvent))).scalars().all()
+    assert len(links) == 12 and engine.stats["events_linked"] == 12
+    assert len((await db.execute(select(Incident))).scalars().all()) == 1
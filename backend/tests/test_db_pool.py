@@ -0,0 +1,69 @@
+import asyncio
+import pytest
+from sqlalchemy import text
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.pool import StaticPool
+from app.db.database import build_engine, engine_options
+from app.db.pool_metrics import InstrumentedAsyncQueuePool, get_pool_stats
+from app.services.telemetry import sample_value
+
+def test_engine_options_from_settings():
+    options = engine_options("postgresql+asyncpg://u:p@db/cybersentinel")
+    assert options["echo"] is False
+    assert options["poolclass"] is InstrumentedAsyncQueuePool
+    assert options["pool_pre_ping"] is True
+    assert options["url"].query["prepared_statement_cache_size"] == "100"
+
+    # In-memory SQLite keeps its single shared connection
+    options = engine_options("sqlite+aiosqlite://")
+    assert "poolclass" not in options
+    assert isinstance(build_engine("sqlite+aiosqlite://").sync_engine.pool, StaticPool)
+
+@pytest.mark.asyncio
+async def test_pool_records_waits_in_use_and_timeouts(tmp_path):
+    engine = build_engine(f"sqlite+aiosqlite:///{tmp_path}/pool.db", pool_size=1, max_overflow=0, pool_timeout=0.2)
+    try:
+        async with engine.connect() as conn:
+            await conn.execute(text("SELECT 1"))
+            assert get_pool_stats(engine)["in_use"] == 1
+
+            # The only connection is held, so a second checkout times out
+            with pytest.raises(PoolTimeoutError):
+                async with engine.connect() as other:
+                    await other.execute(text("SELECT 1"))
+
+            async def wait_for_connection():
+                async with engine.connect() as other:
+                    await other.execute(text("SELECT 1"))
+
+            waiter = asyncio.ensure_future(wait_for_connection())
+            await asyncio.sleep(0.05)
+        await waiter
+
+        stats = get_pool_stats(engine)
+        assert stats["pool_class"] == "InstrumentedAsyncQueuePool"
+        assert stats["in_use"] == 0
+        assert stats["checkouts"] == 2
+        assert stats["checkout_timeouts"] == 1
+        assert stats["connects"] == 1
+        assert stats["wait_seconds_max"] >= 0.04
+    finally:
+        await engine.dispose()
+
+def _connections(state):
+    return sample_value("cybersentinel_db_pool_connections", {"state": state})
+
+@pytest.mark.asyncio
+async def test_pool_connections_are_exported_to_prometheus(tmp_path):
+    engine = build_engine(f"sqlite+aiosqlite:///{tmp_path}/pool.db", pool_size=1, max_overflow=1)
+    try:
+        async with engine.connect() as first:
+            await first.execute(text("SELECT 1"))
+            assert (_connections("in_use"), _connections("overflow")) == (1, 0)
+            async with engine.connect() as second:
+                await second.execute(text("SELECT 1"))
+                assert (_connections("in_use"), _connections("overflow")) == (2, 1)
+        # The overflow connection was closed on return; the pooled one is idle
+        assert (_connections("in_use"), _connections("idle"), _connections("overflow")) == (0, 1, 0)
+    finally:
+        await engine.dispose()
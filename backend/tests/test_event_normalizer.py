@@ -0,0 +1,39 @@
+import json
+from datetime import datetime, timedelta, timezone
+from app.services.event_normalizer import event_normalizer
+
+def _failed_login(i: int) -> dict:
+    return {
+        "timestamp": (datetime(2024, 5, 20, 10, tzinfo=timezone.utc) + timedelta(seconds=i)).isoformat(),
+        "log_message": f"Failed password for admin from 203.0.113.{i % 7} port {40000 + i} ssh2",
+        "source": "auth",
+        "severity": "high",
+    }
+
+def test_mask_replaces_volatile_tokens():
+    masked = event_normalizer.mask("2024-05-20T10:00:00Z conn 10.0.0.1:443 id 3fa85f64-5717-4562-b3fc-2c963f66afa6 bytes 512")
+    assert masked == "<TS> conn <IP> id <UUID> bytes <N>"
+
+def test_identical_patterns_collapse_into_one_group():
+    events = [_failed_login(i) for i in range(5000)]
+    events.append({"timestamp": "2024-05-20T11:00:00Z", "log_message": "Accepted password for admin", "source": "auth", "severity": "low"})
+
+    groups = event_normalizer.aggregate(events)
+
+    assert len(groups) == 2
+    top = groups[0]
+    assert top["count"] == 5000
+    assert top["distinct_ips"] == 7
+    assert len(top["exemplars"]) == 2
+    assert "timestamp" not in top["exemplars"][0]
+    assert top["span_seconds"] == 4999
+
+def test_prompt_size_does_not_grow_with_volume():
+    small = json.dumps(event_normalizer.aggregate([_failed_login(i) for i in range(10)]))
+    large = json.dumps(event_normalizer.aggregate([_failed_login(i) for i in range(10000)]))
+    assert len(large) < len(small) * 1.1
+
+def test_payload_dicts_are_masked_recursively():
+    a = {"source": "firewall", "event_type": "port_scan", "payload": {"ip": "1.2.3.4", "ports": [80, 443]}}
+    b = {"source": "firewall", "event_type": "port_scan", "payload": {"ip": "5.6.7.8", "ports": [22]}}
+    assert event_normalizer.fingerprint(event_normalizer.template(a)) == event_normalizer.fingerprint(event_normalizer.template(b))
@@ -0,0 +1,62 @@
+from datetime import date, datetime, timezone
+from pathlib import Path
+import sqlalchemy as sa
+from alembic import command
+from alembic.config import Config
+from app.db.partitions import Partition, plan_partitions, expired_partitions
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+
+def _utc(day: date) -> datetime:
+    return datetime(day.year, day.month, day.day, tzinfo=timezone.utc)
+
+def test_plan_partitions_daily_and_weekly():
+    daily = plan_partitions([], date(2026, 10, 18), date(2026, 10, 20), interval="day")
+    assert [p.name for p in daily] == ["events_p20261018", "events_p20261019", "events_p20261020"]
+    assert daily[0].start == _utc(date(2026, 10, 18)) and daily[0].end == _utc(date(2026, 10, 19))
+
+    # 2026-10-18 is a Sunday; weekly partitions start on Monday
+    weekly = plan_partitions([], date(2026, 10, 18), date(2026, 10, 25), interval="week")
+    assert [(p.start.date(), p.end.date()) for p in weekly] == [
+        (date(2026, 10, 12), date(2026, 10, 19)),
+        (date(2026, 10, 19), date(2026, 10, 26)),
+    ]
+
+def test_plan_partitions_continues_from_existing_coverage():
+    existing = [Partition("events_p20261018", _utc(date(2026, 10, 18)), _utc(date(2026, 10, 19)))]
+    planned = plan_partitions(existing, date(2026, 10, 18), date(2026, 10, 19), interval="day")
+    assert [p.name for p in planned] == ["events_p20261019"]
+
+    # Switching to weekly must not overlap the existing daily partition
+    planned = plan_partitions(existing, date(2026, 10, 18), date(2026, 10, 19), interval="week")
+    assert [(p.start.date(), p.end.date()) for p in planned] == [(date(2026, 10, 19), date(2026, 10, 26))]
+
+    # Missed runs: the gap since the last partition is filled too
+    planned = plan_partitions(existing, date(2026, 10, 22), date(2026, 10, 22), interval="day")
+    assert [p.name for p in planned] == ["events_p20261019", "events_p20261020", "events_p20261021", "events_p20261022"]
+
+def test_expired_partitions():
+    existing = [
+        Partition(f"events_p202607{d:02d}", _utc(date(2026, 7, d)), _utc(date(2026, 7, d + 1)))
+        for d in (18, 19, 20)
+    ]
+    expired = expired_partitions(existing, retention_days=90, today=date(2026, 10, 18))
+    # Cutoff is 2026-07-20 00:00 UTC
+    assert [p.name for p in expired] == ["events_p20260718", "events_p20260719"]
+    assert expired_partitions(existing, retention_days=0, today=date(2026, 10, 18)) == []
+
+def test_migrations_upgrade_and_downgrade(tmp_path):
+    url = f"sqlite+aiosqlite:///{tmp_path}/migrations.db"
+    config = Config(str(BACKEND_DIR / "alembic.ini"))
+    config.set_main_option("sqlalchemy.url", url)
+    config.attributes["configure_logger"] = False
+
+    command.upgrade(config, "head")
+    inspector = sa.inspect(sa.create_engine(f"sqlite:///{tmp_path}/migrations.db"))
+    assert {"tenants", "events", "incidents", "incident_hypotheses", "agent_decisions"} <= set(inspector.get_table_names())
+    assert "ix_events_tenant_id_created_at" in {i["name"] for i in inspector.get_indexes("events")}
+    assert "ix_agent_decisions_incident_id_created_at_id" in {i["name"] for i in inspector.get_indexes("agent_decisions")}
+
+    command.downgrade(config, "base")
+    inspector = sa.inspect(sa.create_engine(f"sqlite:///{tmp_path}/migrations.db"))
+    assert "events" not in inspector.get_table_names()
@@ -5,3 +5,8 @@ async def test_health(client):
     response = await client.get("/health")
     assert response.status_code == 200
     assert response.json()["status"] == "ok"
+
+@pytest.mark.asyncio
+async def test_cors_exposes_the_timeline_cursor(client):
+    response = await client.get("/health", headers={"Origin": "http://localhost:3000"})
+    assert "x-next-cursor" in response.headers["access-control-expose-headers"].lower()
@@ -0,0 +1,102 @@
+import pytest
+import pytest_asyncio
+from datetime import timedelta
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
+from sqlalchemy.orm import sessionmaker
+from app.db.database import Base
+from app.models.tenant import Tenant
+from app.models.incident import Incident
+from app.models.incident_event import IncidentEvent
+from app.agents.context_manager import context_manager
+from app.schemas.event import EventCreate
+from app.services.event_ingest_service import event_ingest_service
+from app.services.incident_service import incident_service
+
+@pytest_asyncio.fixture
+async def db(tmp_path):
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path}/context.db")
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    async with sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)() as session:
+        yield session
+    await engine.dispose()
+
+async def _incident(db, tenant_name: str) -> Incident:
+    tenant = Tenant(name=tenant_name)
+    db.add(tenant)
+    await db.flush()
+    incident = Incident(tenant_id=tenant.id, title="Brute force")
+    db.add(incident)
+    await db.commit()
+    return incident
+
+def _row(incident: Incident, seq: int, incident_id=None):
+    return event_ingest_service.to_row(EventCreate(
+        tenant_id=incident.tenant_id, source="sshd", event_type="auth_failure",
+        payload={"seq": seq}, incident_id=incident_id
+    ))
+
+@pytest.mark.asyncio
+async def test_context_returns_only_linked_events(db):
+    incident = await _incident(db, "Test Corp")
+    other = await _incident(db, "Other Corp")
+
+    rows = [_row(incident, i, incident.id if i % 3 == 0 else None) for i in range(30)]
+    # Another tenant cannot attach events to this incident
+    rows.append(_row(other, 99, incident.id))
+    await event_ingest_service.bulk_insert(db, rows)
+
+    events = await context_manager.get_incident_context(db, incident.id)
+    assert sorted(e.payload["seq"] for e in events) == list(range(0, 30, 3))
+    assert [e.created_at for e in events] == sorted((e.created_at for e in events), reverse=True)
+
+    links = (await db.execute(select(IncidentEvent))).scalars().all()
+    assert len(links) == 10
+
+    assert await context_manager.get_incident_context(db, other.id) == []
+
+@pytest.mark.asyncio
+async def test_context_window_and_limit(db):
+    incident = await _incident(db, "Test Corp")
+    rows = [_row(incident, i, incident.id) for i in range(10)]
+    for i, row in enumerate(rows):
+        row["created_at"] = row["created_at"] - timedelta(hours=10 - i)
+    await event_ingest_service.bulk_insert(db, rows)
+
+    since = rows[6]["created_at"]
+    events = await context_manager.get_incident_context(db, incident.id, since=since)
+    assert [e.payload["seq"] for e in events] == [9, 8, 7, 6]
+
+    events = await context_manager.get_incident_context(db, incident.id, until=since, limit=2)
+    assert [e.payload["seq"] for e in events] == [5, 4]
+
+    # Re-linking the same events is a no-op
+    links = [{"incident_id": incident.id, "event_id": r["id"], "event_created_at": r["created_at"],
+              "tenant_id": incident.tenant_id} for r in rows[:3]]
+    assert await incident_service.link_events(db, links) == 3
+    await db.commit()
+    assert len((await db.execute(select(IncidentEvent))).scalars().all()) == 10
+
+@pytest.mark.asyncio
+async def test_advance_flushes_agent_outputs_before_returning(db, monkeypatch):
+    from app.orchestrator.incident_orchestrator import IncidentOrchestrator
+    from app.services.persistence_queue import persistence_queue
+
+    incident = await _incident(db, "Acme")
+    order = []
+
+    async def process_incident(incident_id, events, mode=None, notify=None):
+        order.append("analyzed")
+        return {"status": "completed"}
+
+    async def flush():
+        order.append("flushed")
+
+    orch = IncidentOrchestrator()
+    monkeypatch.setattr(orch, "process_incident", process_incident)
+    monkeypatch.setattr(persistence_queue, "flush", flush)
+    assert (await orch.advance_incident(db, incident.id))["status"] == "completed"
+
+    assert order == ["analyzed", "flushed"]
+    assert (await db.get(Incident, incident.id)).status == "open"
@@ -0,0 +1,84 @@
+import uuid
+import pytest
+import pytest_asyncio
+from datetime import datetime, timedelta, timezone
+from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
+from sqlalchemy.orm import sessionmaker
+from app.db.database import Base
+from app.models.tenant import Tenant
+from app.models.incident import Incident
+from app.models.hypothesis import Hypothesis
+from app.models.agent_decision import AgentDecision
+from app.services.incident_service import incident_service
+
+BASE_TIME = datetime(2024, 5, 20, 10, tzinfo=timezone.utc)
+
+@pytest_asyncio.fixture
+async def db(tmp_path):
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path}/timeline.db")
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    async with sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)() as session:
+        yield session
+    await engine.dispose()
+
+@pytest_asyncio.fixture
+async def incident_id(db):
+    tenant = Tenant(name="Test Corp")
+    db.add(tenant)
+    await db.flush()
+    incident = Incident(tenant_id=tenant.id, title="Brute force")
+    db.add(incident)
+    await db.flush()
+
+    # Interleaved hypotheses and decisions, with timestamp ties every 5 rows
+    for i in range(25):
+        created_at = BASE_TIME + timedelta(seconds=i // 5 * 5 + (i % 5 if i % 5 < 3 else 2))
+        if i % 2:
+            db.add(AgentDecision(incident_id=incident.id, agent_type="critic", created_at=created_at,
+                                 decision_payload={"seq": i}, reasoning_summary=f"r{i}"))
+        else:
+            db.add(Hypothesis(incident_id=incident.id, hypothesis_text=f"h{i}", confidence=0.5,
+                              threat_type="other", created_at=created_at))
+    await db.commit()
+    return incident.id
+
+@pytest.mark.asyncio
+async def test_keyset_pages_cover_timeline_in_order(db, incident_id):
+    full = await incident_service.get_timeline(db, incident_id)
+    assert len(full) == 25
+    assert [i["timestamp"] for i in full] == sorted(i["timestamp"] for i in full)
+
+    seen, cursor, pages = [], None, 0
+    while True:
+        items, cursor = await incident_service.get_timeline_page(db, incident_id, limit=7, cursor=cursor)
+        seen.extend(items)
+        pages += 1
+        if cursor is None:
+            break
+
+    assert pages == 4
+    assert [i["id"] for i in seen] == [i["id"] for i in full]
+
+@pytest.mark.asyncio
+async def test_payload_can_be_excluded(db, incident_id):
+    items, _ = await incident_service.get_timeline_page(db, incident_id, limit=50, include_payload=False)
+    decisions = [i for i in items if i["type"] == "decision"]
+    assert decisions and all("payload" not in d["metadata"] for d in decisions)
+    assert decisions[0]["content"] == "Decision by critic"
+
+    items, _ = await incident_service.get_timeline_page(db, incident_id, limit=50)
+    assert "seq" in next(i for i in items if i["type"] == "decision")["metadata"]["payload"]
+
+@pytest.mark.asyncio
+async def test_invalid_cursor_is_rejected(db):
+    with pytest.raises(ValueError):
+        await incident_service.get_timeline_page(db, uuid.uuid4(), cursor="garbage")
+
+def test_cursor_predicate_is_a_row_comparison():
+    from sqlalchemy.dialects import postgresql
+    predicate = incident_service._after(Hypothesis, BASE_TIME, uuid.uuid4())
+    sql = str(predicate.compile(dialect=postgresql.dialect()))
+    assert sql.startswith("(incident_hypotheses.created_at, incident_hypotheses.id) >")
+    index = next(iter(Hypothesis.__table__.indexes))
+    assert [c.name for c in index.columns] == ["incident_id", "created_at", "id"]
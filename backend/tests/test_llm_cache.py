@@ -0,0 +1,64 @@
+import json
+import pytest
+from unittest.mock import AsyncMock
+from app.services.llm_cache import LLMResponseCache
+from app.services.gemini_service import GeminiService
+
+HYPOTHESES_JSON = json.dumps({"hypotheses": [
+    {"hypothesis_text": "Brute force", "confidence": 0.8, "evidence": ["50 failures"], "threat_type": "brute_force"}
+]})
+
+def _cache(**kwargs):
+    return LLMResponseCache(redis_url="", **kwargs)
+
+def test_key_ignores_trailing_whitespace_but_not_model():
+    key = LLMResponseCache.make_key("m", "gemini-1.5-pro", {"temperature": 0.7}, "line one  \r\nline two\n")
+    assert key == LLMResponseCache.make_key("m", "gemini-1.5-pro", {"temperature": 0.7}, "line one\nline two")
+    assert key != LLMResponseCache.make_key("m", "gemini-1.5-flash", {"temperature": 0.7}, "line one\nline two")
+
+@pytest.mark.asyncio
+async def test_lru_evicts_oldest_entry():
+    cache = _cache(max_entries=2)
+    await cache.set("a", 1)
+    await cache.set("b", 2)
+    assert await cache.get("a") == 1  # refresh "a"
+    await cache.set("c", 3)
+
+    assert await cache.get("b") is None
+    assert await cache.get("a") == 1
+    assert cache.get_stats()["memory_entries"] == 2
+
+@pytest.mark.asyncio
+async def test_expired_entries_are_misses(monkeypatch):
+    cache = _cache(ttl_seconds=10)
+    clock = [1000.0]
+    monkeypatch.setattr("app.services.llm_cache.time.monotonic", lambda: clock[0])
+    await cache.set("a", {"x": 1})
+    clock[0] += 11
+    assert await cache.get("a") is None
+    assert cache.stats["misses"] == 1
+
+@pytest.mark.asyncio
+async def test_gemini_service_serves_repeat_calls_from_cache():
+    service = GeminiService(api_key="test", cache=_cache())
+    service._generate_content = AsyncMock(return_value=HYPOTHESES_JSON)
+    incident = {"events": [{"log_message": "Failed login"}], "context": "Analyzing 1 security events"}
+
+    first = await service.generate_hypothesis(incident)
+    second = await service.generate_hypothesis(incident)
+    assert first == second
+    assert service._generate_content.await_count == 1
+
+    with service.cache.bypass():
+        await service.generate_hypothesis(incident)
+    assert service._generate_content.await_count == 2
+    assert service.cache.stats["bypassed"] == 1
+
+@pytest.mark.asyncio
+async def test_error_responses_are_not_cached():
+    service = GeminiService(api_key="test", cache=_cache())
+    service._generate_content = AsyncMock(return_value="not json")
+
+    await service.generate_hypothesis({"events": []})
+    await service.generate_hypothesis({"events": []})
+    assert service._generate_content.await_count == 2
@@ -0,0 +1,99 @@
+import json
+import pytest
+from google.api_core import exceptions
+from app.services.gemini_service import GeminiService, gemini_service
+from app.services.llm_cache import LLMResponseCache, llm_cache
+from app.services.llm_providers import SimulatedProvider, build_provider
+from app.services.rate_limiter import LLMRateLimiter
+
+EVENTS = [{"source_ip": "203.0.113.7", "event_type": "auth", "message": f"Failed password for root port {22 + i}"}
+          for i in range(3)]
+
+def _service(provider):
+    return GeminiService(cache=LLMResponseCache(redis_url=""), rate_limiter=LLMRateLimiter(redis_url=""),
+                         provider=provider)
+
+@pytest.mark.asyncio
+async def test_simulated_responses_are_schema_valid_and_deterministic():
+    provider = SimulatedProvider(latency_ms=0, distribution="fixed")
+    service = _service(provider)
+
+    first = await service.generate_hypothesis({"events": EVENTS})
+    assert "error" not in first and len(first["hypotheses"]) == 3
+    assert first["hypotheses"][0]["threat_type"] == "brute_force"
+    assert SimulatedProvider(latency_ms=0).respond("prompt", "plan_response") == provider.respond("prompt", "plan_response")
+
+    plan = await service.plan_response(first["hypotheses"][0], {})
+    assert "error" not in plan and plan["actions"]
+    critique = await service.critique_decision(first["hypotheses"][0], plan)
+    assert "error" not in critique
+    analysis = await service.analyze_events(EVENTS)
+    assert analysis["threat_type"] == "brute_force"
+    structured = await service.generate_structured("Summarize", {"summary": "string", "score": "float"})
+    assert structured == {"summary": "simulated", "score": 0.5}
+
+@pytest.mark.asyncio
+async def test_injected_errors_are_retried(monkeypatch):
+    monkeypatch.setattr("app.services.gemini_service.backoff_delay", lambda *args, **kwargs: 0)
+    provider = SimulatedProvider(latency_ms=0, distribution="fixed", error_rate=0.3, rate_limit_rate=0.3, seed=7)
+    service = _service(provider)
+    service.max_retries = 10
+
+    for i in range(20):
+        assert json.loads(await service._call_model(f"prompt {i}", task="analyze_events"))["severity"]
+    assert provider.stats["errors"] > 0 and provider.stats["rate_limited"] > 0
+    assert provider.stats["calls"] == 20 + provider.stats["errors"] + provider.stats["rate_limited"]
+
+    always_failing = _service(SimulatedProvider(latency_ms=0, distribution="fixed", rate_limit_rate=1.0))
+    with pytest.raises(exceptions.ResourceExhausted):
+        await always_failing._call_model("p", task="plan_response")
+
+@pytest.mark.asyncio
+async def test_hung_calls_time_out_and_truncated_streams_are_repaired():
+    service = _service(SimulatedProvider(latency_ms=0, distribution="fixed", timeout_rate=1.0))
+    service.timeout = 0.05
+    service.max_retries = 2
+    with pytest.raises(Exception, match="Timeout"):
+        await service._call_model("p", task="plan_response")
+
+    provider = SimulatedProvider(latency_ms=5, distribution="fixed", truncate_rate=1.0)
+    service = _service(provider)
+    seen = []
+
+    async def on_hypothesis(index, hypothesis):
+        seen.append(index)
+
+    result = await service.generate_hypothesis({"events": EVENTS}, on_hypothesis=on_hypothesis)
+    assert provider.stats["truncated"] == 1
+    assert 1 <= len(result["hypotheses"]) < 3 and seen == list(range(len(seen)))
+
+def test_latency_distributions():
+    for distribution in ("lognormal", "exponential", "uniform"):
+        provider = SimulatedProvider(latency_ms=100, distribution=distribution, seed=1)
+        samples = sorted(provider.sample_latency() for _ in range(2000))
+        assert 0.07 < samples[1000] < 0.13, distribution
+    assert SimulatedProvider(latency_ms=100, distribution="fixed").sample_latency() == 0.1
+    assert build_provider("simulated").name == "simulated"
+    with pytest.raises(ValueError):
+        build_provider("openai")
+
+@pytest.mark.asyncio
+async def test_analyze_endpoint_runs_offline_against_the_simulated_provider(client, monkeypatch):
+    provider = SimulatedProvider(latency_ms=1, distribution="fixed")
+    monkeypatch.setattr(gemini_service, "provider", provider)
+    monkeypatch.setattr(llm_cache, "redis_url", "")
+
+    res = await client.post("/api/incidents/analyze", json={
+        "tenant_id": "00000000-0000-0000-0000-000000000001",
+        "bypass_cache": True,
+        "events": [
+            {"timestamp": "2024-05-20T10:00:00Z", "log_message": "Failed password for admin from 198.51.100.4",
+             "source": "auth", "severity": "high"}
+        ]
+    })
+
+    assert res.status_code == 200, res.text
+    data = res.json()
+    assert data["status"] == "completed" and data["hypotheses"]
+    assert provider.stats["calls"] >= 3
+    assert (await client.get("/api/agents/llm/provider")).json()["provider"] == "simulated"
@@ -0,0 +1,161 @@
+import json
+import asyncio
+import pytest
+from unittest.mock import AsyncMock
+from google.api_core import exceptions
+from app.orchestrator.incident_orchestrator import IncidentOrchestrator
+from app.services.gemini_service import GeminiService
+from app.services.json_stream import JSONArrayStreamParser
+from app.services.llm_cache import LLMResponseCache
+from app.services.rate_limiter import LLMRateLimiter
+
+HYPOTHESES = [
+    {"hypothesis_text": "Brute force on \"root\" {ssh}", "confidence": 0.9, "evidence": ["a\\b", "[x]"],
+     "threat_type": "brute_force"},
+    {"hypothesis_text": "Recon", "confidence": 0.6, "evidence": [], "threat_type": "reconnaissance"},
+    {"hypothesis_text": "Noise", "confidence": 0.2, "evidence": [], "threat_type": "other"},
+]
+RESPONSE = "```json\n" + json.dumps({"summary": {"note": "[]"}, "hypotheses": HYPOTHESES}, indent=2) + "\n```"
+
+class Chunk:
+    def __init__(self, text):
+        self.text = text
+
+class FakeStream:
+    def __init__(self, chunks, fail_after=None):
+        self.chunks = chunks
+        self.fail_after = fail_after
+        self.delivered = 0
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        if self.fail_after is not None and self.delivered == self.fail_after:
+            raise exceptions.ServiceUnavailable("stream reset")
+        if self.delivered == len(self.chunks):
+            raise StopAsyncIteration
+        await asyncio.sleep(0)
+        self.delivered += 1
+        return Chunk(self.chunks[self.delivered - 1])
+
+class FakeModel:
+    def __init__(self, streams):
+        self.streams = list(streams)
+        self.calls = 0
+
+    async def generate_content_async(self, prompt, stream=False):
+        assert stream
+        self.calls += 1
+        stream = self.streams.pop(0)
+        if isinstance(stream, Exception):
+            raise stream
+        return stream
+
+def _chunks(text, size):
+    return [text[i:i + size] for i in range(0, len(text), size)]
+
+def _service(model):
+    service = GeminiService(api_key="test", cache=LLMResponseCache(redis_url=""), rate_limiter=LLMRateLimiter(redis_url=""))
+    service.provider._model_instance = model
+    return service
+
+@pytest.mark.parametrize("size", [1, 2, 7, 64, len(RESPONSE)])
+def test_parser_emits_each_element_once_whatever_the_chunking(size):
+    parser = JSONArrayStreamParser(key="hypotheses")
+    items = [item for chunk in _chunks(RESPONSE, size) for item in parser.feed(chunk)]
+    assert items == HYPOTHESES
+    assert parser.emitted == 3
+
+def test_parser_emits_elements_before_the_document_ends():
+    parser = JSONArrayStreamParser(key="hypotheses")
+    text = json.dumps({"hypotheses": HYPOTHESES})
+    first_end = text.index("}, {") + 1
+    assert parser.feed(text[:first_end]) == HYPOTHESES[:1]
+    assert parser.feed(text[first_end:]) == HYPOTHESES[1:]
+
+    assert JSONArrayStreamParser(key="other").feed(text) == []
+    assert JSONArrayStreamParser().feed(json.dumps(HYPOTHESES)) == HYPOTHESES
+
+@pytest.mark.asyncio
+async def test_hypotheses_are_delivered_while_streaming():
+    stream = FakeStream(_chunks(RESPONSE, 16))
+    service = _service(FakeModel([stream]))
+    received = []
+
+    async def on_hypothesis(index, hypothesis):
+        received.append((index, hypothesis["hypothesis_text"], stream.delivered))
+
+    result = await service.generate_hypothesis({"events": [{"msg": "x"}]}, on_hypothesis=on_hypothesis)
+
+    assert [h["hypothesis_text"] for h in result["hypotheses"]] == [h["hypothesis_text"] for h in HYPOTHESES]
+    assert [(i, text) for i, text, _ in received] == [(i, h["hypothesis_text"]) for i, h in enumerate(HYPOTHESES)]
+    # Each hypothesis was delivered as soon as its chunk arrived, not after the last one
+    assert received[0][2] < received[1][2] < received[2][2] < len(stream.chunks)
+    assert service.stats["streamed_calls"] == 1
+
+@pytest.mark.asyncio
+async def test_stream_is_retried_only_before_the_first_chunk(monkeypatch):
+    monkeypatch.setattr("app.services.gemini_service.backoff_delay", lambda *args, **kwargs: 0)
+    on_hypothesis = AsyncMock()
+
+    model = FakeModel([exceptions.ServiceUnavailable("busy"), FakeStream(_chunks(RESPONSE, 32))])
+    result = await _service(model).generate_hypothesis({"events": []}, on_hypothesis=on_hypothesis)
+    assert model.calls == 2
+    assert len(result["hypotheses"]) == 3
+    assert on_hypothesis.await_count == 3
+
+    on_hypothesis.reset_mock()
+    model = FakeModel([FakeStream(_chunks(RESPONSE, 32), fail_after=8), FakeStream(_chunks(RESPONSE, 32))])
+    result = await _service(model).generate_hypothesis({"events": []}, on_hypothesis=on_hypothesis)
+    assert model.calls == 1
+    assert result["hypotheses"] == [] and "stream reset" in result["error"]
+    assert on_hypothesis.await_count >= 1
+
+@pytest.mark.asyncio
+async def test_orchestrator_pushes_hypotheses_to_the_tenant():
+    orch = IncidentOrchestrator()
+    messages = []
+
+    async def analyze(incident_id, events, on_hypothesis=None):
+        for index, hypothesis in enumerate(HYPOTHESES):
+            await on_hypothesis(index, hypothesis)
+        return HYPOTHESES
+
+    async def notify(message):
+        messages.append(message)
+
+    orch.hypothesis_agent.analyze = AsyncMock(side_effect=analyze)
+    orch.planner_agent.plan = AsyncMock(return_value={"actions": [], "priority": "high"})
+    orch.critic_agent.review = AsyncMock(return_value={"approved": True, "concerns": []})
+
+    result = await orch.process_incident("inc-1", [], mode="sequential", notify=notify)
+    assert result["status"] == "completed"
+    assert [(m["type"], m["incident_id"], m["index"]) for m in messages] == [
+        ("hypothesis_generated", "inc-1", i) for i in range(3)
+    ]
+
+@pytest.mark.asyncio
+async def test_slow_subscribers_do_not_hold_the_rate_limiter_slot():
+    service = _service(FakeModel([FakeStream(_chunks(RESPONSE, 16))]))
+    in_flight = []
+
+    async def on_hypothesis(index, hypothesis):
+        in_flight.append(service.rate_limiter.get_stats()["in_flight"])
+        await asyncio.sleep(0.05)
+
+    result = await service.generate_hypothesis({"events": [{"msg": "y"}]}, on_hypothesis=on_hypothesis)
+    assert len(result["hypotheses"]) == 3 and len(in_flight) == 3
+    # Every hypothesis was delivered, the later ones after the model call had released its slot
+    assert in_flight[-1] == 0
+
+@pytest.mark.asyncio
+async def test_cached_hypotheses_are_replayed_to_subscribers():
+    model = FakeModel([FakeStream(_chunks(RESPONSE, 64))])
+    service = _service(model)
+    await service.generate_hypothesis({"events": [{"msg": "z"}]}, on_hypothesis=AsyncMock())
+
+    on_hypothesis = AsyncMock()
+    result = await service.generate_hypothesis({"events": [{"msg": "z"}]}, on_hypothesis=on_hypothesis)
+    assert model.calls == 1
+    assert [call.args for call in on_hypothesis.await_args_list] == list(enumerate(result["hypotheses"]))
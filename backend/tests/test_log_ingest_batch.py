@@ -0,0 +1,95 @@
+import gzip
+import json
+import uuid
+import pytest
+from unittest.mock import AsyncMock
+from app.config import settings
+from app.db.database import get_db
+from app.main import app
+from app.services.event_ingest_service import event_ingest_service
+
+def _event(**overrides):
+    event = {
+        "tenant_id": str(uuid.uuid4()),
+        "source": "firewall",
+        "event_type": "port_scan",
+        "payload": {"ip": "1.2.3.4"}
+    }
+    event.update(overrides)
+    return event
+
+def test_parse_ndjson_reports_bad_lines():
+    body = b'{"a": 1}\n\nnot json\n{"b": 2}\n'
+    items = event_ingest_service.parse_body(body, "application/x-ndjson")
+    assert len(items) == 3
+    assert items[0] == {"a": 1}
+    assert isinstance(items[1], ValueError)
+    assert items[2] == {"b": 2}
+
+@pytest.mark.asyncio
+async def test_batch_rejects_only_the_line_that_is_not_utf8(client, monkeypatch):
+    bulk_insert = AsyncMock()
+    monkeypatch.setattr(event_ingest_service, "bulk_insert", bulk_insert)
+    app.dependency_overrides[get_db] = lambda: None
+    body = b"\n".join([
+        json.dumps(_event()).encode(),
+        b'{"source": "\xff\xfe"}',
+        json.dumps(_event()).encode(),
+    ])
+    try:
+        response = await client.post(f"{settings.API_V1_STR}/logs/ingest/batch", content=body,
+                                     headers={"content-type": "application/x-ndjson"})
+    finally:
+        app.dependency_overrides.pop(get_db)
+
+    assert response.status_code == 200
+    data = response.json()
+    assert (data["accepted"], data["rejected"]) == (2, 1)
+    assert [r["status"] for r in data["results"]] == ["accepted", "rejected", "accepted"]
+    assert data["results"][1]["index"] == 1 and data["results"][1]["error"].startswith("Invalid JSON")
+    assert len(bulk_insert.await_args.args[1]) == 2
+
+def test_parse_json_requires_array():
+    try:
+        event_ingest_service.parse_body(b'{"a": 1}', "application/json")
+    except ValueError as e:
+        assert "array" in str(e)
+    else:
+        raise AssertionError("expected ValueError")
+
+def test_validate_returns_per_item_results():
+    items = [_event(), _event(tenant_id="not-a-uuid"), ValueError("Invalid JSON"), _event()]
+    rows, results = event_ingest_service.validate(items)
+
+    assert len(rows) == 2
+    assert [r.status for r in results] == ["accepted", "rejected", "rejected", "accepted"]
+    assert results[1].error.startswith("tenant_id")
+    assert results[0].id == rows[0]["id"]
+    assert results[3].id == rows[1]["id"]
+
+async def _chunked(data: bytes, size: int):
+    for i in range(0, len(data), size):
+        yield data[i:i + size]
+
+@pytest.mark.asyncio
+async def test_iter_lines_reassembles_gzip_chunks():
+    lines = [f'{{"seq": {i}}}'.encode() for i in range(500)]
+    body = gzip.compress(b"\n".join(lines) + b"\n")
+
+    out = [line async for line in event_ingest_service.iter_lines(_chunked(body, 37), gzipped=True)]
+    assert out == lines
+
+@pytest.mark.asyncio
+async def test_iter_lines_rejects_truncated_gzip():
+    body = gzip.compress(b'{"seq": 1}\n' * 100)[:-10]
+    with pytest.raises(ValueError):
+        async for _ in event_ingest_service.iter_lines(_chunked(body, 64), gzipped=True):
+            pass
+
+@pytest.mark.asyncio
+async def test_stream_rejects_lines_that_are_not_utf8():
+    body = b'{"a": "\xff\xfe"}\nnot json\n'
+    # No line is valid, so nothing reaches the database
+    result = await event_ingest_service.ingest_stream(None, _chunked(body, 8))
+    assert result.accepted == 0 and result.rejected == 2
+    assert all(e.error.startswith("Invalid JSON") for e in result.errors)
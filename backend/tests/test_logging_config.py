@@ -0,0 +1,70 @@
+import io
+import json
+import logging
+import random
+import threading
+import pytest
+from app import logging_config
+from app.logging_config import BodySampler, DeferredQueueHandler, configure_logging, shutdown_logging
+from app.services.telemetry import trace_context
+
+@pytest.fixture
+def root_logging():
+    root = logging.getLogger()
+    handlers, level = root.handlers[:], root.level
+    yield root
+    shutdown_logging()
+    root.handlers[:] = handlers
+    root.setLevel(level)
+
+class Formatted:
+    """Log argument that records where it was formatted."""
+    def __init__(self):
+        self.threads = []
+
+    def __str__(self):
+        self.threads.append(threading.current_thread())
+        return "formatted"
+
+def test_records_are_formatted_on_the_writer_thread(root_logging):
+    stream = io.StringIO()
+    configure_logging(level="INFO", json_format=False, use_queue=True, stream=stream)
+    arg = Formatted()
+    with trace_context("incident-7"):
+        logging.getLogger("test.queue").info("value %s", arg)
+    logging.getLogger("test.queue").debug("never %s", arg)
+    shutdown_logging()
+
+    assert arg.threads and arg.threads[0] is not threading.current_thread()
+    assert len(arg.threads) == 1
+    assert "[incident-7] test.queue: value formatted" in stream.getvalue()
+
+def test_full_queue_drops_instead_of_blocking():
+    import queue
+    handler = DeferredQueueHandler(queue.Queue(maxsize=2))
+    for i in range(5):
+        handler.handle(logging.LogRecord("test", logging.INFO, __file__, 1, "m %d", (i,), None))
+    assert handler.queue.qsize() == 2 and handler.dropped == 3
+
+def test_json_lines(root_logging):
+    stream = io.StringIO()
+    configure_logging(level="INFO", json_format=True, use_queue=False, stream=stream)
+    with trace_context("incident-9"):
+        logging.getLogger("test.json").warning("quota %d%%", 80)
+    entry = json.loads(stream.getvalue())
+    assert entry["message"] == "quota 80%" and entry["trace_id"] == "incident-9" and entry["level"] == "WARNING"
+
+def test_body_sampling_per_category(root_logging):
+    root_logging.setLevel(logging.INFO)
+    sampler = BodySampler(rates={"prompt": 0.0, "response": 0.25, "error": 1.0}, max_chars=10,
+                          rng=random.Random(1))
+    assert not any(sampler.sample("prompt") for _ in range(100))
+    assert all(sampler.sample("error") for _ in range(100))
+    assert 150 < sum(sampler.sample("response") for _ in range(1000)) < 350
+    assert sampler.clip("x" * 25) == "x" * 10 + "... [15 more chars]"
+
+    logging_config.body_logger.setLevel(logging.WARNING)
+    try:
+        assert not sampler.sample("error")
+    finally:
+        logging_config.body_logger.setLevel(logging.NOTSET)
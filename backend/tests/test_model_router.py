@@ -0,0 +1,137 @@
+import json
+import pytest
+from app.services.gemini_service import GeminiService
+from app.services.llm_cache import LLMResponseCache
+from app.services.llm_providers import LLMProvider, SimulatedProvider
+from app.services.model_router import FAST, LARGE, IncidentComplexity, ModelRouter
+from app.services.rate_limiter import LLMRateLimiter
+
+PLAN = {"actions": ["Block IP"], "priority": "high", "estimated_impact": "Low", "false_positive_risk": 0.1}
+
+def _hypotheses(confidence):
+    return json.dumps({"hypotheses": [{"hypothesis_text": "Brute force", "confidence": confidence,
+                                       "evidence": ["failed logins"], "threat_type": "brute_force"}]})
+
+class TieredProvider(LLMProvider):
+    """Answers with responses[tier][task] and records the tier of every call."""
+    name = "tiered"
+
+    def __init__(self, responses):
+        self.responses = responses
+        self.calls = []
+
+    async def generate(self, prompt, task=None, model=None):
+        tier = model.tier if model is not None else LARGE
+        self.calls.append((task, tier))
+        return self.responses[tier][task]
+
+    async def stream(self, prompt, task=None, model=None):
+        yield await self.generate(prompt, task, model)
+
+def _service(provider, router):
+    return GeminiService(cache=LLMResponseCache(redis_url=""), rate_limiter=LLMRateLimiter(redis_url=""),
+                         provider=provider, router=router)
+
+def test_routes_by_task_and_incident_complexity():
+    router = ModelRouter(enabled=True)
+    # Outside an incident only the configured fast tasks use the fast model
+    assert router.choose("generate_hypothesis").tier == LARGE
+    assert router.choose("critique_decision").tier == FAST
+    assert router.choose("replan_response").tier == FAST
+
+    small = ModelRouter.assess([{"severity": "low"}, {"severity": "high"}, {}])
+    assert small == IncidentComplexity(events=3, severity="high")
+    with router.incident(small):
+        assert router.choose("generate_hypothesis").tier == FAST
+        router.note_patterns(50)
+        assert router.choose("generate_hypothesis").tier == LARGE
+        assert router.choose("critique_decision").tier == FAST
+
+    with router.incident(ModelRouter.assess([{"severity": "critical"}])):
+        assert router.choose("plan_response").tier == LARGE
+    with router.incident(IncidentComplexity(events=10_000)):
+        assert router.choose("plan_response").tier == LARGE
+
+    disabled = ModelRouter(enabled=False)
+    assert disabled.choose("critique_decision").tier == LARGE
+
+@pytest.mark.asyncio
+async def test_fast_answers_are_escalated_when_invalid_or_not_confident():
+    provider = TieredProvider({
+        FAST: {"critique_decision": "not json", "generate_hypothesis": _hypotheses(0.2),
+               "plan_response": json.dumps(PLAN)},
+        LARGE: {"critique_decision": json.dumps({"approved": True, "confidence_adjustment": 0.0, "concerns": []}),
+                "generate_hypothesis": _hypotheses(0.8)},
+    })
+    router = ModelRouter(enabled=True)
+    service = _service(provider, router)
+
+    with router.incident(ModelRouter.assess([{"severity": "medium"}] * 5)):
+        critique = await service.critique_decision({"hypothesis_text": "x"}, PLAN)
+        hypotheses = await service.generate_hypothesis({"events": [{"msg": "failed login"}]})
+        plan = await service.plan_response({"hypothesis_text": "x"}, {})
+
+    assert critique["approved"] is True
+    assert hypotheses["hypotheses"][0]["confidence"] == 0.8
+    assert plan == PLAN
+    assert provider.calls == [("critique_decision", FAST), ("critique_decision", LARGE),
+                              ("generate_hypothesis", FAST), ("generate_hypothesis", LARGE),
+                              ("plan_response", FAST)]
+
+    routes = router.get_stats()["routes"]
+    assert routes["critique_decision"]["escalated_invalid"] == 1
+    assert routes["generate_hypothesis"]["escalated_low_confidence"] == 1
+    assert routes["critique_decision"]["escalation_rate"] == 1.0
+    assert routes["plan_response"] == {**routes["plan_response"], "requests": 1, "fast_calls": 1, "large_calls": 0,
+                                       "escalation_rate": 0.0}
+
+@pytest.mark.asyncio
+async def test_simulated_fast_model_is_faster():
+    router = ModelRouter(enabled=True)
+    service = _service(SimulatedProvider(latency_ms=40, distribution="fixed"), router)
+    await service.analyze_events([{"message": "Failed password for root"}])
+    await service.generate_structured("Summarize", {"summary": "string"})
+
+    routes = router.get_stats()["routes"]
+    assert routes["analyze_events"]["fast_calls"] == 1 and routes["generate_structured"]["large_calls"] == 1
+    assert routes["analyze_events"]["avg_fast_ms"] < routes["generate_structured"]["avg_large_ms"]
+
+@pytest.mark.asyncio
+async def test_only_the_large_model_streams_live(monkeypatch):
+    monkeypatch.setattr("app.services.gemini_service.settings.LLM_STREAMING_ENABLED", True)
+    provider = TieredProvider({
+        FAST: {"generate_hypothesis": _hypotheses(0.2)},
+        LARGE: {"generate_hypothesis": _hypotheses(0.8)},
+    })
+    router = ModelRouter(enabled=True)
+    service = _service(provider, router)
+    received = []
+
+    async def on_hypothesis(index, hypothesis):
+        received.append((index, hypothesis["confidence"]))
+
+    with router.incident(ModelRouter.assess([{"severity": "medium"}] * 5)):
+        await service.generate_hypothesis({"events": [{"msg": "failed login"}]}, on_hypothesis=on_hypothesis)
+    # The rejected fast answer was never sent to subscribers
+    assert received == [(0, 0.8)]
+    assert service.stats["streamed_calls"] == 1
+
+    provider.responses[FAST]["generate_hypothesis"] = _hypotheses(0.7)
+    received.clear()
+    with router.incident(ModelRouter.assess([{"severity": "low"}] * 5)):
+        await service.generate_hypothesis({"events": [{"msg": "port scan"}]}, on_hypothesis=on_hypothesis)
+    # An accepted fast answer is sent once it has been accepted
+    assert received == [(0, 0.7)]
+    assert service.stats["streamed_calls"] == 1
+
+@pytest.mark.asyncio
+async def test_plans_are_escalated_only_when_invalid():
+    risky = {**PLAN, "false_positive_risk": 0.9}
+    provider = TieredProvider({FAST: {"plan_response": json.dumps(risky)}, LARGE: {}})
+    router = ModelRouter(enabled=True)
+    service = _service(provider, router)
+
+    with router.incident(ModelRouter.assess([{"severity": "low"}])):
+        assert await service.plan_response({"hypothesis_text": "x"}, {}) == risky
+    assert provider.calls == [("plan_response", FAST)]
+    assert router.get_stats()["routes"]["plan_response"]["escalated_low_confidence"] == 0
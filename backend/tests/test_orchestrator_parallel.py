@@ -0,0 +1,93 @@
+import asyncio
+import pytest
+from unittest.mock import AsyncMock
+from app.config import settings
+from app.orchestrator.incident_orchestrator import IncidentOrchestrator
+
+HYPOTHESES = [
+    {"hypothesis_text": "Brute force", "confidence": 0.9, "evidence": [], "threat_type": "brute_force"},
+    {"hypothesis_text": "Recon", "confidence": 0.6, "evidence": [], "threat_type": "reconnaissance"},
+    {"hypothesis_text": "Noise", "confidence": 0.2, "evidence": [], "threat_type": "other"},
+]
+
+def _orchestrator(plan_delays, approvals):
+    orch = IncidentOrchestrator()
+    orch.hypothesis_agent.analyze = AsyncMock(return_value=HYPOTHESES)
+
+    async def plan(incident_id, hypothesis, critique=None):
+        await asyncio.sleep(plan_delays[hypothesis["hypothesis_text"]])
+        return {"actions": [hypothesis["hypothesis_text"]], "priority": "high", "false_positive_risk": 0.1}
+
+    async def review(incident_id, hypothesis, plan):
+        return {"approved": approvals[hypothesis["hypothesis_text"]], "confidence_adjustment": 0.0, "concerns": []}
+
+    orch.planner_agent.plan = AsyncMock(side_effect=plan)
+    orch.critic_agent.review = AsyncMock(side_effect=review)
+    return orch
+
+@pytest.mark.asyncio
+async def test_parallel_picks_best_approved_branch(monkeypatch):
+    monkeypatch.setattr(settings, "ORCHESTRATOR_FANOUT", 3)
+    orch = _orchestrator(
+        plan_delays={"Brute force": 0.2, "Recon": 0.2, "Noise": 0.2},
+        approvals={"Brute force": False, "Recon": True, "Noise": True},
+    )
+
+    loop = asyncio.get_running_loop()
+    start = loop.time()
+    result = await orch.process_incident("inc-1", [], mode="parallel")
+    elapsed = loop.time() - start
+
+    assert result["status"] == "completed"
+    assert result["final_decision"]["top_hypothesis"]["hypothesis_text"] == "Recon"
+    assert orch.planner_agent.plan.await_count == 3
+    # Branches ran concurrently: bounded by the slowest branch, not the sum
+    assert elapsed < 0.5
+
+@pytest.mark.asyncio
+async def test_parallel_deadline_cancels_slow_branches(monkeypatch):
+    monkeypatch.setattr(settings, "ORCHESTRATOR_FANOUT", 2)
+    monkeypatch.setattr(settings, "ORCHESTRATOR_DEADLINE_SECONDS", 0.3)
+    orch = _orchestrator(
+        plan_delays={"Brute force": 5.0, "Recon": 0.05, "Noise": 0.05},
+        approvals={"Brute force": True, "Recon": True, "Noise": True},
+    )
+
+    result = await orch.process_incident("inc-2", [], mode="parallel")
+
+    assert result["status"] == "completed"
+    assert result["final_decision"]["top_hypothesis"]["hypothesis_text"] == "Recon"
+
+@pytest.mark.asyncio
+async def test_parallel_fails_when_no_branch_finishes(monkeypatch):
+    monkeypatch.setattr(settings, "ORCHESTRATOR_FANOUT", 1)
+    monkeypatch.setattr(settings, "ORCHESTRATOR_DEADLINE_SECONDS", 0.1)
+    orch = _orchestrator(
+        plan_delays={"Brute force": 5.0, "Recon": 5.0, "Noise": 5.0},
+        approvals={"Brute force": True, "Recon": True, "Noise": True},
+    )
+
+    result = await orch.process_incident("inc-3", [], mode="parallel")
+    assert result["status"] == "failed"
+    assert result["error"].startswith("No response plan completed")
+
+@pytest.mark.asyncio
+async def test_parallel_reports_branch_errors_instead_of_a_timeout(monkeypatch):
+    monkeypatch.setattr(settings, "ORCHESTRATOR_FANOUT", 2)
+    orch = _orchestrator(plan_delays={}, approvals={})
+    orch.planner_agent.plan = AsyncMock(side_effect=RuntimeError("planner down"))
+
+    result = await orch.process_incident("inc-4", [], mode="parallel")
+    assert result["status"] == "failed"
+    assert result["error"] == "planner down"
+
+@pytest.mark.asyncio
+async def test_parallel_keeps_the_message_of_a_branch_that_timed_out(monkeypatch):
+    monkeypatch.setattr(settings, "ORCHESTRATOR_FANOUT", 1)
+    orch = _orchestrator(plan_delays={}, approvals={})
+    # asyncio.TimeoutError is TimeoutError on 3.11+; it must not be reported as the deadline
+    orch.planner_agent.plan = AsyncMock(side_effect=TimeoutError("model call timed out"))
+
+    result = await orch.process_incident("inc-5", [], mode="parallel")
+    assert result["status"] == "failed"
+    assert result["error"] == "model call timed out"
@@ -0,0 +1,81 @@
+import uuid
+import pytest
+import pytest_asyncio
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
+from sqlalchemy.orm import sessionmaker
+from app.db.database import Base
+from app.models.tenant import Tenant
+from app.models.incident import Incident
+from app.models.hypothesis import Hypothesis
+from app.models.agent_decision import AgentDecision
+from app.services.persistence_queue import WriteBehindQueue
+
+@pytest_asyncio.fixture
+async def session_factory(tmp_path):
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path}/queue.db")
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    yield sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+    await engine.dispose()
+
+async def _incident(session_factory) -> uuid.UUID:
+    async with session_factory() as session:
+        tenant = Tenant(name="Test Corp")
+        session.add(tenant)
+        await session.flush()
+        incident = Incident(tenant_id=tenant.id, title="Brute force")
+        session.add(incident)
+        await session.commit()
+        return incident.id
+
+def _hypothesis(incident_id):
+    return {"id": uuid.uuid4(), "incident_id": incident_id, "hypothesis_text": "h", "confidence": 0.5,
+            "evidence": [], "threat_type": "other"}
+
+@pytest.mark.asyncio
+async def test_rows_are_written_on_size_trigger_and_drained_on_stop(session_factory):
+    incident_id = await _incident(session_factory)
+    queue = WriteBehindQueue(batch_size=3, flush_interval=60, max_pending=100, session_factory=session_factory)
+
+    await queue.enqueue(Hypothesis, [_hypothesis(incident_id) for _ in range(2)])
+    await queue.enqueue(AgentDecision, [{"id": uuid.uuid4(), "incident_id": incident_id, "agent_type": "critic",
+                                         "decision_payload": {"approved": True}}])
+    assert queue.pending == 3
+    await queue.enqueue(Hypothesis, [_hypothesis(incident_id)])
+    await queue.stop()
+
+    assert queue.pending == 0
+    assert queue.stats["written"] == 4
+    async with session_factory() as session:
+        assert len((await session.execute(select(Hypothesis))).scalars().all()) == 3
+        assert len((await session.execute(select(AgentDecision))).scalars().all()) == 1
+
+@pytest.mark.asyncio
+async def test_failed_batch_falls_back_to_row_by_row(session_factory):
+    incident_id = await _incident(session_factory)
+    queue = WriteBehindQueue(batch_size=100, flush_interval=60, max_pending=100, session_factory=session_factory)
+
+    good = _hypothesis(incident_id)
+    bad = _hypothesis(incident_id)
+    bad["hypothesis_text"] = None  # violates NOT NULL
+    await queue.enqueue(Hypothesis, [good, bad])
+    await queue.stop()
+
+    assert queue.stats["written"] == 1
+    assert queue.stats["dropped"] == 1
+
+@pytest.mark.asyncio
+async def test_failing_incident_does_not_roll_back_other_incidents(session_factory):
+    first, second = await _incident(session_factory), await _incident(session_factory)
+    queue = WriteBehindQueue(batch_size=100, flush_interval=60, max_pending=100, session_factory=session_factory)
+
+    bad = _hypothesis(second)
+    bad["hypothesis_text"] = None
+    await queue.enqueue(Hypothesis, [_hypothesis(first), bad, _hypothesis(second), _hypothesis(first)])
+    await queue.stop()
+
+    assert queue.stats == {**queue.stats, "written": 3, "dropped": 1, "flushes": 1}
+    async with session_factory() as session:
+        rows = (await session.execute(select(Hypothesis.incident_id))).scalars().all()
+    assert sorted(map(str, rows)) == sorted(map(str, [first, first, second]))
@@ -0,0 +1,43 @@
+from app.services.prompt_builder import PromptBuilder, estimate_tokens
+
+def test_required_sections_survive_any_budget():
+    result = PromptBuilder(budget_tokens=1).add("instructions", "x" * 400, required=True).build()
+    assert result.text == "x" * 400
+    assert result.dropped == {"instructions": 0}
+
+def test_items_fill_remaining_budget_in_order():
+    items = [f"event-{i:03d} " + "y" * 36 for i in range(100)]  # ~12 tokens each
+    builder = PromptBuilder(budget_tokens=200)
+    builder.add("instructions", "Analyze:\n", required=True)
+    builder.add_items("events", items, priority=10)
+    result = builder.build()
+
+    kept = result.kept["events"]
+    assert 0 < kept < 100
+    assert result.dropped["events"] == 100 - kept
+    assert items[kept - 1] in result.text and items[kept] not in result.text
+    assert f"({100 - kept} more omitted" in result.text
+    assert result.truncated
+
+def test_higher_priority_sections_are_funded_first_but_order_is_preserved():
+    builder = PromptBuilder(budget_tokens=estimate_tokens("a" * 80) + 10)
+    builder.add("low", "a" * 80, priority=1)
+    builder.add("high", "b" * 80, priority=9)
+    result = builder.build()
+
+    assert result.kept == {"low": 0, "high": 1}
+    assert result.text == "b" * 80
+
+    both = PromptBuilder(budget_tokens=1000).add("first", "1", priority=1).add("second", "2", priority=9).build()
+    assert both.text == "12"
+
+def test_truncated_prompts_stay_within_the_budget():
+    items = [f"event-{i:03d} " + "y" * 36 for i in range(100)]
+    for budget in range(40, 200):
+        builder = PromptBuilder(budget_tokens=budget)
+        builder.add("instructions", "Analyze:\n", required=True)
+        builder.add_items("events", items, priority=10, header="Events:\n", footer="\n")
+        result = builder.build()
+        assert result.truncated
+        # The "... more omitted" note is counted too
+        assert result.estimated_tokens <= budget, budget
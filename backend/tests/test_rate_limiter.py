@@ -0,0 +1,69 @@
+import asyncio
+import pytest
+from app.services.rate_limiter import LLMRateLimiter, SEVERITY_PRIORITY, backoff_delay
+
+def _limiter(**kwargs):
+    params = {"max_in_flight": 1, "requests_per_minute": 6000, "tokens_per_minute": 10 ** 7, "redis_url": ""}
+    params.update(kwargs)
+    return LLMRateLimiter(**params)
+
+@pytest.mark.asyncio
+async def test_waiters_are_served_by_priority():
+    limiter = _limiter()
+    order = []
+    release = asyncio.Event()
+
+    async def call(name, level):
+        with limiter.priority(level):
+            async with limiter.acquire(10):
+                order.append(name)
+                if name == "holder":
+                    await release.wait()
+
+    holder = asyncio.create_task(call("holder", SEVERITY_PRIORITY["low"]))
+    await asyncio.sleep(0)
+    waiters = [
+        asyncio.create_task(call("low", SEVERITY_PRIORITY["low"])),
+        asyncio.create_task(call("medium", SEVERITY_PRIORITY["medium"])),
+        asyncio.create_task(call("critical", SEVERITY_PRIORITY["critical"])),
+    ]
+    await asyncio.sleep(0)
+    assert limiter.queue_depth() == 3
+
+    release.set()
+    await asyncio.gather(holder, *waiters)
+    assert order == ["holder", "critical", "medium", "low"]
+    assert limiter.get_stats()["in_flight"] == 0
+
+@pytest.mark.asyncio
+async def test_cancelled_waiter_does_not_leak_slot():
+    limiter = _limiter()
+    async with limiter.acquire(1):
+        waiter = asyncio.create_task(limiter.acquire(1).__aenter__())
+        await asyncio.sleep(0)
+        waiter.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiter
+    assert limiter.get_stats()["in_flight"] == 0
+    assert limiter.queue_depth() == 0
+
+@pytest.mark.asyncio
+async def test_request_bucket_throttles_bursts():
+    limiter = _limiter(max_in_flight=10, requests_per_minute=600)  # 10 req/s
+    limiter.request_bucket.tokens = 0
+
+    loop = asyncio.get_running_loop()
+    start = loop.time()
+    async with limiter.acquire(1):
+        pass
+    assert loop.time() - start >= 0.09
+
+def test_priority_for_events_uses_most_severe():
+    events = [{"severity": "low"}, {"severity": "CRITICAL"}, {}]
+    assert LLMRateLimiter.priority_for_events(events) == SEVERITY_PRIORITY["critical"]
+    assert LLMRateLimiter.priority_for_events([]) == SEVERITY_PRIORITY["medium"]
+
+def test_backoff_is_jittered_and_capped():
+    delays = {backoff_delay(10, base=1.0, cap=4.0) for _ in range(50)}
+    assert all(0 <= d <= 4.0 for d in delays)
+    assert len(delays) > 1
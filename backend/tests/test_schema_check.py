@@ -0,0 +1,23 @@
+import pytest
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import create_async_engine
+from app.db.migrations import SchemaNotAtHead, ensure_schema_at_head, head_revision
+
+@pytest.mark.asyncio
+async def test_startup_check_requires_the_alembic_head(tmp_path):
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path}/schema.db")
+    try:
+        with pytest.raises(SchemaNotAtHead, match="alembic upgrade head"):
+            await ensure_schema_at_head(engine)
+
+        async with engine.begin() as conn:
+            await conn.execute(text("CREATE TABLE alembic_version (version_num VARCHAR(32) PRIMARY KEY)"))
+            await conn.execute(text("INSERT INTO alembic_version VALUES ('0001')"))
+        with pytest.raises(SchemaNotAtHead, match="revision 0001"):
+            await ensure_schema_at_head(engine)
+
+        async with engine.begin() as conn:
+            await conn.execute(text("UPDATE alembic_version SET version_num = :head"), {"head": head_revision()})
+        assert await ensure_schema_at_head(engine) == head_revision()
+    finally:
+        await engine.dispose()
@@ -0,0 +1,56 @@
+import asyncio
+import pytest
+from app.services.gemini_service import GeminiService
+from app.services.llm_cache import LLMResponseCache
+
+def _service():
+    return GeminiService(api_key="test", cache=LLMResponseCache(redis_url=""))
+
+@pytest.mark.asyncio
+async def test_identical_prompts_share_one_call():
+    service = _service()
+    calls = []
+
+    async def fake_call(prompt, task=None, model=None):
+        calls.append(prompt)
+        await asyncio.sleep(0.05)
+        return f"response to {prompt}"
+
+    service._call_model = fake_call
+    results = await asyncio.gather(*[service._generate_content("same prompt") for _ in range(10)],
+                                   service._generate_content("other prompt"))
+
+    assert calls == ["same prompt", "other prompt"]
+    assert results[:10] == ["response to same prompt"] * 10
+    assert service.stats["coalesced_calls"] == 9
+    assert service._inflight == {}
+
+@pytest.mark.asyncio
+async def test_failure_propagates_to_every_waiter():
+    service = _service()
+
+    async def failing_call(prompt, task=None, model=None):
+        await asyncio.sleep(0.01)
+        raise RuntimeError("quota exhausted")
+
+    service._call_model = failing_call
+    results = await asyncio.gather(*[service._generate_content("p") for _ in range(5)], return_exceptions=True)
+
+    assert all(isinstance(r, RuntimeError) and str(r) == "quota exhausted" for r in results)
+    assert service._inflight == {}
+
+@pytest.mark.asyncio
+async def test_cancelled_caller_does_not_cancel_shared_call():
+    service = _service()
+
+    async def slow_call(prompt, task=None, model=None):
+        await asyncio.sleep(0.05)
+        return "ok"
+
+    service._call_model = slow_call
+    first = asyncio.create_task(service._generate_content("p"))
+    second = asyncio.create_task(service._generate_content("p"))
+    await asyncio.sleep(0.01)
+    first.cancel()
+
+    assert await second == "ok"
@@ -0,0 +1,92 @@
+import json
+import pytest
+from app.services.gemini_service import HYPOTHESIS_PARSER, PLAN_PARSER, STRUCTURED_PARSER, GeminiService
+from app.services.llm_cache import LLMResponseCache
+from app.services.model_router import ModelRouter
+from app.services.structured_output import StructuredOutputError, locate_json, repair_truncated
+
+HYPOTHESES = {"hypotheses": [
+    {"hypothesis_text": "Brute force {ssh} \"root\"", "confidence": 0.9, "evidence": ["a", "b]"], "threat_type": "brute_force"},
+    {"hypothesis_text": "Recon", "confidence": 0.6, "evidence": [], "threat_type": "reconnaissance"},
+    {"hypothesis_text": "Noise", "confidence": 0.2, "evidence": [], "threat_type": "other"},
+]}
+PLAN = {"actions": ["Block IP"], "priority": "high", "estimated_impact": "Low", "false_positive_risk": 0.1}
+
+@pytest.mark.parametrize("text", [
+    json.dumps(HYPOTHESES),
+    "```json\n" + json.dumps(HYPOTHESES, indent=2) + "\n```",
+    "```\n" + json.dumps(HYPOTHESES) + "\n```\n",
+    "Here is the analysis:\n" + json.dumps(HYPOTHESES) + "\nHope this helps.",
+])
+def test_json_is_found_around_fences_and_prose(text):
+    result = HYPOTHESIS_PARSER.dump(text)
+    assert [h["hypothesis_text"] for h in result["hypotheses"]] == [h["hypothesis_text"] for h in HYPOTHESES["hypotheses"]]
+
+def test_truncated_array_keeps_complete_items():
+    text = "```json\n" + json.dumps(HYPOTHESES, indent=2)
+    cut = text.index('"Noise"')
+    result = HYPOTHESIS_PARSER.dump(text[:cut])
+    assert [h["hypothesis_text"] for h in result["hypotheses"]] == ["Brute force {ssh} \"root\"", "Recon"]
+
+    assert repair_truncated('{"a": ["x", "y", "z') == '{"a": ["x", "y"]}'
+    assert repair_truncated('{"a": [{"b": 1}, {"b"') == '{"a": [{"b": 1}]}'
+    assert repair_truncated('{"a": "unfinished') is None
+    assert locate_json("no json here") == (-1, -1)
+
+def test_invalid_items_are_dropped_not_the_whole_response():
+    data = json.loads(json.dumps(HYPOTHESES))
+    data["hypotheses"][1]["confidence"] = 1.7
+    data["hypotheses"][2]["threat_type"] = "aliens"
+    result = HYPOTHESIS_PARSER.dump(json.dumps(data))
+    assert [h["hypothesis_text"] for h in result["hypotheses"]] == ["Brute force {ssh} \"root\""]
+
+def test_unrecoverable_responses_raise():
+    with pytest.raises(StructuredOutputError):
+        PLAN_PARSER.parse("I cannot help with that.")
+    with pytest.raises(StructuredOutputError):
+        PLAN_PARSER.parse(json.dumps({**PLAN, "priority": "urgent"}))
+    with pytest.raises(StructuredOutputError):
+        PLAN_PARSER.parse('```json\n{"actions": ["Block IP", "Reset')
+    assert STRUCTURED_PARSER.dump('```json\n{"a": 1}\n```') == {"a": 1}
+
+@pytest.mark.asyncio
+async def test_gemini_methods_share_the_parser():
+    # Routing off: an invalid fast-model answer would otherwise be escalated (see test_model_router)
+    service = GeminiService(api_key="test", cache=LLMResponseCache(redis_url=""), router=ModelRouter(enabled=False))
+    responses = iter([
+        "```json\n" + json.dumps(PLAN) + "\n```",
+        # analyze_events used to skip the fence cleanup entirely
+        "```json\n" + json.dumps({"threat_type": "dos", "severity": "high", "description": "Flood",
+                                  "recommended_actions": [], "confidence": 0.7}) + "\n```",
+        "not json",
+    ])
+
+    async def fake_generate(prompt, task=None, model=None):
+        return next(responses)
+
+    service._generate_content = fake_generate
+    assert (await service.plan_response({"hypothesis_text": "x"}, {}))["priority"] == "high"
+    assert (await service.analyze_events([]))["threat_type"] == "dos"
+    critique = await service.critique_decision({}, {})
+    assert critique["approved"] is False and critique["error"] == "Malformed response from AI"
+
+@pytest.mark.asyncio
+async def test_repaired_and_salvaged_responses_are_not_cached():
+    text = json.dumps(HYPOTHESES)
+    assert HYPOTHESIS_PARSER.dump_checked(text)[1] is True
+    assert HYPOTHESIS_PARSER.dump_checked(text[:text.index('"Noise"')])[1] is False
+
+    salvaged = json.loads(text)
+    salvaged["hypotheses"][2]["threat_type"] = "aliens"
+    service = GeminiService(api_key="test", cache=LLMResponseCache(redis_url=""), router=ModelRouter(enabled=False))
+    responses = iter([json.dumps(salvaged), text])
+
+    async def fake_generate(prompt, task=None, model=None):
+        return next(responses)
+
+    service._generate_content = fake_generate
+    first = await service.generate_hypothesis({"events": [{"msg": "failed login"}]})
+    second = await service.generate_hypothesis({"events": [{"msg": "failed login"}]})
+    assert len(first["hypotheses"]) == 2 and len(second["hypotheses"]) == 3
+    # The clean answer is cached; the salvaged one was not
+    assert await service.generate_hypothesis({"events": [{"msg": "failed login"}]}) == second
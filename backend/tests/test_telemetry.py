@@ -0,0 +1,82 @@
+import asyncio
+import logging
+import pytest
+from unittest.mock import AsyncMock
+from app.orchestrator.incident_orchestrator import IncidentOrchestrator
+from app.services.gemini_service import GeminiService
+from app.services.llm_cache import LLMResponseCache
+from app.services.llm_providers import SimulatedProvider
+from app.services.rate_limiter import LLMRateLimiter
+from app.services.telemetry import sample_value, span, trace_context, trace_id_var
+
+def _count(name, labels):
+    return sample_value(f"{name}_count", labels)
+
+def test_span_records_duration_and_status():
+    before_ok = _count("cybersentinel_span_seconds", {"span": "test.block", "status": "ok"})
+    before_error = _count("cybersentinel_span_seconds", {"span": "test.block", "status": "error"})
+    with span("test.block"):
+        pass
+    with pytest.raises(RuntimeError):
+        with span("test.block"):
+            raise RuntimeError("boom")
+    assert _count("cybersentinel_span_seconds", {"span": "test.block", "status": "ok"}) == before_ok + 1
+    assert _count("cybersentinel_span_seconds", {"span": "test.block", "status": "error"}) == before_error + 1
+
+@pytest.mark.asyncio
+async def test_incident_trace_id_reaches_agent_logs_and_tasks(caplog):
+    orch = IncidentOrchestrator()
+    logger = logging.getLogger("test.agent")
+
+    async def analyze(incident_id, events, on_hypothesis=None):
+        # Work started in a separate task keeps the trace id
+        await asyncio.create_task(asyncio.sleep(0))
+        logger.info("analyzing")
+        return [{"hypothesis_text": "x", "confidence": 0.9, "evidence": [], "threat_type": "other"}]
+
+    orch.hypothesis_agent.analyze = analyze
+    orch.planner_agent.plan = AsyncMock(return_value={"actions": [], "priority": "low"})
+    orch.critic_agent.review = AsyncMock(return_value={"approved": True})
+
+    with caplog.at_level(logging.INFO):
+        result = await orch.process_incident("incident-42", [], mode="sequential")
+
+    assert result["status"] == "completed"
+    assert {r.trace_id for r in caplog.records if r.name == "test.agent"} == {"incident-42"}
+    assert trace_id_var.get() == "-"
+    with trace_context("outer"):
+        with trace_context("inner") as active:
+            assert active == "outer"
+
+@pytest.mark.asyncio
+async def test_llm_attempts_retries_and_sizes_are_recorded(monkeypatch):
+    monkeypatch.setattr("app.services.gemini_service.backoff_delay", lambda *args, **kwargs: 0.0)
+    provider = SimulatedProvider(latency_ms=0, distribution="fixed", error_rate=0.5, seed=3)
+    service = GeminiService(cache=LLMResponseCache(redis_url=""), rate_limiter=LLMRateLimiter(redis_url=""),
+                            provider=provider)
+    service.max_retries = 20
+    labels = {"task": "plan_response"}
+    before = {outcome: sample_value("cybersentinel_llm_attempts_total", {**labels, "outcome": outcome})
+              for outcome in ("ok", "error")}
+    before_sleeps = _count("cybersentinel_llm_retry_sleep_seconds", {**labels, "reason": "error"})
+    before_prompts = sample_value("cybersentinel_llm_prompt_chars_sum", labels)
+
+    for i in range(5):
+        await service._call_model(f"prompt {i}", task="plan_response")
+
+    assert sample_value("cybersentinel_llm_attempts_total", {**labels, "outcome": "ok"}) == before["ok"] + 5
+    errors = sample_value("cybersentinel_llm_attempts_total", {**labels, "outcome": "error"}) - before["error"]
+    assert errors == provider.stats["errors"] > 0
+    assert _count("cybersentinel_llm_retry_sleep_seconds", {**labels, "reason": "error"}) == before_sleeps + errors
+    assert sample_value("cybersentinel_llm_prompt_chars_sum", labels) == before_prompts + 5 * len("prompt 0")
+    assert _count("cybersentinel_span_seconds", {"span": "llm.plan_response", "status": "ok"}) >= 5
+
+@pytest.mark.asyncio
+async def test_metrics_endpoint(client):
+    await client.get("/health")
+    res = await client.get("/metrics")
+    assert res.status_code == 200
+    assert res.headers["content-type"].startswith("text/plain")
+    assert 'cybersentinel_http_request_seconds_count{method="GET",route="/health",status="200"}' in res.text
+    assert "cybersentinel_llm_attempts_total" in res.text
+    assert "cybersentinel_db_pool_connections" in res.text
@@ -0,0 +1,66 @@
+import pytest
+from unittest.mock import AsyncMock
+from app.agents.hypothesis_agent import HypothesisAgent
+from app.services.triage_classifier import TriageClassifier
+
+def _event(message: str, severity: str = "medium") -> dict:
+    return {"timestamp": "2024-05-20T10:00:00Z", "log_message": message, "source": "sensor", "severity": severity}
+
+def _port_scan(n: int = 40) -> list:
+    return [_event(f"IN=eth0 SRC=198.51.100.23 DST=10.0.0.5 PROTO=TCP DPT={20 + i} connection attempt denied")
+            for i in range(n)]
+
+def _brute_force(n: int = 30) -> list:
+    return [_event(f"Failed password for {'admin' if i % 2 else 'root'} from 203.0.113.{i % 3} port {40000 + i} ssh2")
+            for i in range(n)]
+
+def test_port_scan_is_triaged_locally():
+    result = TriageClassifier().classify(_port_scan())
+    assert result.bypass
+    assert result.threat_type.value == "reconnaissance"
+    assert result.rule == "port_scan"
+    assert "198.51.100.23" in result.hypotheses[0]["hypothesis_text"]
+    assert result.hypotheses[0]["threat_type"] == "reconnaissance"
+
+def test_brute_force_is_triaged_locally():
+    result = TriageClassifier().classify(_brute_force())
+    assert result.bypass
+    assert result.threat_type.value == "brute_force"
+    assert result.rule == "auth_brute_force"
+    assert result.confidence >= 0.9
+
+def test_stored_events_with_payload_fields():
+    events = [{"timestamp": "2024-05-20T10:00:00Z", "source": "firewall", "event_type": "connection_denied",
+               "payload": {"src_ip": "192.0.2.9", "dst_port": port}} for port in range(1, 30)]
+    assert TriageClassifier().classify(events).threat_type.value == "reconnaissance"
+
+def test_ambiguous_and_small_incidents_go_to_the_llm():
+    classifier = TriageClassifier()
+    mixed = _brute_force(10) + [_event("sudo: user bob added to sudoers") for _ in range(10)] + [
+        _event("Outbound connection to 203.0.113.50:443 from workstation-12") for _ in range(10)
+    ]
+    assert not classifier.classify(mixed).bypass
+    assert not classifier.classify(_brute_force(3)).bypass
+    assert not classifier.classify([_event("Scheduled backup completed")] * 20).bypass
+
+    stats = classifier.get_stats()
+    assert stats["incidents"] == 3
+    assert stats["bypass_rate"] == 0.0
+
+@pytest.mark.asyncio
+async def test_hypothesis_agent_skips_llm_for_triaged_incidents(monkeypatch):
+    gemini = AsyncMock()
+    gemini.generate_hypothesis.return_value = {"hypotheses": [
+        {"hypothesis_text": "LLM", "confidence": 0.5, "evidence": [], "threat_type": "other"}
+    ]}
+    agent = HypothesisAgent(gemini_service_instance=gemini)
+    monkeypatch.setattr(agent, "_save_hypotheses", AsyncMock())
+
+    hypotheses = await agent.analyze("00000000-0000-0000-0000-000000000001", _port_scan())
+    assert hypotheses[0]["threat_type"] == "reconnaissance"
+    gemini.generate_hypothesis.assert_not_awaited()
+    agent._save_hypotheses.assert_awaited_once()
+
+    hypotheses = await agent.analyze("00000000-0000-0000-0000-000000000001", [_event("Odd process tree")] * 6)
+    assert hypotheses[0]["hypothesis_text"] == "LLM"
+    gemini.generate_hypothesis.assert_awaited_once()
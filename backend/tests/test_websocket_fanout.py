@@ -0,0 +1,209 @@
+import asyncio
+import json
+from datetime import datetime, timezone
+from uuid import UUID
+import msgpack
+import pytest
+from app import websocket_handler
+from app.websocket_handler import ConnectionManager, Frame, MSGPACK_SUBPROTOCOL, WS_CHANNEL_PREFIX
+
+class FakeWebSocket:
+    def __init__(self, delay: float = 0.0, fail: bool = False, subprotocols=()):
+        self.delay = delay
+        self.fail = fail
+        self.scope = {"subprotocols": list(subprotocols)}
+        self.subprotocol = None
+        self.frames = []
+        self.received = []
+        self.closed_with = None
+
+    async def accept(self, subprotocol=None):
+        self.subprotocol = subprotocol
+
+    async def _send(self, frame, message):
+        if self.fail:
+            raise RuntimeError("connection reset")
+        if self.delay:
+            await asyncio.sleep(self.delay)
+        self.frames.append(frame)
+        self.received.append(message)
+
+    async def send_text(self, text):
+        await self._send(text, json.loads(text))
+
+    async def send_bytes(self, data):
+        await self._send(data, msgpack.unpackb(data))
+
+    async def close(self, code=1000):
+        self.closed_with = code
+
+class FakeRedis:
+    def __init__(self, fail: bool = False):
+        self.fail = fail
+        self.published = []
+
+    async def publish(self, channel, data):
+        if self.fail:
+            raise ConnectionError("redis down")
+        self.published.append((channel, json.loads(data)))
+
+async def _drain(*sockets, count=1, timeout=2.0):
+    async def wait():
+        while any(len(s.received) < count for s in sockets):
+            await asyncio.sleep(0.005)
+    await asyncio.wait_for(wait(), timeout)
+
+@pytest.mark.asyncio
+async def test_slow_client_does_not_stall_the_others():
+    manager = ConnectionManager(queue_size=8, send_timeout=5, redis_client=FakeRedis())
+    slow = FakeWebSocket(delay=1.0)
+    fast = [FakeWebSocket() for _ in range(50)]
+    for ws in [slow, *fast]:
+        await manager.connect(ws, "t1")
+
+    start = asyncio.get_running_loop().time()
+    await manager.broadcast("t1", {"type": "ping"})
+    await _drain(*fast)
+    assert asyncio.get_running_loop().time() - start < 0.5
+    assert slow.received == []
+
+@pytest.mark.asyncio
+async def test_dead_and_slow_clients_are_evicted():
+    manager = ConnectionManager(queue_size=2, send_timeout=5, redis_client=FakeRedis())
+    dead, slow, ok = FakeWebSocket(fail=True), FakeWebSocket(delay=10), FakeWebSocket()
+    for ws in (dead, slow, ok):
+        await manager.connect(ws, "t1")
+    other = FakeWebSocket()
+    await manager.connect(other, "t2")
+
+    for i in range(4):
+        await manager.broadcast("t1", {"seq": i})
+        await asyncio.sleep(0.01)
+    await _drain(ok, count=4)
+    await asyncio.sleep(0.01)
+
+    assert [m["seq"] for m in ok.received] == [0, 1, 2, 3]
+    assert dead.closed_with == 1011
+    assert slow.closed_with == 1013
+    assert other.received == []
+    stats = manager.get_stats()
+    assert stats["evicted"] == 2 and stats["connections"] == 2
+
+    manager.disconnect(ok, "t1")
+    manager.disconnect(ok, "t1")
+    assert "t1" not in manager.active_connections
+
+@pytest.mark.asyncio
+async def test_publish_goes_through_redis_and_falls_back_to_local_clients():
+    redis = FakeRedis()
+    manager = ConnectionManager(redis_client=redis)
+    ws = FakeWebSocket()
+    await manager.connect(ws, "t1")
+
+    await manager.publish("t1", {"type": "incident_created"})
+    assert redis.published == [(f"{WS_CHANNEL_PREFIX}t1", {"type": "incident_created"})]
+    assert ws.received == []  # Delivered by the relay, not directly
+
+    redis.fail = True
+    await manager.publish("t1", {"type": "incident_created"})
+    await _drain(ws)
+    assert manager.stats["publish_fallbacks"] == 1
+
+@pytest.mark.asyncio
+async def test_thousands_of_clients_per_tenant():
+    manager = ConnectionManager(queue_size=64, send_timeout=5, redis_client=FakeRedis())
+    sockets = [FakeWebSocket(delay=0.001) for _ in range(2000)]
+    for ws in sockets:
+        await manager.connect(ws, "t1")
+
+    for i in range(5):
+        await manager.broadcast("t1", {"seq": i})
+    await _drain(*sockets, count=5, timeout=10)
+    assert manager.stats["delivered"] == 10000
+    assert manager.stats["evicted"] == 0
+
+@pytest.mark.asyncio
+async def test_each_broadcast_is_serialized_once(monkeypatch):
+    calls = []
+    encode = websocket_handler.encode_json
+    monkeypatch.setattr(websocket_handler, "encode_json", lambda message: calls.append(1) or encode(message))
+
+    manager = ConnectionManager(redis_client=FakeRedis())
+    sockets = [FakeWebSocket() for _ in range(100)]
+    for ws in sockets:
+        await manager.connect(ws, "t1")
+
+    when = datetime(2024, 5, 20, 10, tzinfo=timezone.utc)
+    await manager.broadcast("t1", {"type": "incident_progress", "at": when, "id": UUID(int=1)})
+    await _drain(*sockets)
+    assert len(calls) == 1
+    assert len({id(ws.frames[0]) for ws in sockets}) == 1
+    assert sockets[0].received == [{"type": "incident_progress", "at": "2024-05-20T10:00:00+00:00",
+                                    "id": "00000000-0000-0000-0000-000000000001"}]
+
+    # Relayed messages are forwarded to JSON clients without re-serializing
+    await manager.broadcast("t1", Frame(json_bytes=b'{"type":"relayed"}'))
+    await _drain(*sockets, count=2)
+    assert len(calls) == 1
+    assert sockets[0].frames[1] == '{"type":"relayed"}'
+
+@pytest.mark.asyncio
+async def test_msgpack_framing_is_negotiated_per_connection():
+    manager = ConnectionManager(redis_client=FakeRedis())
+    binary = FakeWebSocket(subprotocols=[MSGPACK_SUBPROTOCOL])
+    text = FakeWebSocket()
+    await manager.connect(binary, "t1")
+    await manager.connect(text, "t1")
+    assert binary.subprotocol == MSGPACK_SUBPROTOCOL and text.subprotocol is None
+
+    await manager.broadcast("t1", {"type": "incident_progress", "step": 2})
+    await _drain(binary, text)
+    assert isinstance(binary.frames[0], bytes) and isinstance(text.frames[0], str)
+    assert binary.received == text.received == [{"type": "incident_progress", "step": 2}]
+
+def test_publish_to_tenant_reuses_one_client(monkeypatch):
+    published, created = [], []
+
+    class FakeRedis:
+        def publish(self, channel, data):
+            published.append(channel)
+
+    def from_url(url, **kwargs):
+        created.append(url)
+        return FakeRedis()
+
+    monkeypatch.setattr(websocket_handler, "_publisher", None)
+    monkeypatch.setattr(websocket_handler.redis.Redis, "from_url", from_url)
+    for _ in range(3):
+        websocket_handler.publish_to_tenant("t1", {"type": "job_completed"})
+
+    assert len(created) == 1
+    assert published == [f"{WS_CHANNEL_PREFIX}t1"] * 3
+
+def test_endpoint_ignores_binary_frames_from_msgpack_clients():
+    from starlette.testclient import TestClient
+    from app.main import app
+
+    client = TestClient(app)
+    with client.websocket_connect("/ws/incidents/t-bin", subprotocols=[MSGPACK_SUBPROTOCOL]) as ws:
+        ws.send_bytes(msgpack.packb({"type": "ping"}))
+        ws.send_text("ping")
+        assert websocket_handler.manager.active_connections.get("t-bin")
+    assert not websocket_handler.manager.active_connections.get("t-bin")
+
+@pytest.mark.asyncio
+async def test_no_redis_relay_when_redis_fan_out_is_disabled(monkeypatch):
+    from app import main
+
+    monkeypatch.setattr(main.settings, "WS_REDIS_ENABLED", False)
+    monkeypatch.setattr(main.app.state, "ws_relay", None, raising=False)
+    await main.startup()
+    assert main.app.state.ws_relay is None
+    # Called directly, the relay returns instead of reconnecting forever
+    await asyncio.wait_for(ConnectionManager().listen(), timeout=1)
+
+def test_frame_decodes_relayed_json_once_and_only_for_text_clients():
+    frame = Frame(json_bytes=b'{"type":"relayed"}')
+    assert msgpack.unpackb(frame.encode(True)) == {"type": "relayed"}
+    assert frame._json is None
+    assert frame.encode(False) is frame.encode(False) == '{"type":"relayed"}'